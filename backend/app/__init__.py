@@ -5,21 +5,26 @@ It initializes and configures the Flask application with all necessary extension
 """
 from flask import Flask, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
+from flask_login import LoginManager
 from flask_cors import CORS
-from flask_mail import Mail
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 import os
 import logging
+from app.utils.lazy_extension import LazyExtension
+from app.utils.rate_limiting import rate_limit_key
+from app.utils.compression import configure_compression
+from app.utils.db_routing import RoutingSession, configure_read_replica
 
 # Initialize Flask extensions
-db = SQLAlchemy()
-migrate = Migrate()
+# Mail and migrations are rarely used, so they can be loaded on first use
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = LazyExtension('flask_migrate:Migrate', 'migrate',
+                        cli_group=('db', 'flask_migrate.cli:db'))
 jwt = JWTManager()
-mail = Mail()
-limiter = Limiter(key_func=get_remote_address)
+mail = LazyExtension('flask_mail:Mail', 'mail')
+limiter = Limiter(key_func=rate_limit_key)
+login_manager = LoginManager()
 
 def create_app(config_class):
     """Create and configure the Flask application.
@@ -60,11 +65,67 @@ def create_app(config_class):
     app.config.from_object(config_class)
     
     # Initialize extensions with app
+    lazy = app.config.get('LAZY_EXTENSIONS', False)
+    # Registered first so that it runs after every other after_request hook
+    configure_compression(app)
+    configure_read_replica(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, lazy=lazy)
     jwt.init_app(app)
-    mail.init_app(app)
+    mail.init_app(app, lazy=lazy)
     limiter.init_app(app)
+    login_manager.init_app(app)
+    
+    # Authenticated requests resolve users from an in-process cache;
+    # last_login is written behind in batches
+    from app.services.user_cache import user_cache, load_user, lookup_jwt_user
+    from app.services.login_activity import login_activity
+    user_cache.init_app(app)
+    login_activity.init_app(app)
+    login_manager.user_loader(load_user)
+    jwt.user_lookup_loader(lookup_jwt_user)
+    
+    # Rating graphs are served from cached, pre-encoded series
+    from app.services.rating_history import rating_history
+    rating_history.init_app(app)
+    
+    # Pre-trade risk checks; aggregates load from the database on first use
+    from app.services.risk_engine import risk_engine
+    risk_engine.init_app(app)
+    
+    # Order matching, partitioned by symbol across worker processes when enabled
+    from app.services.order_pipeline import order_pipeline
+    order_pipeline.init_app(app)
+    
+    # Host-wide quotes written by one feeder process, read lock-free by all workers
+    from app.services.price_feed import price_feed
+    price_feed.init_app(app)
+    
+    # Opt-in SQL profiling (slow queries, N+1 detection, query budgets)
+    if app.config.get('SQL_PROFILING'):
+        from app.utils.query_profiler import QueryProfiler
+        QueryProfiler(app)
+    
+    # Background email notifications (workers start on first use)
+    if app.config.get('NOTIFICATIONS_ENABLED'):
+        from app.services.notification_service import notifications
+        notifications.init_app(app)
+    
+    # Periodic jobs; the loop starts on the first request of each worker process
+    if app.config.get('SCHEDULER_ENABLED'):
+        from app.services.scheduler import scheduler
+        from app.services.market_jobs import register_market_jobs
+        from app.services.contest_service import register_contest_jobs
+        from app.services.ledger_service import register_ledger_jobs
+        from app.services.analytics_service import register_analytics_jobs
+        from app.utils.db_routing import register_replication_jobs
+        scheduler.init_app(app)
+        register_market_jobs(scheduler, app)
+        register_contest_jobs(scheduler, app)
+        register_ledger_jobs(scheduler, app)
+        register_analytics_jobs(scheduler, app)
+        register_replication_jobs(scheduler, app)
+        app.before_request(scheduler.ensure_started)
     
     # Configure CORS - allow production domains for deployed app
     CORS(app, resources={
@@ -80,16 +141,39 @@ def create_app(config_class):
         }
     })
     
+    # Import all models so relationships between them can be resolved
+    from app import models
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.trading import trading_bp
     from app.routes.portfolio import portfolio_bp
     from app.routes.user import user_bp
+    from app.routes.contests import contests_bp
+    from app.routes.exports import exports_bp
+    from app.routes.orders import orders_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(trading_bp, url_prefix='/api/trading')
     app.register_blueprint(portfolio_bp, url_prefix='/api/portfolio')
     app.register_blueprint(user_bp, url_prefix='/api/user')
+    app.register_blueprint(contests_bp, url_prefix='/api/contests')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    app.register_blueprint(orders_bp, url_prefix='/api/orders')
+    
+    # Maintenance commands (flask ledger/analytics/export/replica/prices/orders ...)
+    from app.services.ledger_service import ledger_cli
+    from app.services.analytics_service import analytics_cli
+    from app.services.export_service import export_cli
+    from app.utils.db_routing import replica_cli
+    from app.services.price_feed import prices_cli
+    from app.services.order_pipeline import orders_cli
+    app.cli.add_command(ledger_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(export_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(prices_cli)
+    app.cli.add_command(orders_cli)
     
     # Register error handlers
     @app.errorhandler(400)
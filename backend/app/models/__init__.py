@@ -1,7 +1,7 @@
 """
 Database Models Package
 This package contains all SQLAlchemy database models for the trading simulation.
-Including User, Portfolio, Trade, Rating, Stock and other related models.
+Including User, Portfolio, Trade, Rating, Stock, Contest and other related models.
 """
 
 from .user import User
@@ -9,5 +9,9 @@ from .portfolio import Portfolio
 from .trade import Trade
 from .rating import Rating
 from .stock import Stock
+from .contest import Contest, ContestEntry, ContestTrade
+from .ledger import LedgerEntry, BalanceSnapshot
+from .analytics import DailyEquity, PerformanceMetrics
 
-__all__ = ['User', 'Portfolio', 'Trade', 'Rating', 'Stock']
+__all__ = ['User', 'Portfolio', 'Trade', 'Rating', 'Stock', 'Contest', 'ContestEntry',
+           'ContestTrade', 'LedgerEntry', 'BalanceSnapshot', 'DailyEquity', 'PerformanceMetrics']
@@ -0,0 +1,72 @@
+from datetime import datetime
+from .. import db
+
+class DailyEquity(db.Model):
+    """End of day equity (cash plus marked positions) of a user, one row per day."""
+    __tablename__ = 'daily_equity'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_daily_equity_user_day'),
+        db.Index('ix_daily_equity_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    
+    cash = db.Column(db.Float, nullable=False)
+    positions_value = db.Column(db.Float, nullable=False, default=0.0)
+    equity = db.Column(db.Float, nullable=False)  # cash + positions_value
+    
+    def to_dict(self):
+        """Convert daily equity to dictionary for JSON serialization."""
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'cash': self.cash,
+            'positions_value': self.positions_value,
+            'equity': self.equity
+        }
+    
+    def __repr__(self):
+        return f'<DailyEquity user:{self.user_id} {self.day}: {self.equity}>'
+
+class PerformanceMetrics(db.Model):
+    """Precomputed performance analytics of a user over their daily equity curve."""
+    __tablename__ = 'performance_metrics'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)  # Last day included
+    days = db.Column(db.Integer, nullable=False, default=0)  # Days on the equity curve
+    
+    # Returns (fractions, not percentages)
+    total_return = db.Column(db.Float, default=0.0)
+    avg_daily_return = db.Column(db.Float, default=0.0)
+    volatility = db.Column(db.Float, default=0.0)  # Annualized
+    sharpe_ratio = db.Column(db.Float)  # Annualized, None with too little history
+    max_drawdown = db.Column(db.Float, default=0.0)  # Largest peak to trough fall (<= 0)
+    best_day = db.Column(db.Float)
+    worst_day = db.Column(db.Float)
+    
+    # Consecutive days with a positive return
+    current_win_streak = db.Column(db.Integer, default=0)
+    longest_win_streak = db.Column(db.Integer, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert metrics to dictionary for JSON serialization."""
+        return {
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+            'days': self.days,
+            'total_return': self.total_return,
+            'avg_daily_return': self.avg_daily_return,
+            'volatility': self.volatility,
+            'sharpe_ratio': self.sharpe_ratio,
+            'max_drawdown': self.max_drawdown,
+            'best_day': self.best_day,
+            'worst_day': self.worst_day,
+            'current_win_streak': self.current_win_streak,
+            'longest_win_streak': self.longest_win_streak
+        }
+    
+    def __repr__(self):
+        return f'<PerformanceMetrics user:{self.user_id} sharpe:{self.sharpe_ratio}>'
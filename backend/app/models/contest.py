@@ -0,0 +1,145 @@
+from datetime import datetime
+from enum import Enum
+from .. import db
+
+class ContestStatus(Enum):
+    """Enumeration for contest lifecycle states."""
+    UPCOMING = "UPCOMING"
+    RUNNING = "RUNNING"
+    FINALIZED = "FINALIZED"
+
+class Contest(db.Model):
+    """Time-boxed trading contest in which every participant gets a fresh virtual balance."""
+    __tablename__ = 'contests'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    
+    # Contest window
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    
+    # Virtual balance every participant starts with inside the contest
+    starting_balance = db.Column(db.Float, nullable=False, default=100000.0)
+    
+    status = db.Column(db.Enum(ContestStatus), nullable=False, default=ContestStatus.UPCOMING)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finalized_at = db.Column(db.DateTime)
+    
+    # Relationships
+    entries = db.relationship('ContestEntry', backref='contest', lazy=True, cascade='all, delete-orphan')
+    
+    def __init__(self, name, starts_at, ends_at, starting_balance=100000.0):
+        self.name = name
+        self.starts_at = starts_at
+        self.ends_at = ends_at
+        self.starting_balance = starting_balance
+        self.status = ContestStatus.UPCOMING
+    
+    @property
+    def duration_minutes(self):
+        """Contest length in minutes."""
+        return int((self.ends_at - self.starts_at).total_seconds() // 60)
+    
+    def is_running(self, now=None):
+        """Check if the contest window is open."""
+        now = now or datetime.utcnow()
+        return self.status != ContestStatus.FINALIZED and self.starts_at <= now < self.ends_at
+    
+    def to_dict(self):
+        """Convert contest object to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'duration_minutes': self.duration_minutes,
+            'starting_balance': self.starting_balance,
+            'status': self.status.value if self.status else None,
+            'finalized_at': self.finalized_at.isoformat() if self.finalized_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Contest {self.id} {self.name}>'
+
+class ContestEntry(db.Model):
+    """A user's participation in a contest and, once finalized, their result."""
+    __tablename__ = 'contest_entries'
+    __table_args__ = (
+        db.UniqueConstraint('contest_id', 'user_id', name='uq_contest_entries_contest_user'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    
+    # Final results (set on finalization)
+    final_equity = db.Column(db.Float)
+    profit_percentage = db.Column(db.Float)
+    trades_count = db.Column(db.Integer, default=0)
+    win_rate = db.Column(db.Float, default=0.0)
+    rank = db.Column(db.Integer)
+    
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __init__(self, contest_id, user_id):
+        self.contest_id = contest_id
+        self.user_id = user_id
+    
+    def to_dict(self):
+        """Convert contest entry to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'contest_id': self.contest_id,
+            'user_id': self.user_id,
+            'final_equity': self.final_equity,
+            'profit_percentage': self.profit_percentage,
+            'trades_count': self.trades_count,
+            'win_rate': self.win_rate,
+            'rank': self.rank,
+            'joined_at': self.joined_at.isoformat() if self.joined_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ContestEntry contest:{self.contest_id} user:{self.user_id}>'
+
+class ContestTrade(db.Model):
+    """A fill inside a contest sandbox; sandboxes are rebuilt from these rows."""
+    __tablename__ = 'contest_trades'
+    __table_args__ = (
+        # Replaying a contest and reading the fills committed since the last sync
+        db.Index('ix_contest_trades_contest_id_id', 'contest_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)  # Positive buys, negative sells
+    price = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __init__(self, contest_id, user_id, symbol, quantity, price):
+        self.contest_id = contest_id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.quantity = quantity
+        self.price = price
+    
+    def to_dict(self):
+        """Convert contest trade to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'contest_id': self.contest_id,
+            'user_id': self.user_id,
+            'symbol': self.symbol,
+            'side': 'BUY' if self.quantity > 0 else 'SELL',
+            'quantity': abs(self.quantity),
+            'price': self.price,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ContestTrade contest:{self.contest_id} user:{self.user_id} {self.quantity} {self.symbol}>'
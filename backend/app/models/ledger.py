@@ -0,0 +1,152 @@
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from .. import db
+
+class LedgerEntryType(Enum):
+    """Enumeration for ledger entry types."""
+    TRADE = "TRADE"            # Cash and/or position change from an executed trade
+    POSITION = "POSITION"      # Position change recorded by a portfolio update
+    ADJUSTMENT = "ADJUSTMENT"  # Manual or system balance adjustment
+
+class LedgerEntry(db.Model):
+    """Append-only record of a cash or position change for a user.
+    
+    A user's cash at any time is their initial balance plus the sum of
+    cash deltas up to that time. Entries are never updated or deleted.
+    """
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        db.Index('ix_ledger_entries_user_id_id', 'user_id', 'id'),
+        db.Index('ix_ledger_entries_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    entry_type = db.Column(db.Enum(LedgerEntryType), nullable=False)
+    
+    # Changes recorded by this entry
+    cash_delta = db.Column(db.Float, nullable=False, default=0.0)
+    symbol = db.Column(db.String(10))
+    quantity_delta = db.Column(db.Integer, nullable=False, default=0)
+    price = db.Column(db.Float)
+    
+    # Source of the change
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'))
+    note = db.Column(db.String(200))
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert ledger entry to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'entry_type': self.entry_type.value if self.entry_type else None,
+            'cash_delta': self.cash_delta,
+            'symbol': self.symbol,
+            'quantity_delta': self.quantity_delta,
+            'price': self.price,
+            'trade_id': self.trade_id,
+            'note': self.note,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<LedgerEntry {self.id} user:{self.user_id} cash:{self.cash_delta} {self.symbol or ""}:{self.quantity_delta}>'
+
+class BalanceSnapshot(db.Model):
+    """Periodic per-user snapshot of cash and positions.
+    
+    The state of a user at time T is the latest snapshot taken at or before T
+    plus the ledger entries after the snapshot's last_entry_id up to T.
+    """
+    __tablename__ = 'balance_snapshots'
+    __table_args__ = (
+        db.Index('ix_balance_snapshots_user_id_as_of', 'user_id', 'as_of'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    last_entry_id = db.Column(db.Integer, nullable=False)  # Last ledger entry included
+    as_of = db.Column(db.DateTime, nullable=False)
+    cash = db.Column(db.Float, nullable=False)
+    positions = db.Column(db.JSON, nullable=False, default=dict)  # symbol -> quantity
+    
+    def to_dict(self):
+        """Convert snapshot to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'last_entry_id': self.last_entry_id,
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+            'cash': self.cash,
+            'positions': self.positions
+        }
+    
+    def __repr__(self):
+        return f'<BalanceSnapshot user:{self.user_id} as_of:{self.as_of}>'
+
+def stage_entry(owner, entry_type, cash_delta=0.0, symbol=None, quantity_delta=0,
+                price=None, trade=None, note=None):
+    """Stage a ledger entry on the current session.
+    
+    Staged entries are written with one bulk INSERT when the session commits,
+    in the same transaction as the balance or position change they record.
+    
+    Args:
+        owner: User instance or user id (instances may not be flushed yet)
+        entry_type: LedgerEntryType of the change
+        trade: Optional Trade instance the change comes from
+    """
+    db.session.info.setdefault('ledger_pending', []).append(
+        (owner, trade, entry_type, cash_delta, symbol, quantity_delta, price, note, datetime.utcnow())
+    )
+
+# Callbacks run after every commit that wrote ledger entries
+_commit_listeners = []
+
+def on_ledger_commit(callback):
+    """Register a callback run (without arguments) after ledger entries are committed."""
+    _commit_listeners.append(callback)
+    return callback
+
+@event.listens_for(Session, 'before_commit')
+def _write_staged_entries(session):
+    pending = session.info.pop('ledger_pending', None)
+    if not pending:
+        return
+    # Assign ids to new users and trades referenced by the entries
+    session.flush()
+    rows = []
+    for owner, trade, entry_type, cash_delta, symbol, quantity_delta, price, note, created_at in pending:
+        rows.append({
+            'user_id': getattr(owner, 'id', owner),
+            'entry_type': entry_type,
+            'cash_delta': cash_delta,
+            'symbol': symbol,
+            'quantity_delta': quantity_delta,
+            'price': price,
+            'trade_id': trade.id if trade is not None else None,
+            'note': note,
+            'created_at': created_at,
+        })
+    session.execute(insert(LedgerEntry), rows)
+    session.info['ledger_written'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _notify_ledger_commit(session):
+    if session.info.pop('ledger_written', False):
+        for callback in _commit_listeners:
+            callback()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_staged_entries(session):
+    session.info.pop('ledger_pending', None)
+    session.info.pop('ledger_written', None)
+
+@event.listens_for(LedgerEntry, 'before_update')
+@event.listens_for(LedgerEntry, 'before_delete')
+def _reject_ledger_changes(mapper, connection, target):
+    raise ValueError('Ledger entries are append-only')
@@ -1,5 +1,6 @@
 from .. import db
 from datetime import datetime
+from .ledger import LedgerEntryType, stage_entry
 
 class Portfolio(db.Model):
     __tablename__ = 'portfolios'
@@ -12,6 +13,11 @@ class Portfolio(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Position lookups and set-based fill updates
+        db.Index('ix_portfolios_user_id_symbol', 'user_id', 'symbol'),
+    )
+    
     # Relationship with User model
     user = db.relationship('User', backref='portfolio_holdings')
     
@@ -23,8 +29,8 @@ class Portfolio(db.Model):
         """Calculate total value of this position"""
         return self.quantity * self.avg_price
     
-    def update_position(self, new_quantity, new_price):
-        """Update portfolio position with new trade data"""
+    def update_position(self, new_quantity, new_price, trade=None):
+        """Update portfolio position with new trade data (recorded in the ledger)"""
         if self.quantity == 0:
             self.avg_price = new_price
         else:
@@ -37,3 +43,6 @@ class Portfolio(db.Model):
         
         self.quantity += new_quantity
         self.updated_at = datetime.utcnow()
+        stage_entry(self.user_id if self.user_id is not None else self.user,
+                    LedgerEntryType.POSITION, symbol=self.symbol,
+                    quantity_delta=new_quantity, price=new_price, trade=trade)
@@ -1,11 +1,14 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-
-db = SQLAlchemy()
+from .. import db
+from ..utils.rating_bands import rating_title, rating_color, performance_grade
 
 class Rating(db.Model):
     """Rating model for tracking user rating changes over time (Codeforces-style)."""
     __tablename__ = 'ratings'
+    __table_args__ = (
+        # Per-user history and date-range exports
+        db.Index('ix_ratings_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -53,53 +56,11 @@ class Rating(db.Model):
     
     def get_rating_title(self, rating=None):
         """Get Codeforces-style rating title based on rating value."""
-        rating = rating or self.new_rating
-        
-        if rating < 1200:
-            return "Newbie"
-        elif rating < 1400:
-            return "Pupil"
-        elif rating < 1600:
-            return "Specialist"
-        elif rating < 1900:
-            return "Expert"
-        elif rating < 2100:
-            return "Candidate Master"
-        elif rating < 2300:
-            return "Master"
-        elif rating < 2400:
-            return "International Master"
-        elif rating < 2600:
-            return "Grandmaster"
-        elif rating < 3000:
-            return "International Grandmaster"
-        else:
-            return "Legendary Grandmaster"
+        return rating_title(rating or self.new_rating)
     
     def get_rating_color(self, rating=None):
         """Get Codeforces-style color code for rating."""
-        rating = rating or self.new_rating
-        
-        if rating < 1200:
-            return "#808080"  # Gray
-        elif rating < 1400:
-            return "#008000"  # Green
-        elif rating < 1600:
-            return "#03A89E"  # Cyan
-        elif rating < 1900:
-            return "#0000FF"  # Blue
-        elif rating < 2100:
-            return "#AA00AA"  # Purple
-        elif rating < 2300:
-            return "#FF8C00"  # Orange
-        elif rating < 2400:
-            return "#FF8C00"  # Orange
-        elif rating < 2600:
-            return "#FF0000"  # Red
-        elif rating < 3000:
-            return "#FF0000"  # Red
-        else:
-            return "#AA0000"  # Dark Red
+        return rating_color(rating or self.new_rating)
     
     def is_rating_increase(self):
         """Check if this was a rating increase."""
@@ -107,26 +68,7 @@ class Rating(db.Model):
     
     def get_performance_grade(self):
         """Get a performance grade based on profit percentage."""
-        if self.profit_percentage >= 20:
-            return "A+"
-        elif self.profit_percentage >= 15:
-            return "A"
-        elif self.profit_percentage >= 10:
-            return "A-"
-        elif self.profit_percentage >= 5:
-            return "B+"
-        elif self.profit_percentage >= 0:
-            return "B"
-        elif self.profit_percentage >= -5:
-            return "B-"
-        elif self.profit_percentage >= -10:
-            return "C+"
-        elif self.profit_percentage >= -15:
-            return "C"
-        elif self.profit_percentage >= -20:
-            return "C-"
-        else:
-            return "F"
+        return performance_grade(self.profit_percentage)
     
     def to_dict(self):
         """Convert rating object to dictionary for JSON serialization."""
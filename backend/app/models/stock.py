@@ -1,11 +1,9 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+from .. import db
 
-Base = declarative_base()
 
-
-class Stock(Base):
+class Stock(db.Model):
     """Stock model for tracking available stocks and their information."""
     __tablename__ = 'stocks'
     
@@ -1,8 +1,6 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
 from enum import Enum
-
-db = SQLAlchemy()
+from .. import db
 
 class TradeType(Enum):
     """Enumeration for trade types."""
@@ -19,6 +17,10 @@ class TradeStatus(Enum):
 class Trade(db.Model):
     """Trade model for storing trading transactions and history."""
     __tablename__ = 'trades'
+    __table_args__ = (
+        # Per-user history and date-range exports
+        db.Index('ix_trades_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -1,9 +1,9 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-
-db = SQLAlchemy()
+from .. import db
+from ..utils.passwords import hash_password, needs_rehash, verify_password
+from ..utils.rating_bands import rating_title
+from .ledger import LedgerEntryType, stage_entry
 
 class User(UserMixin, db.Model):
     """User model for trader registration and authentication."""
@@ -46,18 +46,26 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Create password hash from plaintext password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if provided password matches hash."""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the password hash was made with outdated parameters."""
+        return needs_rehash(self.password_hash)
     
-    def update_balance(self, amount):
-        """Update current balance and calculate profit/loss."""
-        old_balance = self.current_balance
+    def update_balance(self, amount, trade=None, note=None):
+        """Update current balance and calculate profit/loss.
+        
+        The change is also appended to the ledger when the session commits.
+        """
         self.current_balance += amount
         self.total_profit_loss = self.current_balance - self.initial_balance
         self.updated_at = datetime.utcnow()
+        entry_type = LedgerEntryType.TRADE if trade is not None else LedgerEntryType.ADJUSTMENT
+        stage_entry(self, entry_type, cash_delta=amount, trade=trade, note=note)
     
     def get_profit_percentage(self):
         """Calculate profit percentage from initial balance."""
@@ -67,26 +75,7 @@ class User(UserMixin, db.Model):
     
     def get_rating_title(self):
         """Get Codeforces-style rating title based on current rating."""
-        if self.rating < 1200:
-            return "Newbie"
-        elif self.rating < 1400:
-            return "Pupil"
-        elif self.rating < 1600:
-            return "Specialist"
-        elif self.rating < 1900:
-            return "Expert"
-        elif self.rating < 2100:
-            return "Candidate Master"
-        elif self.rating < 2300:
-            return "Master"
-        elif self.rating < 2400:
-            return "International Master"
-        elif self.rating < 2600:
-            return "Grandmaster"
-        elif self.rating < 3000:
-            return "International Grandmaster"
-        else:
-            return "Legendary Grandmaster"
+        return rating_title(self.rating)
     
     def to_dict(self):
         """Convert user object to dictionary for JSON serialization."""
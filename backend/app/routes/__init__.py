@@ -3,5 +3,8 @@ from .auth import auth_bp
 from .portfolio import portfolio_bp
 from .trading import trading_bp
 from .user import user_bp
+from .contests import contests_bp
+from .exports import exports_bp
+from .orders import orders_bp
 
-__all__ = ['auth_bp', 'portfolio_bp', 'trading_bp', 'user_bp']
+__all__ = ['auth_bp', 'portfolio_bp', 'trading_bp', 'user_bp', 'contests_bp', 'exports_bp', 'orders_bp']
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, login_user, logout_user, current_user
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.user import User, db
-from app.services.rating_service import RatingService
+from app.services.login_activity import login_activity
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -82,13 +84,22 @@ def login():
             if not user.is_active:
                 return jsonify({'error': 'Account is deactivated'}), 403
             
+            # Upgrade hashes made with outdated parameters while the password is known
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+            
             login_user(user)
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            
+            # last_login is written in batches; show it without dirtying the user
+            now = datetime.utcnow()
+            login_activity.record(user.id, now)
+            set_committed_value(user, 'last_login', now)
             
             return jsonify({
                 'message': 'Login successful',
-                'user': user.to_dict()
+                'user': user.to_dict(),
+                'access_token': create_access_token(identity=str(user.id))
             }), 200
         else:
             return jsonify({'error': 'Invalid email or password'}), 401
@@ -0,0 +1,95 @@
+"""Contest routes for trading simulation backend."""
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from app import db
+from app.models.contest import Contest, ContestStatus
+from app.models.stock import Stock
+from app.services.contest_engine import ContestError, contest_engine
+from app.services.contest_service import final_standings, join_contest, place_contest_order, sync_sandbox
+
+contests_bp = Blueprint('contests', __name__, url_prefix='/api/contests')
+
+@contests_bp.route('', methods=['GET'])
+def list_contests():
+    """List contests, most recent first - GET /api/contests"""
+    contests = db.session.execute(
+        db.select(Contest).order_by(Contest.starts_at.desc()).limit(50)
+    ).scalars().all()
+    return jsonify({'contests': [contest.to_dict() for contest in contests]}), 200
+
+@contests_bp.route('/<int:contest_id>/join', methods=['POST'])
+@login_required
+def join(contest_id):
+    """Join a contest - POST /api/contests/<id>/join"""
+    contest = db.session.get(Contest, contest_id)
+    if contest is None:
+        return jsonify({'error': 'Contest not found'}), 404
+    
+    try:
+        join_contest(contest, current_user.id)
+    except ContestError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'message': 'Joined contest',
+        'contest': contest.to_dict(),
+        'rank': contest_engine.rank_of(contest.id, current_user.id)
+    }), 200
+
+@contests_bp.route('/<int:contest_id>/standings', methods=['GET'])
+def standings(contest_id):
+    """Live standings of a contest, or its final results once finalized - GET /api/contests/<id>/standings"""
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    
+    contest = db.session.get(Contest, contest_id)
+    if contest is None:
+        return jsonify({'error': 'Contest not found'}), 404
+    
+    if contest.status == ContestStatus.FINALIZED:
+        # Results are stored on the entries; the sandbox is gone
+        page = final_standings(contest, limit, offset)
+    else:
+        sync_sandbox(contest)
+        page = contest_engine.standings(contest_id, limit, offset)
+    
+    return jsonify({
+        'contest_id': contest_id,
+        'limit': limit,
+        'offset': offset,
+        'standings': page
+    }), 200
+
+@contests_bp.route('/<int:contest_id>/orders', methods=['POST'])
+@login_required
+def place_order(contest_id):
+    """Buy or sell at the market price inside a running contest - POST /api/contests/<id>/orders"""
+    contest = db.session.get(Contest, contest_id)
+    if contest is None:
+        return jsonify({'error': 'Contest not found'}), 404
+    
+    data = request.get_json() or {}
+    symbol = str(data.get('symbol', '')).strip().upper()
+    side = str(data.get('side', '')).upper()
+    try:
+        quantity = int(data.get('quantity', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Quantity must be a number'}), 400
+    if not symbol or side not in ('BUY', 'SELL') or quantity <= 0:
+        return jsonify({'error': 'Symbol, side (BUY or SELL) and a positive quantity are required'}), 400
+    
+    price = db.session.execute(db.select(Stock.current_price).where(Stock.symbol == symbol)).scalar()
+    if not price:
+        return jsonify({'error': f'No market price for {symbol}'}), 400
+    
+    try:
+        trade = place_contest_order(contest, current_user.id, symbol,
+                                    quantity if side == 'BUY' else -quantity, price)
+    except ContestError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'message': 'Order executed',
+        'trade': trade.to_dict(),
+        'rank': contest_engine.rank_of(contest.id, current_user.id)
+    }), 201
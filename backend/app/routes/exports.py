@@ -0,0 +1,30 @@
+"""Export routes for trading simulation backend."""
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_login import login_required, current_user
+from app.services.export_service import EXPORTS, export_filename, stream_user_export
+from app.utils.exporters import EXPORT_FORMATS, available_formats, parse_date_range
+
+exports_bp = Blueprint('exports', __name__, url_prefix='/api/exports')
+
+@exports_bp.route('/<kind>', methods=['GET'])
+@login_required
+def export(kind):
+    """Download the current user's trades or ratings - GET /api/exports/<trades|ratings>?format=csv"""
+    if kind not in EXPORTS:
+        return jsonify({'error': 'Not found'}), 404
+
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in available_formats():
+        return jsonify({'error': f"format must be one of: {', '.join(available_formats())}"}), 400
+
+    try:
+        start, end = parse_date_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates (YYYY-MM-DD)'}), 400
+
+    body = stream_user_export(kind, current_user.id, export_format, start, end)
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format][0],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(kind, export_format)}"'}
+    )
@@ -0,0 +1,169 @@
+"""Order placement routes for trading simulation backend."""
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import update
+from app import db
+from app.models.stock import Stock
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.models.user import User
+from app.services.notification_service import notifications
+from app.services.order_pipeline import FILLED, Order, OrderTimeout, order_pipeline
+from app.services.risk_engine import RiskRejected, risk_engine
+
+orders_bp = Blueprint('orders', __name__, url_prefix='/api/orders')
+
+ORDER_TYPES = ('MARKET', 'LIMIT')
+
+def _execute_fill(user, trade, stock_price):
+    """Execute a trade at the market price and book cash and position changes."""
+    trade.price_per_share = stock_price
+    trade.total_amount = trade.quantity * stock_price
+    trade.current_price = stock_price
+    trade.execute_trade()
+
+    signed_quantity = trade.quantity if trade.trade_type is TradeType.BUY else -trade.quantity
+    user.update_balance(-signed_quantity * stock_price, trade=trade)
+    risk_engine.stage_fill(user.id, trade.symbol, signed_quantity, stock_price, trade=trade)
+
+def _claim_pending(order_id, status):
+    """Move a pending order to `status`; return False if it is no longer pending.
+
+    The status check and the write are one statement, so of several requests
+    filling or cancelling the same order only one succeeds; the row stays
+    locked until the transaction ends.
+    """
+    result = db.session.execute(
+        update(Trade)
+        .where(Trade.id == order_id, Trade.status == TradeStatus.PENDING)
+        .values(status=status, updated_at=datetime.utcnow())
+    )
+    return result.rowcount == 1
+
+def _book_resting_fill(fill):
+    """Book the fill of a resting order; return its (owner, trade), or None if it is no longer pending."""
+    if not _claim_pending(fill.order_id, TradeStatus.EXECUTED):
+        # Cancelled, or filled through another process's pipeline
+        return None
+    trade = db.session.get(Trade, fill.order_id)
+    owner = db.session.get(User, trade.user_id)
+    _execute_fill(owner, trade, fill.price)
+    return owner, trade
+
+@orders_bp.route('', methods=['POST'])
+@login_required
+def place_order():
+    """Place a market or limit order after pre-trade risk checks - POST /api/orders"""
+    data = request.get_json() or {}
+
+    symbol = str(data.get('symbol', '')).strip().upper()
+    side = str(data.get('side', '')).upper()
+    order_type = str(data.get('order_type', 'MARKET')).upper()
+    try:
+        quantity = int(data.get('quantity', 0))
+        limit_price = float(data['price']) if data.get('price') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Quantity and price must be numbers'}), 400
+
+    if not symbol:
+        return jsonify({'error': 'Symbol is required'}), 400
+    if side not in TradeType.__members__:
+        return jsonify({'error': 'Side must be BUY or SELL'}), 400
+    if order_type not in ORDER_TYPES:
+        return jsonify({'error': f"Order type must be one of: {', '.join(ORDER_TYPES)}"}), 400
+    if order_type == 'LIMIT' and limit_price is None:
+        return jsonify({'error': 'Limit orders need a price'}), 400
+
+    stock = db.session.execute(db.select(Stock).where(Stock.symbol == symbol)).scalar()
+    if stock is None or not stock.current_price:
+        return jsonify({'error': f'No market price for {symbol}'}), 400
+
+    trade_type = TradeType[side]
+    market_price = stock.current_price
+    if order_type == 'MARKET':
+        marketable = True
+    elif trade_type is TradeType.BUY:
+        marketable = limit_price >= market_price
+    else:
+        marketable = limit_price <= market_price
+    order_price = market_price if marketable else limit_price
+
+    try:
+        reservation = risk_engine.reserve(current_user.id, symbol, trade_type, quantity, order_price)
+    except RiskRejected as e:
+        return jsonify({'error': 'Order rejected', 'reason': str(e)}), 422
+
+    submitted = False
+    try:
+        user = db.session.get(User, current_user.id)
+        trade = Trade(user_id=user.id, symbol=symbol, trade_type=trade_type, quantity=quantity,
+                      price_per_share=order_price, company_name=stock.name, market_price=market_price)
+        db.session.add(trade)
+        db.session.flush()  # The trade id identifies the order in its book
+        submitted = True
+        result = order_pipeline.submit(
+            Order(trade.id, user.id, symbol, side, quantity,
+                  None if order_type == 'MARKET' else limit_price),
+            market_price)
+        # Resting orders crossed by this order's market price fill first
+        resting_filled = [booked for booked in (_book_resting_fill(fill) for fill in result.fills
+                                                if fill.order_id != trade.id) if booked]
+        if result.status == FILLED:
+            _execute_fill(user, trade, result.fills[-1].price)
+        db.session.commit()
+    except OrderTimeout:
+        db.session.rollback()
+        risk_engine.release(reservation)
+        order_pipeline.resync(symbol)
+        return jsonify({'error': 'Order timed out, please retry'}), 504
+    except Exception as e:
+        db.session.rollback()
+        risk_engine.release(reservation)
+        if submitted:
+            # The partition may hold a fill or resting order that was never committed
+            order_pipeline.resync(symbol)
+        return jsonify({'error': 'Order failed', 'details': str(e)}), 500
+
+    for owner, filled in resting_filled:
+        risk_engine.fill_order(filled.id)
+    if trade.status is TradeStatus.EXECUTED:
+        risk_engine.settle(reservation)
+    else:
+        risk_engine.track_order(trade.id, reservation)
+
+    # Confirmations go out only for fills that committed
+    if notifications.enabled:
+        for owner, filled in resting_filled:
+            notifications.notify_trade(owner, filled)
+        if trade.status is TradeStatus.EXECUTED:
+            notifications.notify_trade(user, trade)
+
+    return jsonify({
+        'message': 'Order executed' if trade.status is TradeStatus.EXECUTED else 'Order placed',
+        'order': trade.to_dict()
+    }), 201
+
+@orders_bp.route('/<int:order_id>', methods=['DELETE'])
+@login_required
+def cancel_order(order_id):
+    """Cancel an open order - DELETE /api/orders/<id>"""
+    trade = db.session.get(Trade, order_id)
+    if trade is None or trade.user_id != current_user.id:
+        return jsonify({'error': 'Order not found'}), 404
+    if not _claim_pending(trade.id, TradeStatus.CANCELLED):
+        return jsonify({'error': 'Only pending orders can be cancelled'}), 400
+
+    db.session.commit()
+    risk_engine.cancel_order(trade.id)
+    order_pipeline.cancel(trade.symbol, trade.id)
+    return jsonify({'message': 'Order cancelled', 'order': trade.to_dict()}), 200
+
+@orders_bp.route('/risk', methods=['GET'])
+@login_required
+def get_risk():
+    """Current cash, reservations, positions and limits - GET /api/orders/risk"""
+    try:
+        return jsonify(risk_engine.exposure(current_user.id)), 200
+    except RiskRejected as e:
+        return jsonify({'error': str(e)}), 404
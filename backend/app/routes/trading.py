@@ -1,5 +1,16 @@
 from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
 from datetime import datetime
+from sqlalchemy import case, func, select
+from app import db
+from app.models.trade import Trade
+from app.services.price_feed import price_feed
+from app.utils.serialization import (
+    STREAM_CHUNK_SIZE, TRADE_FIELDS, parse_fields, stream_json_response, trade_fieldset
+)
+
+# Upper bound on the page size of the trade history endpoint
+MAX_HISTORY_LIMIT = 10000
 
 # Create trading blueprint
 trading_bp = Blueprint('trading', __name__)
@@ -20,6 +31,24 @@ def get_stock_ltp():
     # Get stock symbol from query parameters
     symbol = request.args.get('symbol', 'RELIANCE')
     
+    # Quotes published by the feeder process to the shared price table
+    quote = price_feed.quote(symbol.upper())
+    if quote is not None:
+        change = quote.ltp - quote.close if quote.close else 0.0
+        return jsonify({
+            'symbol': quote.symbol,
+            'ltp': quote.ltp,
+            'bid': quote.bid,
+            'ask': quote.ask,
+            'change': change,
+            'change_percent': change / quote.close * 100 if quote.close else 0.0,
+            'volume': quote.volume,
+            'close': quote.close,
+            'seqno': quote.seqno,
+            'timestamp': datetime.fromtimestamp(quote.updated_at).isoformat(),
+            'status': 'success'
+        })
+    
     # TODO: Implement actual AngelOne API integration
     # For now, return sample data
     sample_data = {
@@ -39,63 +68,54 @@ def get_stock_ltp():
     return jsonify(sample_data)
 
 @trading_bp.route('/api/trade/history', methods=['GET'])
+@login_required
 def get_trade_history():
-    """Get user trade statistics and history"""
+    """Get the current user's trade statistics and a page of their trade history"""
+    user_id = current_user.id
     # Get optional query parameters
-    user_id = request.args.get('user_id', '1')
-    limit = request.args.get('limit', '10')
+    limit = request.args.get('limit', 10, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    limit = max(0, min(limit, MAX_HISTORY_LIMIT))
+    offset = max(0, offset)
+    try:
+        fields = parse_fields(request.args.get('fields'), TRADE_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # TODO: Implement actual database query for user trades
-    # For now, return sample data
-    sample_history = {
+    # Aggregate statistics in a single query
+    pnl = func.coalesce(Trade.realized_pnl, 0.0) + func.coalesce(Trade.unrealized_pnl, 0.0)
+    total_trades, profitable_trades, loss_trades, total_pnl = db.session.execute(
+        select(
+            func.count(Trade.id),
+            func.coalesce(func.sum(case((pnl > 0, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((pnl < 0, 1), else_=0)), 0),
+            func.coalesce(func.sum(pnl), 0.0),
+        ).where(Trade.user_id == user_id)
+    ).one()
+    
+    summary = {
         'user_id': user_id,
-        'total_trades': 25,
-        'profitable_trades': 18,
-        'loss_trades': 7,
-        'win_rate': 72.0,
-        'total_pnl': 15670.50,
-        'avg_profit_per_trade': 625.20,
-        'trades': [
-            {
-                'id': 1,
-                'symbol': 'RELIANCE',
-                'type': 'BUY',
-                'quantity': 10,
-                'price': 2440.00,
-                'total_amount': 24400.00,
-                'timestamp': '2024-01-15T10:30:00Z',
-                'status': 'EXECUTED'
-            },
-            {
-                'id': 2,
-                'symbol': 'RELIANCE',
-                'type': 'SELL',
-                'quantity': 10,
-                'price': 2465.00,
-                'total_amount': 24650.00,
-                'pnl': 250.00,
-                'timestamp': '2024-01-15T14:45:00Z',
-                'status': 'EXECUTED'
-            },
-            {
-                'id': 3,
-                'symbol': 'TCS',
-                'type': 'BUY',
-                'quantity': 5,
-                'price': 3680.50,
-                'total_amount': 18402.50,
-                'timestamp': '2024-01-16T11:20:00Z',
-                'status': 'EXECUTED'
-            }
-        ],
+        'total_trades': total_trades,
+        'profitable_trades': profitable_trades,
+        'loss_trades': loss_trades,
+        'win_rate': (profitable_trades / total_trades * 100) if total_trades else 0.0,
+        'total_pnl': total_pnl,
+        'avg_profit_per_trade': (total_pnl / total_trades) if total_trades else 0.0,
+        'limit': limit,
+        'offset': offset,
         'status': 'success'
     }
     
-    # Limit the number of trades returned
-    try:
-        limit_int = int(limit)
-        sample_history['trades'] = sample_history['trades'][:limit_int]
-    except ValueError:
-        pass  # Use default limit if invalid
+    # Stream the page straight from query tuples without hydrating Trade objects,
+    # selecting only the columns behind the requested fields
+    columns, serializer = trade_fieldset(fields)
+    rows = db.session.execute(
+        select(*columns)
+        .where(Trade.user_id == user_id)
+        .order_by(Trade.created_at.desc(), Trade.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
     
-    return jsonify(sample_history)
+    return stream_json_response(summary, 'trades', rows, serializer)
@@ -1,15 +1,81 @@
 """User routes for trading simulation backend."""
 
-from flask import Blueprint
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_login import login_required, current_user
+from app import db
+from app.models.analytics import DailyEquity, PerformanceMetrics
+from app.services.analytics_service import LEADERBOARD_FIELDS, LEADERBOARD_SORTS, get_leaderboard
+from app.services.rating_history import rating_history
+from app.utils.compression import negotiate_encoding
+from app.utils.serialization import parse_fields
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/user')
 
 @user_bp.route('/profile', methods=['GET'])
+@login_required
 def get_profile():
-    """Get user profile endpoint."""
-    return {'message': 'User profile endpoint'}
+    """Get user profile with precomputed performance metrics - GET /api/user/profile"""
+    metrics = db.session.get(PerformanceMetrics, current_user.id)
+    return jsonify({
+        'user': current_user.to_dict(),
+        'performance': metrics.to_dict() if metrics else None
+    }), 200
 
 @user_bp.route('/profile', methods=['PUT'])
 def update_profile():
     """Update user profile endpoint."""
     return {'message': 'Profile updated successfully'}
+
+@user_bp.route('/equity-curve', methods=['GET'])
+@login_required
+def equity_curve():
+    """Daily equity of the current user, oldest first - GET /api/user/equity-curve"""
+    days = max(1, min(request.args.get('days', 365, type=int), 3650))
+    rows = db.session.execute(
+        db.select(DailyEquity)
+        .where(DailyEquity.user_id == current_user.id)
+        .order_by(DailyEquity.day.desc())
+        .limit(days)
+    ).scalars().all()
+    return jsonify({'equity_curve': [row.to_dict() for row in reversed(rows)]}), 200
+
+@user_bp.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    """Users ranked by a precomputed metric - GET /api/user/leaderboard?sort=sharpe_ratio&fields=rank,name"""
+    sort = request.args.get('sort', 'sharpe_ratio')
+    if sort not in LEADERBOARD_SORTS:
+        return jsonify({'error': f"sort must be one of: {', '.join(LEADERBOARD_SORTS)}"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), LEADERBOARD_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    return jsonify({
+        'sort': sort,
+        'limit': limit,
+        'offset': offset,
+        'leaderboard': get_leaderboard(sort, limit, offset, fields)
+    }), 200
+
+@user_bp.route('/<int:user_id>/rating-history', methods=['GET'])
+def rating_history_chart(user_id):
+    """Rating graph of a user, downsampled to a cached chart size of at most `points` - GET /api/user/<id>/rating-history?points=500"""
+    points = request.args.get('points', type=int)
+    if points is not None:
+        points = max(2, min(points, 10000))
+    coding = None
+    if current_app.config.get('COMPRESSION_ENABLED', True):
+        coding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+
+    # Cached bodies are already compressed for the negotiated coding
+    result = rating_history.response_body(user_id, points, coding)
+    if result is None:
+        return jsonify({'error': 'User not found'}), 404
+    body, encoding = result
+    response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,317 @@
+"""
+Analytics Service
+Nightly performance analytics. Each user's end of day equity (ledger cash
+plus positions marked at the latest known price) is written into a compact
+``daily_equity`` table. Returns, volatility, Sharpe ratio, max drawdown and
+win streaks are then computed for all users at once on a (users x days)
+numpy matrix and stored in ``performance_metrics``, so profile and
+leaderboard requests only read precomputed rows.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+
+from app import db
+from app.models.analytics import DailyEquity, PerformanceMetrics
+from app.models.ledger import LedgerEntry
+from app.models.stock import Stock
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Columns the leaderboard can be sorted by (all "higher is better")
+LEADERBOARD_SORTS = {
+    'sharpe_ratio': PerformanceMetrics.sharpe_ratio,
+    'total_return': PerformanceMetrics.total_return,
+    'max_drawdown': PerformanceMetrics.max_drawdown,
+    'longest_win_streak': PerformanceMetrics.longest_win_streak,
+}
+
+# Fields of a leaderboard entry: the user, their rank and `PerformanceMetrics.to_dict`
+_LEADERBOARD_COLUMNS = {
+    'user_id': PerformanceMetrics.user_id,
+    'name': User.name,
+    'rating': User.rating,
+    'as_of': PerformanceMetrics.as_of,
+    'days': PerformanceMetrics.days,
+    'total_return': PerformanceMetrics.total_return,
+    'avg_daily_return': PerformanceMetrics.avg_daily_return,
+    'volatility': PerformanceMetrics.volatility,
+    'sharpe_ratio': PerformanceMetrics.sharpe_ratio,
+    'max_drawdown': PerformanceMetrics.max_drawdown,
+    'best_day': PerformanceMetrics.best_day,
+    'worst_day': PerformanceMetrics.worst_day,
+    'current_win_streak': PerformanceMetrics.current_win_streak,
+    'longest_win_streak': PerformanceMetrics.longest_win_streak,
+}
+LEADERBOARD_FIELDS = ('rank',) + tuple(_LEADERBOARD_COLUMNS)
+
+
+def materialize_daily_equity(day=None):
+    """Write the end of day equity of every user for `day` (default today, UTC).
+
+    Cash and quantities come from the ledger up to the end of the day.
+    Positions are marked at the stock's current price when materializing
+    today, otherwise at the last ledger price of the symbol on that day.
+    Re-running a day replaces its rows.
+
+    Returns:
+        int: Number of rows written
+    """
+    day = day or datetime.utcnow().date()
+    day_end = datetime.combine(day + timedelta(days=1), time.min)
+
+    ledger_cash = select(LedgerEntry.user_id, func.sum(LedgerEntry.cash_delta).label('delta')) \
+        .where(LedgerEntry.created_at < day_end) \
+        .group_by(LedgerEntry.user_id).subquery()
+    cash_rows = db.session.execute(
+        select(User.id, User.initial_balance + func.coalesce(ledger_cash.c.delta, 0.0))
+        .outerjoin(ledger_cash, ledger_cash.c.user_id == User.id)
+        .where(User.created_at < day_end)
+        .order_by(User.id)
+    ).all()
+    if not cash_rows:
+        return 0
+    user_ids = np.array([row[0] for row in cash_rows], dtype=np.int64)
+    cash = np.array([row[1] or 0.0 for row in cash_rows], dtype=np.float64)
+
+    quantity = func.sum(LedgerEntry.quantity_delta)
+    positions = db.session.execute(
+        select(LedgerEntry.user_id, LedgerEntry.symbol, quantity)
+        .where(LedgerEntry.created_at < day_end, LedgerEntry.symbol.is_not(None))
+        .group_by(LedgerEntry.user_id, LedgerEntry.symbol)
+        .having(quantity != 0)
+    ).all()
+
+    positions_value = np.zeros(len(user_ids))
+    if positions:
+        prices = _closing_prices(day, day_end)
+        holders = np.searchsorted(user_ids, [row[0] for row in positions])
+        values = [quantity * prices.get(symbol, 0.0) for _, symbol, quantity in positions]
+        positions_value = np.bincount(holders, weights=values, minlength=len(user_ids))
+
+    equity = cash + positions_value
+    rows = [
+        {'user_id': user_id, 'day': day, 'cash': user_cash,
+         'positions_value': value, 'equity': user_equity}
+        for user_id, user_cash, value, user_equity in zip(
+            user_ids.tolist(), cash.tolist(), positions_value.tolist(), equity.tolist())
+    ]
+    db.session.execute(delete(DailyEquity).where(DailyEquity.day == day))
+    db.session.execute(insert(DailyEquity), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def _closing_prices(day, day_end):
+    """Return {symbol: price} used to mark positions at the end of `day`."""
+    last_entry = select(LedgerEntry.symbol, func.max(LedgerEntry.id).label('id')) \
+        .where(LedgerEntry.created_at < day_end, LedgerEntry.price.is_not(None)) \
+        .group_by(LedgerEntry.symbol).subquery()
+    prices = dict(db.session.execute(
+        select(LedgerEntry.symbol, LedgerEntry.price)
+        .join(last_entry, LedgerEntry.id == last_entry.c.id)
+    ).all())
+    if day >= datetime.utcnow().date():
+        prices.update(db.session.execute(
+            select(Stock.symbol, Stock.current_price).where(Stock.current_price > 0)
+        ).all())
+    return prices
+
+
+def compute_performance_metrics(as_of=None, lookback_days=None):
+    """Recompute the performance metrics of every user from daily equity.
+
+    Args:
+        as_of: Last day to include (default: latest materialized day)
+        lookback_days: Only use this many most recent days (default: all)
+
+    Returns:
+        int: Number of users with metrics
+    """
+    query = select(DailyEquity.user_id, DailyEquity.day, DailyEquity.equity)
+    if as_of is not None:
+        query = query.where(DailyEquity.day <= as_of)
+    if lookback_days:
+        start = (as_of or datetime.utcnow().date()) - timedelta(days=lookback_days)
+        query = query.where(DailyEquity.day > start)
+    rows = db.session.execute(query).all()
+    if not rows:
+        return 0
+
+    user_ids, user_index = np.unique([row[0] for row in rows], return_inverse=True)
+    days, day_index = np.unique([row[1].toordinal() for row in rows], return_inverse=True)
+    equity = np.full((len(user_ids), len(days)), np.nan)
+    equity[user_index, day_index] = [row[2] for row in rows]
+
+    metrics = equity_metrics(
+        equity,
+        risk_free_rate=current_app.config.get('RISK_FREE_RATE', 0.0),
+        min_days=current_app.config.get('ANALYTICS_MIN_DAYS', 5)
+    )
+
+    now = datetime.utcnow()
+    last_day = date.fromordinal(int(days[-1]))
+    records = []
+    for position, user_id in enumerate(user_ids.tolist()):
+        record = {name: _to_python(values[position]) for name, values in metrics.items()}
+        record.update(user_id=user_id, as_of=last_day, updated_at=now)
+        records.append(record)
+
+    db.session.execute(delete(PerformanceMetrics))
+    db.session.execute(insert(PerformanceMetrics), records)
+    db.session.commit()
+    return len(records)
+
+
+def equity_metrics(equity, risk_free_rate=0.0, min_days=5):
+    """Compute performance metrics for every row of an equity matrix.
+
+    Args:
+        equity: (users x days) array; NaN where a user has no value yet.
+            Gaps after a user's first day are carried forward.
+        risk_free_rate: Annual risk-free rate used for the Sharpe ratio
+        min_days: Minimum number of daily returns for volatility and Sharpe
+
+    Returns:
+        dict: Metric name -> array with one value per user (NaN = unknown)
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    users, days = equity.shape
+    rows = np.arange(users)[:, None]
+
+    # Carry the last known equity over missing days
+    present = ~np.isnan(equity)
+    last_seen = np.maximum.accumulate(np.where(present, np.arange(days), 0), axis=1)
+    equity = equity[rows, last_seen]
+    present = ~np.isnan(equity)
+
+    first = equity[np.arange(users), present.argmax(axis=1)]
+    last = equity[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = np.where(first > 0, last / first - 1.0, np.nan)
+        returns = equity[:, 1:] / equity[:, :-1] - 1.0
+    returns[~np.isfinite(returns)] = np.nan
+
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=1)
+    filled = np.where(valid, returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = filled.sum(axis=1) / count
+        variance = (np.where(valid, returns - mean[:, None], 0.0) ** 2).sum(axis=1) / (count - 1)
+        std = np.sqrt(variance)
+        daily_risk_free = risk_free_rate / TRADING_DAYS_PER_YEAR
+        sharpe = (mean - daily_risk_free) / std * np.sqrt(TRADING_DAYS_PER_YEAR)
+    enough = (count >= max(min_days, 2))
+    volatility = np.where(enough, std * np.sqrt(TRADING_DAYS_PER_YEAR), np.nan)
+    sharpe = np.where(enough & (std > 0), sharpe, np.nan)
+
+    peak = np.fmax.accumulate(equity, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(present & (peak > 0), equity / peak - 1.0, 0.0)
+    max_drawdown = drawdown.min(axis=1) if days else np.zeros(users)
+
+    # Win streaks: running count of positive days, reset on every other day
+    wins = np.nan_to_num(returns, nan=0.0) > 0
+    wins_so_far = np.cumsum(wins, axis=1)
+    at_reset = np.maximum.accumulate(np.where(wins, 0, wins_so_far), axis=1)
+    streak = wins_so_far - at_reset
+    has_returns = count > 0
+
+    return {
+        'days': present.sum(axis=1),
+        'total_return': total_return,
+        'avg_daily_return': np.where(has_returns, mean, np.nan),
+        'volatility': volatility,
+        'sharpe_ratio': sharpe,
+        'max_drawdown': max_drawdown,
+        'best_day': np.where(has_returns, np.where(valid, returns, -np.inf).max(axis=1, initial=-np.inf), np.nan),
+        'worst_day': np.where(has_returns, np.where(valid, returns, np.inf).min(axis=1, initial=np.inf), np.nan),
+        'current_win_streak': streak[:, -1] if days > 1 else np.zeros(users, dtype=np.int64),
+        'longest_win_streak': streak.max(axis=1, initial=0),
+    }
+
+
+def _to_python(value):
+    """Convert a numpy scalar to a Python value, NaN to None."""
+    value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def run_nightly_analytics():
+    """Scheduler job: materialize today's equity and refresh all metrics."""
+    written = materialize_daily_equity()
+    users = compute_performance_metrics(
+        lookback_days=current_app.config.get('ANALYTICS_LOOKBACK_DAYS'))
+    logger.info(f"Materialized {written} daily equity rows, metrics for {users} users")
+
+
+def get_leaderboard(sort='sharpe_ratio', limit=50, offset=0, fields=None):
+    """Return a page of users ranked by a precomputed metric.
+
+    Args:
+        fields: Only select and return these LEADERBOARD_FIELDS (default all)
+    """
+    column = LEADERBOARD_SORTS[sort]
+    fields = fields or LEADERBOARD_FIELDS
+    selected = [field for field in fields if field != 'rank']
+    # A page needs at least one column, even when only ranks were asked for
+    columns = [_LEADERBOARD_COLUMNS[field] for field in selected]
+    if 'user_id' not in selected:
+        columns.append(PerformanceMetrics.user_id)
+    rows = db.session.execute(
+        select(*columns)
+        .select_from(PerformanceMetrics)
+        .join(User, User.id == PerformanceMetrics.user_id)
+        .where(User.is_active.is_(True))
+        .order_by(column.is_(None), column.desc(), PerformanceMetrics.user_id)
+        .limit(limit).offset(offset)
+    ).all()
+    with_rank = 'rank' in fields
+    with_as_of = 'as_of' in fields
+    page = []
+    for rank, row in enumerate(rows, start=offset + 1):
+        entry = dict(zip(selected, row))  # Drops the added user_id column
+        if with_as_of and entry['as_of'] is not None:
+            entry['as_of'] = entry['as_of'].isoformat()
+        if with_rank:
+            entry['rank'] = rank
+        page.append(entry)
+    return page
+
+
+def register_analytics_jobs(scheduler, app):
+    """Register the nightly analytics job."""
+    scheduler.add_job('nightly_analytics', run_nightly_analytics,
+                      daily_at=app.config.get('ANALYTICS_TIME', '10:30'))
+
+
+analytics_cli = AppGroup('analytics', help='Performance analytics.')
+
+
+@analytics_cli.command('materialize')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day to backfill.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day (default today).')
+def materialize_command(start, end):
+    """Materialize daily equity for one day or a range of days."""
+    end_day = end.date() if end else datetime.utcnow().date()
+    day = start.date() if start else end_day
+    while day <= end_day:
+        click.echo(f"{day}: {materialize_daily_equity(day)} rows")
+        day += timedelta(days=1)
+
+
+@analytics_cli.command('compute')
+@click.option('--lookback-days', type=int, help='Only use the most recent days.')
+def compute_command(lookback_days):
+    """Recompute performance metrics from daily equity."""
+    click.echo(f"Metrics for {compute_performance_metrics(lookback_days=lookback_days)} users")
@@ -0,0 +1,365 @@
+"""
+Contest Engine
+Runs trading contests in isolated in-memory sandboxes. Every participant
+gets a virtual cash balance and positions that exist only inside the contest,
+and live standings are kept sorted incrementally as fills arrive, so reading
+the leaderboard never requires re-ranking everyone.
+
+Contests can run in the calling process (`ContestEngine`) or be sharded by
+contest id across worker processes (`ShardedContestEngine`); both expose the
+same methods. The application uses the in-process `contest_engine`, one per
+web process, rebuilt from the database by `contest_service.sync_sandbox`;
+the sharded engine is only driven by ``benchmarks/sim_contests.py``.
+Finalization returns every participant's result in one batch for
+`RatingService.apply_contest_results`.
+"""
+import multiprocessing
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from concurrent.futures import Future
+
+ContestResult = namedtuple('ContestResult', [
+    'user_id', 'rank', 'final_equity', 'profit_percentage', 'trades_count', 'win_rate'
+])
+
+
+class ContestError(Exception):
+    """Raised when a contest operation is not allowed (e.g. insufficient cash)."""
+
+
+class _Account:
+    """Cash and positions of one participant inside one contest."""
+
+    __slots__ = ('user_id', 'cash', 'positions', 'equity', 'trades', 'wins')
+
+    def __init__(self, user_id, cash):
+        self.user_id = user_id
+        self.cash = cash
+        self.positions = {}  # symbol -> [quantity, avg_price]
+        self.equity = cash
+        self.trades = 0
+        self.wins = 0
+
+
+class ContestSandbox:
+    """Isolated balances, positions and live standings for one contest."""
+
+    def __init__(self, contest_id, starting_balance):
+        self.contest_id = contest_id
+        self.starting_balance = starting_balance
+        self.accounts = {}
+        self.marks = {}    # symbol -> last price
+        self.holders = {}  # symbol -> set of user ids holding it
+        # Sorted (-equity, user_id) keys; index + 1 is the standing
+        self._standings = []
+
+    def join(self, user_id):
+        """Add a participant with the contest's starting balance."""
+        if user_id in self.accounts:
+            return self.accounts[user_id]
+        account = _Account(user_id, self.starting_balance)
+        self.accounts[user_id] = account
+        insort(self._standings, (-account.equity, user_id))
+        return account
+
+    def apply_fill(self, user_id, symbol, quantity, price):
+        """Apply a fill; positive quantity buys, negative sells.
+
+        Buys need enough contest cash and sells enough held quantity.
+        Only the filling participant's standing is updated.
+        """
+        account = self.accounts.get(user_id)
+        if account is None:
+            raise ContestError(f"User {user_id} has not joined contest {self.contest_id}")
+        if quantity == 0 or price <= 0:
+            raise ContestError('Quantity must be non-zero and price positive')
+
+        position = account.positions.get(symbol)
+        held = position[0] if position else 0
+        if quantity > 0 and quantity * price > account.cash:
+            raise ContestError('Insufficient contest balance')
+        if quantity < 0 and -quantity > held:
+            raise ContestError('Insufficient contest position')
+
+        if quantity > 0:
+            if position is None:
+                account.positions[symbol] = [quantity, price]
+                self.holders.setdefault(symbol, set()).add(user_id)
+            else:
+                position[1] = (held * position[1] + quantity * price) / (held + quantity)
+                position[0] = held + quantity
+        else:
+            if price > position[1]:
+                account.wins += 1
+            position[0] = held + quantity
+            if position[0] == 0:
+                del account.positions[symbol]
+                self.holders[symbol].discard(user_id)
+
+        account.cash -= quantity * price
+        account.trades += 1
+        self.marks[symbol] = price
+        self._revalue(account)
+
+    def update_marks(self, prices):
+        """Revalue the holders of the given symbols at new prices."""
+        affected = set()
+        for symbol, price in prices.items():
+            self.marks[symbol] = price
+            affected.update(self.holders.get(symbol, ()))
+        for user_id in affected:
+            self._revalue(self.accounts[user_id])
+
+    def _revalue(self, account):
+        equity = account.cash
+        for symbol, (quantity, avg_price) in account.positions.items():
+            equity += quantity * self.marks.get(symbol, avg_price)
+        if equity == account.equity:
+            return
+        # Move this participant's key within the sorted standings
+        old_key = (-account.equity, account.user_id)
+        del self._standings[bisect_left(self._standings, old_key)]
+        account.equity = equity
+        insort(self._standings, (-equity, account.user_id))
+
+    def rank_of(self, user_id):
+        """Return the standing of a participant (ties share the better rank)."""
+        account = self.accounts[user_id]
+        return bisect_left(self._standings, (-account.equity, -1)) + 1
+
+    def standings(self, limit=50, offset=0):
+        """Return a page of the live leaderboard."""
+        page = []
+        for neg_equity, user_id in self._standings[offset:offset + limit]:
+            equity = -neg_equity
+            page.append({
+                'user_id': user_id,
+                'rank': bisect_left(self._standings, (neg_equity, -1)) + 1,
+                'equity': equity,
+                'profit_percentage': self._profit_percentage(equity)
+            })
+        return page
+
+    def _profit_percentage(self, equity):
+        if not self.starting_balance:
+            return 0.0
+        return (equity - self.starting_balance) / self.starting_balance * 100
+
+    def results(self):
+        """Return final results for every participant, in standings order."""
+        results = []
+        rank = 0
+        previous_equity = None
+        for position, (neg_equity, user_id) in enumerate(self._standings, start=1):
+            equity = -neg_equity
+            if equity != previous_equity:
+                rank, previous_equity = position, equity
+            account = self.accounts[user_id]
+            results.append(ContestResult(
+                user_id=user_id,
+                rank=rank,
+                final_equity=equity,
+                profit_percentage=self._profit_percentage(equity),
+                trades_count=account.trades,
+                win_rate=(account.wins / account.trades * 100) if account.trades else 0.0
+            ))
+        return results
+
+
+class ContestEngine:
+    """Holds the sandboxes of all contests run by this process."""
+
+    def __init__(self):
+        self.sandboxes = {}
+        self._lock = threading.Lock()
+
+    def create_contest(self, contest_id, starting_balance):
+        with self._lock:
+            if contest_id not in self.sandboxes:
+                self.sandboxes[contest_id] = ContestSandbox(contest_id, starting_balance)
+
+    def join(self, contest_id, user_id):
+        with self._lock:
+            self._sandbox(contest_id).join(user_id)
+
+    def join_many(self, contest_id, user_ids):
+        with self._lock:
+            sandbox = self._sandbox(contest_id)
+            for user_id in user_ids:
+                sandbox.join(user_id)
+
+    def apply_fill(self, contest_id, user_id, symbol, quantity, price):
+        with self._lock:
+            self._sandbox(contest_id).apply_fill(user_id, symbol, quantity, price)
+
+    def apply_fills(self, contest_id, fills):
+        """Apply (user_id, symbol, quantity, price) fills; return the number rejected."""
+        rejected = 0
+        with self._lock:
+            sandbox = self._sandbox(contest_id)
+            for fill in fills:
+                try:
+                    sandbox.apply_fill(*fill)
+                except ContestError:
+                    rejected += 1
+        return rejected
+
+    def apply_fills_async(self, contest_id, fills):
+        """Like `apply_fills`, returning a Future of the number rejected."""
+        future = Future()
+        try:
+            future.set_result(self.apply_fills(contest_id, fills))
+        except ContestError as e:
+            future.set_exception(e)
+        return future
+
+    def update_marks(self, contest_id, prices):
+        with self._lock:
+            self._sandbox(contest_id).update_marks(prices)
+
+    def standings(self, contest_id, limit=50, offset=0):
+        with self._lock:
+            return self._sandbox(contest_id).standings(limit, offset)
+
+    def rank_of(self, contest_id, user_id):
+        with self._lock:
+            return self._sandbox(contest_id).rank_of(user_id)
+
+    def finalize(self, contest_id):
+        """Close a contest and return its results; the sandbox is discarded."""
+        with self._lock:
+            sandbox = self.sandboxes.pop(contest_id, None)
+        return sandbox.results() if sandbox is not None else []
+
+    def discard(self, contest_id):
+        """Drop a sandbox without results, e.g. to rebuild it from the database."""
+        with self._lock:
+            self.sandboxes.pop(contest_id, None)
+
+    def has_contest(self, contest_id):
+        return contest_id in self.sandboxes
+
+    def _sandbox(self, contest_id):
+        sandbox = self.sandboxes.get(contest_id)
+        if sandbox is None:
+            raise ContestError(f"Contest {contest_id} is not running")
+        return sandbox
+
+
+def _shard_main(inbox, outbox):
+    """Worker process loop: owns the sandboxes of the contests routed to it."""
+    engine = ContestEngine()
+    while True:
+        message = inbox.get()
+        if message is None:
+            return
+        request_id, method, args = message
+        try:
+            result = getattr(engine, method)(*args)
+            error = None
+        except Exception as e:
+            result, error = None, f'{type(e).__name__}: {e}'
+        if request_id is not None:
+            outbox.put((request_id, result, error))
+
+
+class ShardedContestEngine:
+    """Runs contests in worker processes, sharded by contest id.
+
+    Each contest lives entirely in one shard, so fills for different contests
+    are processed in parallel without locking across processes. Every method
+    waits for its result; ``apply_fills_async`` returns a Future instead, so
+    callers can stream fills without waiting for each batch.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        context = multiprocessing.get_context()
+        self._outbox = context.Queue()
+        self._inboxes = [context.Queue() for _ in range(self.workers)]
+        self._processes = [
+            context.Process(target=_shard_main, args=(inbox, self._outbox), daemon=True)
+            for inbox in self._inboxes
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._futures = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._listener = threading.Thread(target=self._collect, daemon=True)
+        self._listener.start()
+
+    def shard_for(self, contest_id):
+        return contest_id % self.workers
+
+    def _call(self, contest_id, method, *args):
+        future = Future()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._futures[request_id] = future
+        self._inboxes[self.shard_for(contest_id)].put((request_id, method, (contest_id,) + args))
+        return future
+
+    def _collect(self):
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            request_id, result, error = message
+            with self._lock:
+                future = self._futures.pop(request_id)
+            if error is not None:
+                future.set_exception(ContestError(error))
+            else:
+                future.set_result(result)
+
+    def create_contest(self, contest_id, starting_balance):
+        return self._call(contest_id, 'create_contest', starting_balance).result()
+
+    def join(self, contest_id, user_id):
+        return self._call(contest_id, 'join', user_id).result()
+
+    def join_many(self, contest_id, user_ids):
+        """Join many participants with a single message to the shard."""
+        return self._call(contest_id, 'join_many', list(user_ids)).result()
+
+    def apply_fill(self, contest_id, user_id, symbol, quantity, price):
+        return self._call(contest_id, 'apply_fill', user_id, symbol, quantity, price).result()
+
+    def apply_fills(self, contest_id, fills):
+        return self.apply_fills_async(contest_id, fills).result()
+
+    def apply_fills_async(self, contest_id, fills):
+        return self._call(contest_id, 'apply_fills', list(fills))
+
+    def update_marks(self, contest_id, prices):
+        return self._call(contest_id, 'update_marks', prices).result()
+
+    def standings(self, contest_id, limit=50, offset=0):
+        return self._call(contest_id, 'standings', limit, offset).result()
+
+    def rank_of(self, contest_id, user_id):
+        return self._call(contest_id, 'rank_of', user_id).result()
+
+    def finalize(self, contest_id):
+        return self._call(contest_id, 'finalize').result()
+
+    def discard(self, contest_id):
+        return self._call(contest_id, 'discard').result()
+
+    def has_contest(self, contest_id):
+        return self._call(contest_id, 'has_contest').result()
+
+    def shutdown(self):
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join()
+        self._outbox.put(None)
+        self._listener.join()
+
+
+contest_engine = ContestEngine()
@@ -0,0 +1,248 @@
+"""
+Contest Service
+Database side of contests: creating contests, registering participants,
+placing contest orders and finalizing contests whose window has closed.
+Live trading state is held by the contest engine; finalization hands all
+results to the rating service in a single batch.
+
+Sandboxes live in the memory of one process, while entries and fills are
+committed to ``contest_entries`` and ``contest_trades``. `sync_sandbox`
+rebuilds a sandbox that this process does not hold (after a restart, or for
+contests joined and traded through other workers) and brings a held one up
+to date with rows committed since its last sync and with the latest stock
+prices, so standings, orders and finalization see every committed fill.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+
+from app import db
+from app.models.contest import Contest, ContestEntry, ContestStatus, ContestTrade
+from app.models.stock import Stock
+from app.models.user import User
+from app.services.contest_engine import ContestError, contest_engine
+from app.services.notification_service import notifications
+from app.services.rating_service import RatingService
+
+logger = logging.getLogger(__name__)
+
+# Rows are re-read for this long after a sync, so ones that commit out of id
+# order (concurrent transactions) are still applied
+SYNC_GRACE = timedelta(seconds=60)
+
+
+class _SyncState:
+    """What this process's sandbox of one contest has applied."""
+
+    __slots__ = ('entry_id', 'fill_id', 'synced_at', 'recent')
+
+    def __init__(self):
+        self.entry_id = 0
+        self.fill_id = 0
+        self.synced_at = None
+        self.recent = {}  # Fill id -> created_at, for fills inside the grace window
+
+
+_sync_states = {}  # Contest id -> _SyncState
+_sync_lock = threading.RLock()
+
+
+def create_contest(name, starts_at, duration_minutes, starting_balance=100000.0, engine=None):
+    """Create a contest and its sandbox."""
+    engine = engine or contest_engine
+    contest = Contest(name=name, starts_at=starts_at,
+                      ends_at=starts_at + timedelta(minutes=duration_minutes),
+                      starting_balance=starting_balance)
+    db.session.add(contest)
+    db.session.commit()
+    engine.create_contest(contest.id, contest.starting_balance)
+    return contest
+
+
+def sync_sandbox(contest, engine=None):
+    """Create or update this process's sandbox of a contest from the database."""
+    engine = engine or contest_engine
+    with _sync_lock:
+        state = _sync_states.get(contest.id)
+        if state is None or not engine.has_contest(contest.id):
+            engine.discard(contest.id)
+            state = _sync_states[contest.id] = _SyncState()
+            engine.create_contest(contest.id, contest.starting_balance)
+        now = datetime.utcnow()
+        new_entries = ContestEntry.id > state.entry_id
+        new_fills = ContestTrade.id > state.fill_id
+        if state.synced_at is not None:
+            since = state.synced_at - SYNC_GRACE
+            new_entries = or_(new_entries, ContestEntry.joined_at >= since)
+            new_fills = or_(new_fills, ContestTrade.created_at >= since)
+
+        # Joining is idempotent, so entries in the grace window are simply joined again
+        entries = db.session.execute(
+            select(ContestEntry.id, ContestEntry.user_id)
+            .where(ContestEntry.contest_id == contest.id, new_entries)
+        ).all()
+        if entries:
+            engine.join_many(contest.id, [user_id for _, user_id in entries])
+            state.entry_id = max(state.entry_id, max(entry_id for entry_id, _ in entries))
+
+        fills = []
+        for fill_id, user_id, symbol, quantity, price, created_at in db.session.execute(
+            select(ContestTrade.id, ContestTrade.user_id, ContestTrade.symbol,
+                   ContestTrade.quantity, ContestTrade.price, ContestTrade.created_at)
+            .where(ContestTrade.contest_id == contest.id, new_fills)
+            .order_by(ContestTrade.id)
+        ):
+            if fill_id in state.recent:
+                continue
+            fills.append((user_id, symbol, quantity, price))
+            state.fill_id = max(state.fill_id, fill_id)
+            state.recent[fill_id] = created_at or now
+        if fills:
+            rejected = engine.apply_fills(contest.id, fills)
+            if rejected:
+                logger.warning(f"Contest {contest.id}: sandbox rejected {rejected} committed fills")
+
+        # Revalue holders at the latest prices of the symbols traded in the contest
+        traded = select(ContestTrade.symbol).where(ContestTrade.contest_id == contest.id).distinct()
+        prices = {
+            symbol: price for symbol, price in db.session.execute(
+                select(Stock.symbol, Stock.current_price).where(Stock.symbol.in_(traded)))
+            if price
+        }
+        if prices:
+            engine.update_marks(contest.id, prices)
+
+        # Fills older than the grace window are never read again
+        state.recent = {fill_id: created_at for fill_id, created_at in state.recent.items()
+                        if created_at >= now - 2 * SYNC_GRACE}
+        state.synced_at = now
+
+
+def final_standings(contest, limit=50, offset=0):
+    """Return a page of a finalized contest's results, as stored on its entries."""
+    rows = db.session.execute(
+        select(ContestEntry.user_id, ContestEntry.rank, ContestEntry.final_equity,
+               ContestEntry.profit_percentage)
+        .where(ContestEntry.contest_id == contest.id)
+        .order_by(ContestEntry.rank, ContestEntry.user_id)
+        .limit(limit).offset(offset)
+    )
+    return [{'user_id': user_id, 'rank': rank, 'equity': equity, 'profit_percentage': profit_percentage}
+            for user_id, rank, equity, profit_percentage in rows]
+
+
+def join_contest(contest, user_id, engine=None):
+    """Register a user for a contest that has not finished yet."""
+    engine = engine or contest_engine
+    if contest.status == ContestStatus.FINALIZED or datetime.utcnow() >= contest.ends_at:
+        raise ContestError('Contest has already ended')
+
+    exists = db.session.execute(
+        select(ContestEntry.id).filter_by(contest_id=contest.id, user_id=user_id)
+    ).first()
+    if exists is None:
+        db.session.add(ContestEntry(contest_id=contest.id, user_id=user_id))
+        db.session.commit()
+    sync_sandbox(contest, engine)
+
+
+def place_contest_order(contest, user_id, symbol, quantity, price, engine=None):
+    """Fill a contest order at `price`; positive quantity buys, negative sells.
+
+    The fill is checked against the participant's contest cash and position,
+    applied to the sandbox and committed as a `ContestTrade`. The check runs
+    against this process's sandbox, so two workers filling the same
+    participant at the same moment may both pass it.
+
+    Raises:
+        ContestError: If the contest is not running or the sandbox rejects the fill
+    """
+    engine = engine or contest_engine
+    if not contest.is_running():
+        raise ContestError('Contest is not running')
+    with _sync_lock:
+        sync_sandbox(contest, engine)
+        engine.apply_fill(contest.id, user_id, symbol, quantity, price)
+        trade = ContestTrade(contest.id, user_id, symbol, quantity, price)
+        db.session.add(trade)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # The sandbox holds a fill that was never committed
+            engine.discard(contest.id)
+            raise
+        state = _sync_states[contest.id]
+        state.recent[trade.id] = trade.created_at
+        state.fill_id = max(state.fill_id, trade.id)
+    return trade
+
+
+def finalize_contest(contest, engine=None):
+    """Close a contest, rank everyone and apply rating changes in one batch."""
+    engine = engine or contest_engine
+    with _sync_lock:
+        sync_sandbox(contest, engine)
+        results = engine.finalize(contest.id)
+        _sync_states.pop(contest.id, None)
+    changes = RatingService().apply_contest_results(contest, results)
+
+    if notifications.enabled and results:
+        users = {
+            row.id: row for row in db.session.execute(
+                select(User.id, User.name, User.email, User.rating).where(User.id.in_(changes.keys()))
+            )
+        }
+        for result in results:
+            user = users.get(result.user_id)
+            if user is not None:
+                notifications.notify_contest_result(user, contest.name, result.rank, len(results))
+                notifications.notify_rating_change(user, user.rating - changes[user.id], user.rating,
+                                                   contest.name)
+
+    logger.info(f"Finalized contest {contest.id} with {len(results)} participants")
+    return results
+
+
+def start_due_contests(now=None):
+    """Mark contests whose window has opened as running."""
+    now = now or datetime.utcnow()
+    contests = db.session.execute(
+        select(Contest).where(Contest.status == ContestStatus.UPCOMING,
+                              Contest.starts_at <= now)
+    ).scalars().all()
+    for contest in contests:
+        contest.status = ContestStatus.RUNNING
+    db.session.commit()
+    for contest in contests:
+        sync_sandbox(contest)
+    return len(contests)
+
+
+def finalize_due_contests(now=None):
+    """Finalize every contest whose window has closed.
+
+    Sandboxes this process does not hold are rebuilt from the database first.
+    """
+    now = now or datetime.utcnow()
+    contests = db.session.execute(
+        select(Contest).where(Contest.status != ContestStatus.FINALIZED,
+                              Contest.ends_at <= now)
+    ).scalars().all()
+    for contest in contests:
+        finalize_contest(contest)
+    return len(contests)
+
+
+def run_contest_jobs():
+    """Scheduler job: open due contests and finalize finished ones."""
+    start_due_contests()
+    finalize_due_contests()
+
+
+def register_contest_jobs(scheduler, app):
+    """Register the contest rating job with the scheduler."""
+    scheduler.add_job('contest_ratings', run_contest_jobs,
+                      interval=app.config.get('CONTEST_JOB_INTERVAL', 30))
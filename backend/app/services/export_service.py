@@ -0,0 +1,145 @@
+"""
+Export Service
+Full trade and rating exports. Rows are read through a server-side cursor
+(``stream_results`` with ``yield_per``) and written incrementally as CSV or
+Parquet, for a single user from the API or for every user from the offline
+``flask export`` command, which splits users into shards dumped in parallel
+worker processes.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import create_engine, select
+
+from app import db
+from app.models.rating import Rating
+from app.models.trade import Trade
+from app.utils.exporters import (
+    EXPORT_FORMATS, RATING_EXPORT_FIELDS, TRADE_EXPORT_FIELDS, available_formats,
+    iter_export, parse_date_range, write_export
+)
+from app.utils.serialization import (
+    STREAM_CHUNK_SIZE, rating_columns, serialize_rating_row, serialize_trade_row, trade_columns
+)
+
+logger = logging.getLogger(__name__)
+
+# Exportable datasets: model, selected columns, row serializer, column types
+EXPORTS = {
+    'trades': (Trade, trade_columns, serialize_trade_row, TRADE_EXPORT_FIELDS),
+    'ratings': (Rating, rating_columns, serialize_rating_row, RATING_EXPORT_FIELDS),
+}
+
+
+def export_query(kind, user_id=None, start=None, end=None, shard=None, shards=None):
+    """Build the select for an export, ordered to match the (user_id, created_at) index."""
+    model, columns, _, _ = EXPORTS[kind]
+    query = select(*columns())
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    if shards:
+        query = query.where(model.user_id % shards == shard)
+    if start is not None:
+        query = query.where(model.created_at >= start)
+    if end is not None:
+        query = query.where(model.created_at <= end)
+    return query.order_by(model.user_id, model.created_at, model.id)
+
+
+def stream_user_export(kind, user_id, export_format, start=None, end=None):
+    """Yield one user's export as byte chunks, reading rows with a server-side cursor."""
+    _, _, serializer, fields = EXPORTS[kind]
+    rows = db.session.execute(
+        export_query(kind, user_id=user_id, start=start, end=end)
+        .execution_options(stream_results=True, yield_per=STREAM_CHUNK_SIZE)
+    )
+    return iter_export(rows, serializer, fields, export_format)
+
+
+def export_filename(kind, export_format, suffix=''):
+    """Return the file name of an export."""
+    return f"{kind}{suffix}.{EXPORT_FORMATS[export_format][1]}"
+
+
+class _CountingRows:
+    """Iterate rows while counting them."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def _export_shard(database_uri, kind, shard, shards, export_format, output_dir, start, end):
+    """Worker process: dump one user shard to its own file."""
+    _, _, serializer, fields = EXPORTS[kind]
+    path = os.path.join(output_dir, export_filename(kind, export_format, f'-{shard:03d}-of-{shards:03d}'))
+    engine = create_engine(database_uri)
+    try:
+        with engine.connect() as connection:
+            rows = _CountingRows(connection.execute(
+                export_query(kind, start=start, end=end, shard=shard, shards=shards)
+                .execution_options(stream_results=True, yield_per=STREAM_CHUNK_SIZE)
+            ))
+            size = write_export(path, rows, serializer, fields, export_format)
+    finally:
+        engine.dispose()
+    return path, rows.count, size
+
+
+def export_all(kind, output_dir, export_format='csv', workers=None, start=None, end=None):
+    """Export every user's rows, one file per user shard, in parallel.
+
+    Users are assigned to shards by ``user_id % workers`` and each shard is
+    written by its own process with its own database connection.
+
+    Returns:
+        list: (path, rows, bytes) per shard
+    """
+    workers = workers or os.cpu_count() or 1
+    # The URL Flask-SQLAlchemy resolved; relative SQLite paths point into the instance folder
+    database_uri = db.engine.url.render_as_string(hide_password=False)
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_export_shard, database_uri, kind, shard, workers,
+                            export_format, output_dir, start, end)
+            for shard in range(workers)
+        ]
+        return [future.result() for future in futures]
+
+
+export_cli = AppGroup('export', help='Offline data exports.')
+
+
+@export_cli.command('dump')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--output-dir', default='exports', show_default=True, help='Directory for shard files.')
+@click.option('--format', 'export_format', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv',
+              show_default=True)
+@click.option('--workers', type=int, help='Number of user shards / processes (default: CPU count).')
+@click.option('--start', help='Only rows created at or after this ISO date.')
+@click.option('--end', help='Only rows created at or before this ISO date.')
+def dump_command(kind, output_dir, export_format, workers, start, end):
+    """Dump all users' trades or ratings, sharded by user."""
+    if export_format not in available_formats():
+        raise click.ClickException(f"{export_format} export is not available (install pyarrow)")
+    try:
+        start_at, end_at = parse_date_range(start, end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    began = time.perf_counter()
+    shards = export_all(kind, output_dir, export_format, workers, start_at, end_at)
+    for path, rows, size in shards:
+        click.echo(f"{path}: {rows} rows, {size} bytes")
+    total = sum(rows for _, rows, _ in shards)
+    click.echo(f"Exported {total} {kind} in {time.perf_counter() - began:.1f}s")
@@ -0,0 +1,333 @@
+"""
+Ledger Service
+Queries and maintenance on top of the append-only ledger: periodic balance
+snapshots, point-in-time portfolio reconstruction (latest snapshot plus a
+short tail of entries) and a rebuild tool that recomputes
+``users.current_balance`` from the ledger and reports mismatches.
+
+Databases that predate the ledger are opened with `open_ledger`, which
+records every existing user's pre-ledger cash and positions as one opening
+``ADJUSTMENT`` entry each, so the ledger accounts for the whole history.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app import db
+from app.models.ledger import BalanceSnapshot, LedgerEntry, LedgerEntryType
+from app.models.portfolio import Portfolio
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Balances within this tolerance are considered equal
+BALANCE_TOLERANCE = 1e-6
+
+# Note of the entries that carry a user's pre-ledger balance and positions
+OPENING_NOTE = 'Opening balance'
+
+# Entries are committed in id order only approximately (concurrent
+# transactions), so snapshots stay this far behind the newest entries
+SNAPSHOT_GRACE = timedelta(seconds=60)
+
+
+def _latest_snapshots(user_ids, as_of=None):
+    """Return {user_id: BalanceSnapshot row} of the latest snapshot per user."""
+    if not user_ids:
+        return {}
+    latest = select(BalanceSnapshot.user_id, func.max(BalanceSnapshot.id).label('id')) \
+        .where(BalanceSnapshot.user_id.in_(user_ids))
+    if as_of is not None:
+        latest = latest.where(BalanceSnapshot.as_of <= as_of)
+    latest = latest.group_by(BalanceSnapshot.user_id).subquery()
+    rows = db.session.execute(
+        select(BalanceSnapshot.user_id, BalanceSnapshot.last_entry_id, BalanceSnapshot.cash,
+               BalanceSnapshot.positions)
+        .join(latest, BalanceSnapshot.id == latest.c.id)
+    )
+    return {row.user_id: row for row in rows}
+
+
+def take_snapshots():
+    """Snapshot every user with ledger entries since their last snapshot.
+
+    New state is the previous snapshot (or the initial balance) plus the
+    aggregated tail, computed with two grouped queries rather than by
+    replaying entries per user.
+
+    Only entries created more than ``SNAPSHOT_GRACE`` ago are included, so
+    an entry that commits after one with a higher id is not skipped.
+
+    Returns:
+        int: Number of snapshots written
+    """
+    watermark = db.session.execute(
+        select(func.max(LedgerEntry.id))
+        .where(LedgerEntry.created_at <= datetime.utcnow() - SNAPSHOT_GRACE)
+    ).scalar()
+    if watermark is None:
+        return 0
+
+    last_snapshot = select(BalanceSnapshot.user_id,
+                           func.max(BalanceSnapshot.last_entry_id).label('last_entry_id')) \
+        .group_by(BalanceSnapshot.user_id).subquery()
+    tail_filter = (
+        LedgerEntry.id <= watermark,
+        LedgerEntry.id > func.coalesce(last_snapshot.c.last_entry_id, 0),
+    )
+
+    cash_tail = dict(db.session.execute(
+        select(LedgerEntry.user_id, func.sum(LedgerEntry.cash_delta))
+        .outerjoin(last_snapshot, last_snapshot.c.user_id == LedgerEntry.user_id)
+        .where(*tail_filter)
+        .group_by(LedgerEntry.user_id)
+    ).all())
+    if not cash_tail:
+        return 0
+
+    position_tail = defaultdict(dict)
+    for user_id, symbol, quantity in db.session.execute(
+        select(LedgerEntry.user_id, LedgerEntry.symbol, func.sum(LedgerEntry.quantity_delta))
+        .outerjoin(last_snapshot, last_snapshot.c.user_id == LedgerEntry.user_id)
+        .where(*tail_filter, LedgerEntry.symbol.is_not(None))
+        .group_by(LedgerEntry.user_id, LedgerEntry.symbol)
+    ):
+        position_tail[user_id][symbol] = quantity
+
+    user_ids = list(cash_tail)
+    previous = _latest_snapshots(user_ids)
+    initial = dict(db.session.execute(
+        select(User.id, User.initial_balance).where(User.id.in_(user_ids))
+    ).all())
+
+    now = datetime.utcnow()
+    rows = []
+    for user_id, cash_delta in cash_tail.items():
+        snapshot = previous.get(user_id)
+        cash = snapshot.cash if snapshot else initial.get(user_id, 0.0)
+        positions = dict(snapshot.positions) if snapshot else {}
+        for symbol, quantity in position_tail[user_id].items():
+            positions[symbol] = positions.get(symbol, 0) + quantity
+        rows.append({
+            'user_id': user_id,
+            'last_entry_id': watermark,
+            'as_of': now,
+            'cash': cash + (cash_delta or 0.0),
+            'positions': {symbol: qty for symbol, qty in positions.items() if qty},
+        })
+
+    db.session.execute(insert(BalanceSnapshot), rows)
+    db.session.commit()
+    logger.info(f"Wrote {len(rows)} balance snapshots up to ledger entry {watermark}")
+    return len(rows)
+
+
+def portfolio_as_of(user_id, as_of):
+    """Reconstruct a user's cash and positions at a point in time.
+
+    Uses the latest snapshot taken at or before `as_of` and only aggregates
+    the ledger entries recorded after it.
+
+    Returns:
+        dict: cash, positions and how the state was derived, or None if the
+        user does not exist
+    """
+    initial_balance = db.session.execute(
+        select(User.initial_balance).where(User.id == user_id)
+    ).scalar()
+    if initial_balance is None:
+        return None
+
+    snapshot = _latest_snapshots([user_id], as_of).get(user_id)
+    after_id = snapshot.last_entry_id if snapshot else 0
+    cash = snapshot.cash if snapshot else initial_balance
+    positions = dict(snapshot.positions) if snapshot else {}
+
+    tail = (LedgerEntry.user_id == user_id, LedgerEntry.id > after_id, LedgerEntry.created_at <= as_of)
+    tail_count, cash_delta = db.session.execute(
+        select(func.count(LedgerEntry.id), func.coalesce(func.sum(LedgerEntry.cash_delta), 0.0))
+        .where(*tail)
+    ).one()
+    for symbol, quantity in db.session.execute(
+        select(LedgerEntry.symbol, func.sum(LedgerEntry.quantity_delta))
+        .where(*tail, LedgerEntry.symbol.is_not(None))
+        .group_by(LedgerEntry.symbol)
+    ):
+        positions[symbol] = positions.get(symbol, 0) + quantity
+
+    return {
+        'user_id': user_id,
+        'as_of': as_of.isoformat(),
+        'cash': cash + cash_delta,
+        'positions': {symbol: qty for symbol, qty in positions.items() if qty},
+        'snapshot_entry_id': snapshot.last_entry_id if snapshot else None,
+        'tail_entries': tail_count
+    }
+
+
+def _opening_state():
+    """Return (time the ledger was opened or None, ids of users with an opening entry)."""
+    opening = (LedgerEntry.entry_type == LedgerEntryType.ADJUSTMENT, LedgerEntry.note == OPENING_NOTE)
+    opened_at = db.session.execute(select(func.min(LedgerEntry.created_at)).where(*opening)).scalar()
+    opened = set(db.session.execute(select(LedgerEntry.user_id).where(*opening).distinct()).scalars())
+    return opened_at, opened
+
+
+def open_ledger():
+    """Record the pre-ledger cash and positions of users without an opening entry.
+
+    The opening cash is whatever ``current_balance`` holds beyond the initial
+    balance and the user's existing ledger entries; opening positions are
+    ``portfolios`` quantities not covered by the ledger. Users that already
+    have an opening entry are skipped, so running it again is harmless.
+
+    Returns:
+        int: Number of users opened
+    """
+    _, opened = _opening_state()
+    ledger_cash = dict(db.session.execute(
+        select(LedgerEntry.user_id, func.sum(LedgerEntry.cash_delta)).group_by(LedgerEntry.user_id)
+    ).all())
+    ledger_positions = {
+        (user_id, symbol): quantity for user_id, symbol, quantity in db.session.execute(
+            select(LedgerEntry.user_id, LedgerEntry.symbol, func.sum(LedgerEntry.quantity_delta))
+            .where(LedgerEntry.symbol.is_not(None))
+            .group_by(LedgerEntry.user_id, LedgerEntry.symbol)
+        )
+    }
+    positions = defaultdict(dict)
+    for user_id, symbol, quantity in db.session.execute(
+        select(Portfolio.user_id, Portfolio.symbol, func.sum(Portfolio.quantity))
+        .group_by(Portfolio.user_id, Portfolio.symbol)
+    ):
+        positions[user_id][symbol] = quantity or 0
+
+    now = datetime.utcnow()
+    rows = []
+    users = 0
+    for user_id, initial_balance, current_balance in db.session.execute(
+        select(User.id, User.initial_balance, User.current_balance)
+    ):
+        if user_id in opened:
+            continue
+        users += 1
+        entry = {'user_id': user_id, 'entry_type': LedgerEntryType.ADJUSTMENT, 'cash_delta': 0.0,
+                 'symbol': None, 'quantity_delta': 0, 'price': None, 'note': OPENING_NOTE,
+                 'created_at': now}
+        # One cash entry per user, even if zero, marks the user as opened
+        rows.append(dict(entry, cash_delta=(current_balance or 0.0) - (initial_balance or 0.0)
+                         - (ledger_cash.get(user_id) or 0.0)))
+        for symbol, quantity in positions[user_id].items():
+            missing = quantity - (ledger_positions.get((user_id, symbol)) or 0)
+            if missing:
+                rows.append(dict(entry, symbol=symbol, quantity_delta=missing))
+
+    if rows:
+        db.session.execute(insert(LedgerEntry), rows)
+        db.session.commit()
+        logger.info(f"Opened the ledger for {users} users with {len(rows)} entries")
+    return users
+
+
+def rebuild_balances(apply=False):
+    """Recompute every user's balance from the ledger and compare.
+
+    Args:
+        apply: Overwrite ``current_balance`` and ``total_profit_loss`` of
+            mismatching users with the ledger values. Users created before
+            the ledger was opened (see `open_ledger`) without an opening
+            entry are never overwritten: their pre-ledger profit and loss is
+            not in the ledger.
+
+    Returns:
+        tuple: (mismatches as (user_id, stored_balance, ledger_balance),
+        ids of mismatching users left unchanged for lack of an opening entry)
+    """
+    ledger_cash = select(LedgerEntry.user_id, func.sum(LedgerEntry.cash_delta).label('delta')) \
+        .group_by(LedgerEntry.user_id).subquery()
+    rows = db.session.execute(
+        select(User.id, User.initial_balance, User.current_balance, User.created_at,
+               func.coalesce(ledger_cash.c.delta, 0.0))
+        .outerjoin(ledger_cash, ledger_cash.c.user_id == User.id)
+    )
+    opened_at, opened = _opening_state()
+
+    mismatches = []
+    unopened = []
+    for user_id, initial_balance, current_balance, created_at, delta in rows:
+        expected = (initial_balance or 0.0) + delta
+        if abs((current_balance or 0.0) - expected) > BALANCE_TOLERANCE:
+            mismatches.append((user_id, current_balance, expected))
+            if user_id not in opened and (opened_at is None or created_at is None
+                                          or created_at < opened_at):
+                unopened.append(user_id)
+
+    skipped = set(unopened)
+    fixes = [mismatch for mismatch in mismatches if mismatch[0] not in skipped]
+    if apply and fixes:
+        users_table = User.__table__
+        db.session.execute(
+            update(users_table)
+            .where(users_table.c.id == bindparam('b_id'))
+            .values(current_balance=bindparam('balance'),
+                    total_profit_loss=bindparam('balance') - users_table.c.initial_balance),
+            [{'b_id': user_id, 'balance': expected} for user_id, _, expected in fixes]
+        )
+        db.session.commit()
+
+    return mismatches, unopened
+
+
+def register_ledger_jobs(scheduler, app):
+    """Register the periodic snapshot job."""
+    scheduler.add_job('ledger_snapshots', take_snapshots,
+                      interval=app.config.get('LEDGER_SNAPSHOT_INTERVAL', 3600))
+
+
+ledger_cli = AppGroup('ledger', help='Trade ledger maintenance.')
+
+
+@ledger_cli.command('snapshot')
+def snapshot_command():
+    """Write balance snapshots for users with new ledger entries."""
+    click.echo(f"Wrote {take_snapshots()} snapshots")
+
+
+@ledger_cli.command('open')
+def open_command():
+    """Record pre-ledger balances and positions as opening entries."""
+    click.echo(f"Opened the ledger for {open_ledger()} users")
+
+
+@ledger_cli.command('rebuild')
+@click.option('--apply', is_flag=True, help='Fix mismatching balances instead of only reporting.')
+def rebuild_command(apply):
+    """Verify users.current_balance against the ledger."""
+    mismatches, unopened = rebuild_balances(apply=apply)
+    for user_id, stored, expected in mismatches:
+        click.echo(f"user {user_id}: stored {stored:.2f}, ledger {expected:.2f}")
+    if not mismatches:
+        click.echo('All balances match the ledger')
+        return
+    if apply:
+        click.echo(f"Fixed {len(mismatches) - len(unopened)} balances")
+    if unopened:
+        click.echo(f"{len(unopened)} users predate the ledger and have no opening entry; "
+                   f"run `flask ledger open` first")
+    if not apply or unopened:
+        raise SystemExit(1)
+
+
+@ledger_cli.command('as-of')
+@click.argument('user_id', type=int)
+@click.argument('timestamp', type=click.DateTime())
+def as_of_command(user_id, timestamp):
+    """Show a user's cash and positions at TIMESTAMP."""
+    state = portfolio_as_of(user_id, timestamp)
+    if state is None:
+        raise click.ClickException(f"User {user_id} not found")
+    click.echo(state)
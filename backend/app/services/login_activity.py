@@ -0,0 +1,115 @@
+"""
+Login Activity
+Write-behind recording of ``users.last_login``. Logins only note the
+timestamp in memory; a background thread per worker process writes all
+pending timestamps with one bulk UPDATE every ``LAST_LOGIN_FLUSH_INTERVAL``
+seconds (or as soon as ``LAST_LOGIN_MAX_PENDING`` users are waiting), so a
+login storm costs one statement per interval instead of one commit per login.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from sqlalchemy import bindparam, update
+
+from app import db
+from app.models.user import User
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LoginActivityRecorder:
+    """Batches last_login updates.
+
+    Settings:
+
+    - ``LAST_LOGIN_FLUSH_INTERVAL``: seconds between flushes
+    - ``LAST_LOGIN_MAX_PENDING``: flush early once this many users are pending
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 5.0
+        self.max_pending = 1000
+        self._pending = {}  # user id -> latest login time
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.stats = {'recorded': 0, 'flushes': 0, 'written': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('LAST_LOGIN_FLUSH_INTERVAL', 5.0)
+        self.max_pending = app.config.get('LAST_LOGIN_MAX_PENDING', 1000)
+        app.extensions['login_activity'] = self
+        atexit.register(self.flush)
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so (re)start the flusher in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Entries inherited from the parent process are its to write
+            self._pending.clear()
+            self._thread = threading.Thread(target=self._run, name='last-login-flusher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, user_id, when):
+        """Note a login; it is written on the next flush."""
+        self._ensure_started()
+        with self._lock:
+            self._pending[user_id] = when
+            self.stats['recorded'] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write last_login updates')
+
+    def flush(self):
+        """Write all pending timestamps with one bulk UPDATE; return rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.app is None:
+            return 0
+
+        users_table = User.__table__
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    update(users_table)
+                    .where(users_table.c.id == bindparam('b_id'))
+                    .values(last_login=bindparam('last_login')),
+                    [{'b_id': user_id, 'last_login': when} for user_id, when in pending.items()]
+                )
+        except Exception:
+            # Keep the timestamps for the next attempt unless newer ones arrived
+            with self._lock:
+                for user_id, when in pending.items():
+                    self._pending.setdefault(user_id, when)
+            raise
+
+        # Written outside the session, so drop the cached snapshots explicitly
+        user_cache.invalidate(*pending)
+        with self._lock:
+            self.stats['flushes'] += 1
+            self.stats['written'] += len(pending)
+        return len(pending)
+
+
+login_activity = LoginActivityRecorder()
@@ -0,0 +1,121 @@
+"""
+Market Jobs
+Periodic market data jobs run by the scheduler: quote refresh,
+mark-to-market of open trades and the end of day roll of previous close.
+All updates are set-based SQL statements rather than per-row ORM loops.
+Quote refreshes also publish to the shared price table, which mark-to-market
+reads prices from.
+"""
+import logging
+from datetime import datetime
+from importlib import import_module
+
+from flask import current_app
+from sqlalchemy import bindparam, case, select, update
+
+from app import db
+from app.models.stock import Stock
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.services.price_feed import normalize_quote, price_feed
+
+logger = logging.getLogger(__name__)
+
+
+def get_quote_provider():
+    """Return the configured quote provider, or None.
+
+    ``QUOTE_PROVIDER`` is an import path (``'module:function'``) of a callable
+    that takes a list of symbols and returns ``{symbol: last_traded_price}``
+    or ``{symbol: {'ltp': ..., 'bid': ..., 'ask': ..., 'volume': ...}}``.
+    """
+    target = current_app.config.get('QUOTE_PROVIDER')
+    if not target:
+        return None
+    module_name, attr = target.split(':')
+    return getattr(import_module(module_name), attr)
+
+
+def refresh_quotes():
+    """Fetch the latest quotes of all listed stocks, store and publish them."""
+    provider = get_quote_provider()
+    if provider is None:
+        # Keep the price table in line with prices stored by other means
+        price_feed.publish_listed()
+        logger.debug("No QUOTE_PROVIDER configured, skipping quote refresh")
+        return 0
+
+    stocks = db.session.execute(select(Stock.id, Stock.symbol, Stock.previous_close)).all()
+    if not stocks:
+        return 0
+    quotes = provider([symbol for _, symbol, _ in stocks])
+    now = datetime.utcnow()
+    rows = []
+    for symbol, value in quotes.items():
+        quote = normalize_quote(value)
+        if quote is not None:
+            rows.append({'b_symbol': symbol, 'price': quote['ltp'], 'now': now})
+    if rows:
+        db.session.execute(
+            update(Stock.__table__)
+            .where(Stock.__table__.c.symbol == bindparam('b_symbol'))
+            .values(current_price=bindparam('price'), updated_at=bindparam('now')),
+            rows
+        )
+        db.session.commit()
+        price_feed.publish(stocks, quotes)
+    return len(rows)
+
+
+def mark_to_market():
+    """Revalue every open executed trade at its stock's latest price.
+
+    Prices come from the shared price table, falling back to
+    ``stocks.current_price`` for stocks without a published quote.
+    """
+    prices = {
+        symbol: price_feed.ltp(stock_id) or current_price
+        for stock_id, symbol, current_price in db.session.execute(
+            select(Stock.id, Stock.symbol, Stock.current_price))
+    }
+    if not prices:
+        return 0
+
+    price = bindparam('price')
+    rows = [{'b_symbol': symbol, 'price': value} for symbol, value in prices.items()]
+    result = db.session.execute(
+        update(Trade.__table__)
+        .where(Trade.__table__.c.symbol == bindparam('b_symbol'))
+        .where(Trade.__table__.c.status == TradeStatus.EXECUTED.name)
+        .where(Trade.__table__.c.is_active.is_(True))
+        .values(
+            current_price=price,
+            unrealized_pnl=case(
+                (Trade.__table__.c.trade_type == TradeType.BUY.name,
+                 (price - Trade.__table__.c.price_per_share) * Trade.__table__.c.quantity),
+                else_=(Trade.__table__.c.price_per_share - price) * Trade.__table__.c.quantity
+            ),
+            updated_at=datetime.utcnow()
+        ),
+        rows
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def roll_previous_close():
+    """End of day: today's last price becomes tomorrow's previous close."""
+    result = db.session.execute(
+        update(Stock).values(previous_close=Stock.current_price, updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def register_market_jobs(scheduler, app):
+    """Register the market data jobs with their configured schedules."""
+    scheduler.add_job('refresh_quotes', refresh_quotes,
+                      interval=app.config.get('QUOTE_REFRESH_INTERVAL', 15))
+    scheduler.add_job('mark_to_market', mark_to_market,
+                      interval=app.config.get('MARK_TO_MARKET_INTERVAL', 60))
+    scheduler.add_job('roll_previous_close', roll_previous_close,
+                      daily_at=app.config.get('END_OF_DAY_TIME', '10:15'))
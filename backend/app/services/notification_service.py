@@ -0,0 +1,247 @@
+"""
+Notification Service
+Background email notifications for trade confirmations, rating changes and
+contest results. Request threads only put a small message on a bounded
+in-process queue and never wait on SMTP; a pool of worker threads drains the
+queue in batches, coalesces the events of each user into one digest and sends
+the whole batch over a single SMTP connection.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from app import mail
+
+logger = logging.getLogger(__name__)
+
+Notification = namedtuple('Notification', ['email', 'name', 'kind', 'subject', 'body'])
+
+# Sentinel telling a worker thread to exit
+_STOP = object()
+
+
+class NotificationService:
+    """Queue-backed email notifications.
+
+    Settings:
+
+    - ``NOTIFICATIONS_ENABLED``: turn the pipeline on or off
+    - ``NOTIFICATION_QUEUE_SIZE``: queue bound; events are dropped (and
+      counted) when it is full rather than blocking the request
+    - ``NOTIFICATION_WORKERS``: number of worker threads
+    - ``NOTIFICATION_BATCH_WINDOW``: seconds a worker waits to fill a batch
+    - ``NOTIFICATION_BATCH_SIZE``: maximum events per batch
+    - ``NOTIFICATION_SEND_ATTEMPTS``: tries per digest before it is dropped
+    - ``NOTIFICATION_RETRY_DELAY``: seconds to wait before reconnecting
+
+    ``sent`` and ``failed`` count digests (emails), not events.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.batch_window = 2.0
+        self.batch_size = 100
+        self.worker_count = 1
+        self.send_attempts = 3
+        self.retry_delay = 1.0
+        self._queue = None
+        self._workers = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'dropped': 0, 'sent': 0, 'failed': 0, 'batches': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read settings; worker threads start on the first notification."""
+        self.app = app
+        self.enabled = app.config.get('NOTIFICATIONS_ENABLED', False)
+        self.batch_window = app.config.get('NOTIFICATION_BATCH_WINDOW', 2.0)
+        self.batch_size = app.config.get('NOTIFICATION_BATCH_SIZE', 100)
+        self.worker_count = app.config.get('NOTIFICATION_WORKERS', 1)
+        self.send_attempts = app.config.get('NOTIFICATION_SEND_ATTEMPTS', 3)
+        self.retry_delay = app.config.get('NOTIFICATION_RETRY_DELAY', 1.0)
+        self._queue = queue.Queue(maxsize=app.config.get('NOTIFICATION_QUEUE_SIZE', 1000))
+        app.extensions['notifications'] = self
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so (re)start them in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._workers = [
+                threading.Thread(target=self._run, name=f'notifications-{i}', daemon=True)
+                for i in range(self.worker_count)
+            ]
+            for worker in self._workers:
+                worker.start()
+            self._pid = os.getpid()
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def enqueue(self, notification):
+        """Queue a notification without blocking; return False if it was dropped."""
+        if not self.enabled or not notification.email:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning(f"Notification queue full, dropped {notification.kind} for {notification.email}")
+            return False
+        self._count('queued')
+        return True
+
+    def notify_trade(self, user, trade):
+        """Queue a trade confirmation."""
+        trade_type = trade.trade_type.value if trade.trade_type else ''
+        return self.enqueue(Notification(
+            email=user.email,
+            name=user.name,
+            kind='trade',
+            subject=f'Trade confirmation: {trade_type} {trade.quantity} {trade.symbol}',
+            body=(f'{trade_type} {trade.quantity} {trade.symbol} @ {trade.price_per_share:.2f} '
+                  f'(total {trade.total_amount:.2f})'),
+        ))
+
+    def notify_rating_change(self, user, old_rating, new_rating, contest_name=None):
+        """Queue a rating change notice."""
+        change = new_rating - old_rating
+        sign = '+' if change >= 0 else ''
+        return self.enqueue(Notification(
+            email=user.email,
+            name=user.name,
+            kind='rating',
+            subject=f'Rating update: {new_rating} ({sign}{change})',
+            body=(f'Your rating changed from {old_rating} to {new_rating} '
+                  f'({sign}{change}) after {contest_name or "the last period"}.'),
+        ))
+
+    def notify_contest_result(self, user, contest_name, rank, total_participants):
+        """Queue a contest result notice."""
+        return self.enqueue(Notification(
+            email=user.email,
+            name=user.name,
+            kind='contest',
+            subject=f'{contest_name}: you finished #{rank}',
+            body=f'You finished {contest_name} ranked {rank} of {total_participants}.',
+        ))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = self._fill_batch(batch)
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                self._count('failed', len(batch))
+                logger.error(f"Failed to deliver {len(batch)} notifications: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _fill_batch(self, batch):
+        """Collect more events for up to batch_window seconds; True if told to stop."""
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    def _deliver(self, batch):
+        """Send one digest per recipient, reusing a single SMTP connection.
+
+        When a send fails the connection is reopened and delivery resumes
+        with the digest that failed, so digests already accepted by the
+        server are never resent. A digest is dropped after
+        ``send_attempts`` failures (all remaining ones if SMTP is unreachable).
+        """
+        digests = OrderedDict()
+        for notification in batch:
+            digests.setdefault(notification.email, []).append(notification)
+
+        pending = deque(digests.items())
+        attempts = 0  # Failures of the digest at the head of `pending`
+        with self.app.app_context():
+            while pending:
+                connected = False
+                try:
+                    with mail.connect() as connection:
+                        connected = True
+                        while pending:
+                            email, notifications = pending[0]
+                            connection.send(self._build_message(email, notifications))
+                            pending.popleft()
+                            attempts = 0
+                            self._count('sent')
+                except Exception as e:
+                    if not pending:
+                        # Only closing the connection failed
+                        break
+                    attempts += 1
+                    if attempts < self.send_attempts:
+                        logger.warning(f"Sending notification to {pending[0][0]} failed, retrying: {e}")
+                        time.sleep(self.retry_delay)
+                        continue
+                    failed = 1 if connected else len(pending)
+                    for _ in range(failed):
+                        pending.popleft()
+                    attempts = 0
+                    self._count('failed', failed)
+                    logger.error(f"Failed to deliver {failed} notification digests: {e}")
+        self._count('batches')
+
+    def _build_message(self, email, notifications):
+        # Imported here so Flask-Mail is only loaded once mail is actually sent
+        from flask_mail import Message
+
+        if len(notifications) == 1:
+            subject = notifications[0].subject
+        else:
+            subject = f'{len(notifications)} updates from Frontpage Trading Sim'
+        lines = [f'Hi {notifications[0].name},', '']
+        lines.extend(f'- {n.body}' for n in notifications)
+        return Message(subject=subject, recipients=[email], body='\n'.join(lines),
+                       sender=self.app.config.get('MAIL_DEFAULT_SENDER'))
+
+    def flush(self):
+        """Block until every queued notification has been handled (for tests)."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def shutdown(self):
+        """Stop the worker threads after the queue has drained."""
+        if self._pid != os.getpid():
+            return
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._pid = None
+
+
+notifications = NotificationService()
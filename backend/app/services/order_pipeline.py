@@ -0,0 +1,593 @@
+"""
+Order Pipeline
+Matches orders outside the request threads. Symbols are partitioned by
+``crc32(symbol) % workers`` and each partition is served by one process per
+host that owns the order books of its symbols, so orders for different
+symbols are matched in parallel without sharing state or the GIL, while the
+orders of one symbol are matched strictly in arrival order, whichever web
+process accepted them.
+
+Partition servers listen on Unix sockets in ``ORDER_PIPELINE_DIR`` and hold
+a lock file, so a partition has at most one server. They are run by ``flask
+orders serve``, or started (with the ``spawn`` method, never forked from a
+threaded server) by the first web process that finds one missing. When a
+connection breaks, the orders waiting on it fail; the web process reconnects,
+starting a new server if needed, and reloads the partition before its next
+order.
+
+Request threads validate and risk-check an order, hand it to its partition
+and wait on a Future (at most ``ORDER_PIPELINE_TIMEOUT`` seconds) for its
+fills, which they book in their own transaction. A partition is loaded from
+pending trades when a web process first connects to it and again after a
+timeout or a failed booking. Loads only add orders missing from the books,
+so a book may also hold orders that were cancelled, filled or never
+committed.
+
+As in the rest of the simulation, orders match against the market price:
+market and marketable limit orders fill at once, other limit orders rest in
+their book until an order arrives with a market price that crosses them.
+Booking a resting fill first claims its trade with a single ``UPDATE ...
+WHERE status = 'PENDING'`` and books nothing if no row changed; the claim
+also holds the row lock until commit, so an order fills (or is cancelled)
+exactly once, and stale orders in a book are dropped when they are crossed.
+
+The pipeline is off by default: ``benchmarks/bench_order_pipeline.py`` has
+not shown matching in partition processes to outrun matching in the request
+thread.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import partial
+from heapq import heapify, heappop, heappush
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from zlib import crc32
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from app import db
+from app.models.trade import Trade, TradeStatus
+from app.services.scheduler import FileLeaderLock
+
+logger = logging.getLogger(__name__)
+
+# Seconds a web process waits for a partition server it started to listen
+SERVER_START_TIMEOUT = 30.0
+
+# `side` is a TradeType name; `limit_price` is None for market orders
+Order = namedtuple('Order', ['order_id', 'user_id', 'symbol', 'side', 'quantity', 'limit_price'])
+Fill = namedtuple('Fill', ['order_id', 'user_id', 'symbol', 'side', 'quantity', 'price'])
+# `fills` holds the fills of resting orders crossed by the order's market price, then its own
+OrderResult = namedtuple('OrderResult', ['order_id', 'status', 'fills'])
+
+FILLED = 'FILLED'
+RESTING = 'RESTING'
+
+
+class OrderPipelineError(Exception):
+    """Raised when a partition fails to match an order."""
+
+
+class OrderTimeout(OrderPipelineError):
+    """Raised when an order's result does not arrive within the timeout."""
+
+
+class OrderBook:
+    """Resting limit orders of one symbol in price-time priority.
+
+    Bids and asks are heaps of ``(price key, sequence, order id)``; cancelled
+    orders stay in their heap until they reach the top or the heaps are
+    compacted.
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = []
+        self.asks = []
+        self.orders = {}  # order id -> Order
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order):
+        self._sequence += 1
+        if order.side == 'BUY':
+            heappush(self.bids, (-order.limit_price, self._sequence, order.order_id))
+        else:
+            heappush(self.asks, (order.limit_price, self._sequence, order.order_id))
+        self.orders[order.order_id] = order
+
+    def cancel(self, order_id):
+        """Remove a resting order; return it, or None if it is not resting."""
+        order = self.orders.pop(order_id, None)
+        if order is not None and len(self.bids) + len(self.asks) > 2 * len(self.orders) + 64:
+            self._compact()
+        return order
+
+    def _compact(self):
+        self.bids = [key for key in self.bids if key[2] in self.orders]
+        self.asks = [key for key in self.asks if key[2] in self.orders]
+        heapify(self.bids)
+        heapify(self.asks)
+
+    def _top(self, heap):
+        while heap and heap[0][2] not in self.orders:
+            heappop(heap)
+        return heap[0] if heap else None
+
+    def best_bid(self):
+        top = self._top(self.bids)
+        return -top[0] if top else None
+
+    def best_ask(self):
+        top = self._top(self.asks)
+        return top[0] if top else None
+
+    def crossed(self, price):
+        """Remove and return the resting orders that fill at `price`, best first."""
+        filled = []
+        while True:
+            top = self._top(self.bids)
+            if top is None or -top[0] < price:
+                break
+            heappop(self.bids)
+            filled.append(self.orders.pop(top[2]))
+        while True:
+            top = self._top(self.asks)
+            if top is None or top[0] > price:
+                break
+            heappop(self.asks)
+            filled.append(self.orders.pop(top[2]))
+        return filled
+
+
+class MatchingEngine:
+    """Order books of the symbols of one partition."""
+
+    def __init__(self):
+        self.books = {}
+
+    def load(self, orders):
+        """Add the resting `Order`s that are not in their books yet; return how many were added."""
+        added = 0
+        for order in orders:
+            book = self._book(order.symbol)
+            if order.order_id not in book.orders:
+                book.add(order)
+                added += 1
+        return added
+
+    def _book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        return book
+
+    def submit(self, order, market_price):
+        """Match an order at the market price.
+
+        Resting orders crossed by the price fill first; then the order fills
+        (market and marketable limit orders) or rests in its book.
+
+        Returns:
+            OrderResult
+        """
+        book = self._book(order.symbol)
+        # A load inside the submitting transaction may already hold the order
+        book.cancel(order.order_id)
+        fills = [self._fill(resting, market_price) for resting in book.crossed(market_price)]
+        if order.limit_price is None:
+            marketable = True
+        elif order.side == 'BUY':
+            marketable = order.limit_price >= market_price
+        else:
+            marketable = order.limit_price <= market_price
+        if marketable:
+            fills.append(self._fill(order, market_price))
+        else:
+            book.add(order)
+        return OrderResult(order.order_id, FILLED if marketable else RESTING, fills)
+
+    def submit_many(self, items):
+        """Match ``(order, market_price)`` items in order; return their results."""
+        return [self.submit(order, market_price) for order, market_price in items]
+
+    def cancel(self, symbol, order_id):
+        """Remove a resting order; return False if it is not resting."""
+        book = self.books.get(symbol)
+        return book is not None and book.cancel(order_id) is not None
+
+    @staticmethod
+    def _fill(order, price):
+        return Fill(order.order_id, order.user_id, order.symbol, order.side, order.quantity, price)
+
+    def stats(self):
+        return {
+            'books': len(self.books),
+            'resting_orders': sum(len(book) for book in self.books.values()),
+        }
+
+
+def _serve_partition(address, lock_path, authkey):
+    """Partition server process: owns the books of one partition until stopped."""
+    lock = FileLeaderLock(lock_path)
+    if not lock.try_acquire():
+        return  # Another process serves the partition
+    if os.path.exists(address):
+        os.unlink(address)  # Left by a server that died
+    listener = Listener(address, 'AF_UNIX', authkey=authkey)
+    engine = MatchingEngine()
+    engine_lock = threading.Lock()
+    while True:
+        try:
+            connection = listener.accept()
+        except (OSError, EOFError, AuthenticationError):
+            continue
+        threading.Thread(target=_serve_connection, args=(connection, engine, engine_lock),
+                         daemon=True).start()
+
+
+def _serve_connection(connection, engine, engine_lock):
+    """Run the engine calls of one web process's connection in arrival order."""
+    with connection:
+        while True:
+            try:
+                request_id, method, args = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                with engine_lock:
+                    result = getattr(engine, method)(*args)
+                error = None
+            except Exception as e:
+                result, error = None, f'{type(e).__name__}: {e}'
+            if request_id is not None:
+                try:
+                    connection.send((request_id, result, error))
+                except OSError:
+                    return
+
+
+class _PartitionClient:
+    """Connection of this process to one partition server."""
+
+    def __init__(self, connection, on_close):
+        self.connection = connection
+        self.closed = False
+        self._on_close = on_close
+        self._futures = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._collect, daemon=True)
+        self._reader.start()
+
+    def send(self, method, args, wait=True):
+        """Send an engine call; return its Future (None with ``wait=False``)."""
+        future = request_id = None
+        with self._lock:
+            if self.closed:
+                raise OrderPipelineError('Partition server connection is closed')
+            if wait:
+                request_id = self._next_id
+                self._next_id += 1
+                future = self._futures[request_id] = Future()
+            try:
+                self.connection.send((request_id, method, args))
+            except OSError as e:
+                self._futures.pop(request_id, None)
+                raise OrderPipelineError(f'Partition server is unreachable: {e}') from None
+        return future
+
+    def close(self):
+        # Closing the descriptor would not wake the reader blocked in recv()
+        with socket.fromfd(self.connection.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+        self._reader.join()
+        self.connection.close()
+
+    def _collect(self):
+        while True:
+            try:
+                request_id, result, error = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._futures.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(OrderPipelineError(error))
+            else:
+                future.set_result(result)
+
+        # The server stopped (or the connection was closed): fail what is still waiting
+        with self._lock:
+            self.closed = True
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.set_exception(OrderPipelineError('Partition server stopped'))
+        self._on_close()
+
+
+class OrderPipeline:
+    """Routes orders to the partition that owns their symbol.
+
+    With the pipeline disabled there is a single partition, matched in the
+    calling thread under a lock; the results are the same.
+
+    Settings:
+
+    - ``ORDER_PIPELINE_ENABLED``: match in partition server processes
+    - ``ORDER_PIPELINE_WORKERS``: partitions (0 for one per CPU); must be
+      the same in every web process of a host
+    - ``ORDER_PIPELINE_TIMEOUT``: seconds a request waits for its result
+    - ``ORDER_PIPELINE_DIR``: directory of the servers' sockets and lock files
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.workers = 1
+        self.timeout = 2.0
+        self.directory = tempfile.gettempdir()
+        self.authkey = b''
+        self._engine = MatchingEngine()  # The partition when disabled
+        self._clients = {}  # partition -> _PartitionClient
+        self._processes = []  # Partition servers started by this process
+        self._stale = set()  # Partitions to reload before their next order
+        self._pid = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.enabled = app.config.get('ORDER_PIPELINE_ENABLED', False)
+        workers = app.config.get('ORDER_PIPELINE_WORKERS', 0)
+        self.workers = (workers or multiprocessing.cpu_count()) if self.enabled else 1
+        self.timeout = app.config.get('ORDER_PIPELINE_TIMEOUT', 2.0)
+        self.directory = app.config.get('ORDER_PIPELINE_DIR') or tempfile.gettempdir()
+        # Only processes sharing the secret key may talk to the servers
+        self.authkey = hashlib.sha256(f"order-pipeline:{app.config['SECRET_KEY']}".encode()).digest()
+        app.extensions['order_pipeline'] = self
+
+    def partition_for(self, symbol):
+        return crc32(symbol.encode('utf-8')) % self.workers
+
+    def server_paths(self, partition):
+        """Return the socket and lock file of a partition's server."""
+        name = os.path.join(self.directory, f'frontpage-orders-{self.workers}-{partition}')
+        return f'{name}.sock', f'{name}.lock'
+
+    def server_running(self, partition):
+        """Return True if a server accepts connections for a partition."""
+        try:
+            Client(self.server_paths(partition)[0], 'AF_UNIX', authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            return False
+        return True
+
+    def start_server(self, partition, daemon=True):
+        """Start a server process for a partition; it exits if one is already serving."""
+        address, lock_path = self.server_paths(partition)
+        process = multiprocessing.get_context('spawn').Process(
+            target=_serve_partition, args=(address, lock_path, self.authkey), daemon=daemon)
+        process.start()
+        return process
+
+    def start(self):
+        """Reset the connections of this process (done on first use)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Connections and servers inherited from a parent process are not ours
+            self._clients = {}
+            self._processes = []
+            self._stale = set(range(self.workers))
+            self._engine = MatchingEngine()
+            self._pid = os.getpid()
+
+    def shutdown(self):
+        """Close this process's connections and stop the servers it started."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = None
+                return
+            clients, self._clients = self._clients, {}
+            processes, self._processes = self._processes, []
+            self._pid = None
+        for client in clients.values():
+            client.close()
+        for process in processes:
+            process.terminate()
+            process.join()
+
+    def resync(self, symbol=None):
+        """Reload a symbol's partition (or all of them) from the database before its next order."""
+        with self._lock:
+            self._stale.update(range(self.workers) if symbol is None else (self.partition_for(symbol),))
+
+    def _mark_stale(self, partition):
+        with self._lock:
+            self._stale.add(partition)
+
+    def _prepare(self, partition):
+        if self._pid != os.getpid():
+            self.start()
+        if self.enabled:
+            client = self._clients.get(partition)
+            if client is None or client.closed:
+                with self._load_lock:
+                    client = self._clients.get(partition)
+                    if client is None or client.closed:
+                        self._clients[partition] = self._connect(partition)
+        with self._lock:
+            stale = partition in self._stale
+        if stale:
+            with self._load_lock:
+                with self._lock:
+                    if partition not in self._stale:
+                        return
+                    # A resync requested from here on is not covered by this load
+                    self._stale.discard(partition)
+                try:
+                    self._send(partition, 'load', self._partition_orders(partition), wait=False)
+                except Exception:
+                    self._mark_stale(partition)
+                    raise
+
+    def _connect(self, partition):
+        """Connect to a partition's server, starting one if none is listening."""
+        address, _ = self.server_paths(partition)
+        deadline = server = None
+        while True:
+            try:
+                connection = Client(address, 'AF_UNIX', authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if deadline is None:
+                    # Servers that died are dropped; the new one loads from the database
+                    self._processes = [process for process in self._processes if process.is_alive()]
+                    server = self.start_server(partition)
+                    self._processes.append(server)
+                    deadline = time.monotonic() + SERVER_START_TIMEOUT
+                elif server.exitcode:
+                    raise OrderPipelineError(f'Server for partition {partition} failed to start '
+                                             f'(exit code {server.exitcode})') from None
+                elif time.monotonic() > deadline:
+                    raise OrderTimeout(f'No server for partition {partition} after '
+                                       f'{SERVER_START_TIMEOUT}s') from None
+                time.sleep(0.05)
+        # A new server, or one that other processes changed while disconnected
+        self._mark_stale(partition)
+        return _PartitionClient(connection, partial(self._mark_stale, partition))
+
+    def _partition_orders(self, partition):
+        """Return the pending orders of a partition's symbols."""
+        return [
+            Order(trade_id, user_id, symbol, trade_type.name, quantity, price)
+            for trade_id, user_id, symbol, trade_type, quantity, price in db.session.execute(
+                select(Trade.id, Trade.user_id, Trade.symbol, Trade.trade_type,
+                       Trade.quantity, Trade.price_per_share)
+                .where(Trade.status == TradeStatus.PENDING)
+                .order_by(Trade.id)
+            )
+            if self.partition_for(symbol) == partition
+        ]
+
+    def _send(self, partition, method, *args, wait=True):
+        """Run an engine method in a partition; return its Future (None with ``wait=False``)."""
+        if not self.enabled:
+            future = Future()
+            try:
+                with self._lock:
+                    future.set_result(getattr(self._engine, method)(*args))
+            except Exception as e:
+                future.set_exception(OrderPipelineError(f'{type(e).__name__}: {e}'))
+            return future if wait else None
+        return self._clients[partition].send(method, args, wait=wait)
+
+    def submit_async(self, order, market_price):
+        """Hand an order to its partition; return a Future of its `OrderResult`."""
+        partition = self.partition_for(order.symbol)
+        self._prepare(partition)
+        return self._send(partition, 'submit', order, market_price)
+
+    def submit(self, order, market_price):
+        """Match an order and wait for its `OrderResult`.
+
+        Raises:
+            OrderTimeout: If the result takes longer than ``ORDER_PIPELINE_TIMEOUT``
+            OrderPipelineError: If the partition failed to match the order
+        """
+        future = self.submit_async(order, market_price)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise OrderTimeout(f'No result for order {order.order_id} after {self.timeout}s') from None
+
+    def submit_many(self, items):
+        """Match many ``(order, market_price)`` items with one message per partition.
+
+        Returns:
+            Future: The `OrderResult`s in the order of `items`
+        """
+        groups = {}
+        for index, (order, _) in enumerate(items):
+            groups.setdefault(self.partition_for(order.symbol), []).append(index)
+        combined = Future()
+        results = [None] * len(items)
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def collect(indexes, future):
+            error = future.exception()
+            with lock:
+                if combined.done():
+                    return
+                if error is not None:
+                    combined.set_exception(error)
+                    return
+                for index, result in zip(indexes, future.result()):
+                    results[index] = result
+                remaining[0] -= 1
+                if not remaining[0]:
+                    combined.set_result(results)
+
+        if not groups:
+            combined.set_result(results)
+        for partition, indexes in groups.items():
+            self._prepare(partition)
+            batch = [items[index] for index in indexes]
+            self._send(partition, 'submit_many', batch).add_done_callback(partial(collect, indexes))
+        return combined
+
+    def cancel(self, symbol, order_id):
+        """Remove a resting order from its book without waiting for the worker."""
+        partition = self.partition_for(symbol)
+        self._prepare(partition)
+        self._send(partition, 'cancel', symbol, order_id, wait=False)
+
+    def stats(self):
+        """Return the books, resting orders and positions held by each partition."""
+        stats = []
+        for partition in range(self.workers):
+            self._prepare(partition)
+            stats.append(self._send(partition, 'stats').result(timeout=self.timeout))
+        return stats
+
+
+order_pipeline = OrderPipeline()
+
+
+orders_cli = AppGroup('orders', help='Order matching.')
+
+
+@orders_cli.command('serve')
+def serve_command():
+    """Run the partition servers of the order pipeline, restarting any that stop."""
+    if not order_pipeline.enabled:
+        raise click.ClickException('ORDER_PIPELINE_ENABLED is not set')
+    processes = {}
+    click.echo(f"Serving {order_pipeline.workers} partitions from {order_pipeline.directory}")
+    while True:
+        for partition in range(order_pipeline.workers):
+            process = processes.get(partition)
+            if process is not None and process.is_alive():
+                continue
+            if order_pipeline.server_running(partition):
+                continue  # Started by a web process
+            if process is not None:
+                logger.warning(f"Partition {partition} server exited with {process.exitcode}")
+            processes[partition] = order_pipeline.start_server(partition, daemon=False)
+        time.sleep(1)
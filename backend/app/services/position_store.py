@@ -0,0 +1,322 @@
+"""
+Position Store
+Compact in-memory copy of the ``portfolios`` table for the hot paths
+(execution, risk checks, valuation). Positions are kept as a struct of
+arrays - symbol ids (int32), quantities (int32) and average prices
+(float64) - with each user's positions in one contiguous slice, so a
+position costs 16 bytes instead of a full ORM instance with its state,
+datetimes and relationship.
+
+Fills are staged with `stage_position_change` and written at commit in the
+same transaction as their ledger entries: one set-based UPDATE for all
+positions that already exist and an UPDATE-or-INSERT for new ones. The
+store itself follows the ledger (see `RiskEngine.sync`), so it never needs
+to be rolled back.
+"""
+import logging
+import sys
+from array import array
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, event, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.ledger import LedgerEntryType, stage_entry
+from app.models.portfolio import Portfolio
+
+logger = logging.getLogger(__name__)
+
+# Share of abandoned array slots (left by relocated slices) that triggers a compaction
+COMPACT_RATIO = 0.5
+
+
+class PositionStore:
+    """Positions of many users in parallel arrays.
+
+    ``self._slots`` maps a user id to a slot in ``starts``/``lengths``/
+    ``capacities``, which delimit the user's slice of the position arrays.
+    Appending to a full slice moves it to the end with twice the capacity;
+    the hole it leaves is reclaimed by `compact`.
+    """
+
+    def __init__(self):
+        self.symbols = []       # symbol id -> symbol
+        self._symbol_ids = {}   # symbol -> symbol id
+        self.symbol_ids = array('i')
+        self.quantities = array('i')
+        self.avg_prices = array('d')
+        self._slots = {}        # user id -> slot in the slice arrays
+        self.starts = array('i')
+        self.lengths = array('i')
+        self.capacities = array('i')
+        self._abandoned = 0
+
+    def __len__(self):
+        return sum(self.lengths)
+
+    def __contains__(self, user_id):
+        return user_id in self._slots
+
+    def clear(self):
+        self.__init__()
+
+    def symbol_id(self, symbol):
+        """Return the interned id of `symbol`."""
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def load(self, rows):
+        """Replace the contents with ``(user_id, symbol, quantity, avg_price)`` rows."""
+        self.clear()
+        by_user = {}
+        for user_id, symbol, quantity, avg_price in rows:
+            by_user.setdefault(user_id, []).append((self.symbol_id(symbol), quantity, avg_price))
+        for user_id, positions in by_user.items():
+            self._add_slot(user_id, len(self.quantities), len(positions))
+            for symbol_id, quantity, avg_price in positions:
+                self.symbol_ids.append(symbol_id)
+                self.quantities.append(quantity or 0)
+                self.avg_prices.append(avg_price or 0.0)
+
+    def _add_slot(self, user_id, start, length):
+        self._slots[user_id] = len(self.starts)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.capacities.append(length)
+
+    def add_user(self, user_id):
+        """Register a user without positions."""
+        if user_id not in self._slots:
+            self._add_slot(user_id, len(self.quantities), 0)
+
+    def _find(self, user_id, symbol):
+        """Return the array index of a position, or None."""
+        symbol_id = self._symbol_ids.get(symbol)
+        slot = self._slots.get(user_id)
+        if symbol_id is None or slot is None:
+            return None
+        start = self.starts[slot]
+        symbol_ids = self.symbol_ids
+        for index in range(start, start + self.lengths[slot]):
+            if symbol_ids[index] == symbol_id:
+                return index
+        return None
+
+    def get(self, user_id, symbol):
+        """Return ``(quantity, avg_price)`` of a position, or None."""
+        index = self._find(user_id, symbol)
+        if index is None:
+            return None
+        return self.quantities[index], self.avg_prices[index]
+
+    def quantity(self, user_id, symbol):
+        """Return the held quantity (0 if the position does not exist)."""
+        index = self._find(user_id, symbol)
+        return 0 if index is None else self.quantities[index]
+
+    def positions(self, user_id):
+        """Return ``{symbol: (quantity, avg_price)}`` of a user."""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return {}
+        start = self.starts[slot]
+        return {
+            self.symbols[self.symbol_ids[index]]: (self.quantities[index], self.avg_prices[index])
+            for index in range(start, start + self.lengths[slot])
+        }
+
+    def _append(self, user_id, symbol):
+        self.add_user(user_id)
+        slot = self._slots[user_id]
+        start, length, capacity = self.starts[slot], self.lengths[slot], self.capacities[slot]
+        end = len(self.quantities)
+        if length == capacity and start + capacity != end:
+            # Move the slice to the end, where it can grow in place
+            new_capacity = max(2, capacity * 2)
+            padding = new_capacity - length
+            self.symbol_ids.extend(self.symbol_ids[start:start + length])
+            self.quantities.extend(self.quantities[start:start + length])
+            self.avg_prices.extend(self.avg_prices[start:start + length])
+            self.symbol_ids.extend([0] * padding)
+            self.quantities.extend([0] * padding)
+            self.avg_prices.extend([0.0] * padding)
+            self._abandoned += capacity
+            self.starts[slot] = start = end
+            self.capacities[slot] = new_capacity
+        elif length == capacity:
+            # Last slice: grow the arrays themselves
+            self.symbol_ids.append(0)
+            self.quantities.append(0)
+            self.avg_prices.append(0.0)
+            self.capacities[slot] += 1
+        index = start + length
+        self.symbol_ids[index] = self.symbol_id(symbol)
+        self.quantities[index] = 0
+        self.avg_prices[index] = 0.0
+        self.lengths[slot] = length + 1
+        if self._abandoned > len(self.quantities) * COMPACT_RATIO:
+            self.compact()
+            return self._find(user_id, symbol)
+        return index
+
+    def set(self, user_id, symbol, quantity, avg_price):
+        """Create or overwrite a position."""
+        index = self._find(user_id, symbol)
+        if index is None:
+            index = self._append(user_id, symbol)
+        self.quantities[index] = quantity
+        self.avg_prices[index] = avg_price
+
+    def apply(self, user_id, symbol, quantity_delta, price):
+        """Apply a fill with the averaging rules of `Portfolio.update_position`.
+
+        Returns:
+            tuple: New ``(quantity, avg_price)``
+        """
+        index = self._find(user_id, symbol)
+        if index is None:
+            index = self._append(user_id, symbol)
+        quantity = self.quantities[index]
+        avg_price = self.avg_prices[index]
+        if quantity == 0:
+            avg_price = price
+        else:
+            total_quantity = quantity + quantity_delta
+            if total_quantity > 0:
+                avg_price = (quantity * avg_price + quantity_delta * price) / total_quantity
+            else:
+                avg_price = 0.0
+        quantity += quantity_delta
+        self.quantities[index] = quantity
+        self.avg_prices[index] = avg_price
+        return quantity, avg_price
+
+    def compact(self):
+        """Rewrite the position arrays without the holes left by relocated slices."""
+        symbol_ids, quantities, avg_prices = array('i'), array('i'), array('d')
+        for slot in range(len(self.starts)):
+            start, length = self.starts[slot], self.lengths[slot]
+            self.starts[slot] = len(quantities)
+            self.capacities[slot] = length
+            symbol_ids.extend(self.symbol_ids[start:start + length])
+            quantities.extend(self.quantities[start:start + length])
+            avg_prices.extend(self.avg_prices[start:start + length])
+        self.symbol_ids, self.quantities, self.avg_prices = symbol_ids, quantities, avg_prices
+        self._abandoned = 0
+
+    def memory_report(self):
+        """Return the bytes used by the arrays, the user index and the symbols."""
+        arrays = sum(sys.getsizeof(values) for values in (
+            self.symbol_ids, self.quantities, self.avg_prices,
+            self.starts, self.lengths, self.capacities))
+        index = sys.getsizeof(self._slots) + sum(
+            sys.getsizeof(user_id) + sys.getsizeof(slot) for user_id, slot in self._slots.items())
+        symbols = sys.getsizeof(self.symbols) + sys.getsizeof(self._symbol_ids) + sum(
+            sys.getsizeof(symbol) for symbol in self.symbols)
+        positions = len(self)
+        total = arrays + index + symbols
+        return {
+            'users': len(self._slots),
+            'positions': positions,
+            'array_slots': len(self.quantities),
+            'array_bytes': arrays,
+            'index_bytes': index,
+            'symbol_bytes': symbols,
+            'total_bytes': total,
+            'bytes_per_position': total / positions if positions else 0.0,
+        }
+
+
+def stage_position_change(user_id, symbol, quantity_delta, price, trade=None, exists=True):
+    """Stage a fill against a position on the current session.
+
+    The ledger entry and the ``portfolios`` change are written when the
+    session commits. Changes are relative to the stored row, so concurrent
+    fills by other workers are never overwritten.
+
+    Args:
+        exists: False if the position may not have a row yet; with True the
+            update is batched, and a row found missing is still inserted
+    """
+    stage_entry(user_id, LedgerEntryType.POSITION, symbol=symbol,
+                quantity_delta=quantity_delta, price=price, trade=trade)
+    db.session.info.setdefault('positions_pending', []).append(
+        (user_id, symbol, quantity_delta, price, exists))
+
+
+def _position_update():
+    table = Portfolio.__table__
+    delta = bindparam('delta')
+    price = bindparam('price')
+    first_row = (
+        select(func.min(table.c.id))
+        .where(table.c.user_id == bindparam('b_user_id'), table.c.symbol == bindparam('b_symbol'))
+        .scalar_subquery()
+    )
+    return (
+        update(table)
+        .where(table.c.id == first_row)
+        .values(
+            avg_price=case(
+                (table.c.quantity == 0, price),
+                (table.c.quantity + delta > 0,
+                 (table.c.quantity * table.c.avg_price + delta * price) / (table.c.quantity + delta)),
+                else_=0.0
+            ),
+            quantity=table.c.quantity + delta,
+            updated_at=bindparam('now')
+        )
+    )
+
+
+def _apply_or_insert(session, statement, row):
+    """Apply one staged change, inserting the position if it has no row."""
+    if session.execute(statement, row).rowcount == 0:
+        session.execute(insert(Portfolio), {
+            'user_id': row['b_user_id'], 'symbol': row['b_symbol'], 'quantity': row['delta'],
+            'avg_price': row['price'], 'created_at': row['now'], 'updated_at': row['now']})
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_staged_positions(session):
+    pending = session.info.pop('positions_pending', None)
+    if not pending:
+        return
+    now = datetime.utcnow()
+    statement = _position_update()
+    rows = []
+    for user_id, symbol, quantity_delta, price, exists in pending:
+        row = {'b_user_id': user_id, 'b_symbol': symbol, 'delta': quantity_delta,
+               'price': price, 'now': now}
+        if exists:
+            rows.append(row)
+        else:
+            _apply_or_insert(session, statement, row)
+    if not rows:
+        return
+
+    result = session.execute(statement, rows)
+    if result.supports_sane_multi_rowcount() and result.rowcount == len(rows):
+        return
+    # The store believed in rows that are missing (or the driver cannot tell):
+    # changes to positions without a row were not applied by the batch
+    table = Portfolio.__table__
+    stored = set(session.execute(
+        select(table.c.user_id, table.c.symbol)
+        .where(tuple_(table.c.user_id, table.c.symbol).in_(
+            {(row['b_user_id'], row['b_symbol']) for row in rows}))
+    ).all())
+    missing = [row for row in rows if (row['b_user_id'], row['b_symbol']) not in stored]
+    if missing:
+        logger.warning(f"{len(missing)} fills updated no portfolios row; inserting them")
+    for row in missing:
+        _apply_or_insert(session, statement, row)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_staged_positions(session):
+    session.info.pop('positions_pending', None)
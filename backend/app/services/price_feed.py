@@ -0,0 +1,162 @@
+"""
+Price Feed
+Publishes quotes into the shared `SharedPriceTable` and reads them back for
+request handlers and jobs. Exactly one process per host should publish: the
+scheduler leader (through `refresh_quotes`) or a dedicated ``flask prices
+feed`` process when the scheduler is disabled. Every other worker only reads,
+so an LTP lookup never touches the database or the quote provider.
+"""
+import logging
+import time
+from numbers import Number
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from app import db
+from app.models.stock import Stock
+from app.utils.price_table import DEFAULT_SLOTS, SharedPriceTable, default_table_path
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_quote(value):
+    """Turn a provider value into ``{'ltp', 'bid', 'ask', 'volume'}``, or None.
+
+    Providers may return a bare last traded price or a mapping with any of
+    these keys.
+    """
+    if value is None:
+        return None
+    if isinstance(value, Number):
+        return {'ltp': float(value), 'bid': 0.0, 'ask': 0.0, 'volume': 0}
+    if value.get('ltp') is None:
+        return None
+    return {
+        'ltp': float(value['ltp']),
+        'bid': float(value.get('bid') or 0.0),
+        'ask': float(value.get('ask') or 0.0),
+        'volume': int(value.get('volume') or 0),
+    }
+
+
+class PriceFeed:
+    """Access to the host-wide price table.
+
+    Settings:
+
+    - ``PRICE_TABLE_ENABLED``: without it lookups return None and publishing is a no-op
+    - ``PRICE_TABLE_PATH``: backing file, in ``/dev/shm`` by default
+    - ``PRICE_TABLE_SLOTS``: table size; stock ids must be below it
+    """
+
+    def __init__(self, app=None):
+        self.table = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.table = None
+        if app.config.get('PRICE_TABLE_ENABLED'):
+            self.table = SharedPriceTable(app.config.get('PRICE_TABLE_PATH') or default_table_path(),
+                                          app.config.get('PRICE_TABLE_SLOTS', DEFAULT_SLOTS))
+        app.extensions['price_feed'] = self
+
+    def quote(self, symbol):
+        """Return the latest `Quote` of `symbol`, or None."""
+        if self.table is None:
+            return None
+        return self.table.lookup(symbol)
+
+    def ltp(self, instrument_id):
+        """Return the last traded price of a stock id, or None if unknown."""
+        if self.table is None or not 0 < instrument_id < self.table.slots:
+            return None
+        quote = self.table.read(instrument_id)
+        if quote is None or quote.ltp <= 0:
+            return None
+        return quote.ltp
+
+    def publish(self, stocks, quotes):
+        """Publish provider quotes.
+
+        Args:
+            stocks: Rows of ``(id, symbol, previous_close)``
+            quotes: ``{symbol: quote}`` as accepted by `normalize_quote`
+
+        Returns:
+            int: Number of quotes published
+        """
+        if self.table is None:
+            return 0
+        rows = []
+        for stock_id, symbol, previous_close in stocks:
+            quote = normalize_quote(quotes.get(symbol))
+            if quote is None:
+                continue
+            if not 0 < stock_id < self.table.slots:
+                logger.warning(f"Stock {symbol} (id {stock_id}) does not fit the price table, "
+                               f"raise PRICE_TABLE_SLOTS")
+                continue
+            rows.append((stock_id, symbol, quote['ltp'], quote['bid'], quote['ask'],
+                         previous_close, quote['volume']))
+        return self.table.publish(rows)
+
+    def publish_listed(self):
+        """Publish the stored prices of all listed stocks (no provider call)."""
+        if self.table is None:
+            return 0
+        rows = db.session.execute(
+            select(Stock.id, Stock.symbol, Stock.previous_close, Stock.current_price)
+        ).all()
+        return self.publish([row[:3] for row in rows],
+                            {symbol: price for _, symbol, _, price in rows if price})
+
+
+price_feed = PriceFeed()
+
+
+prices_cli = AppGroup('prices', help='Shared price table.')
+
+
+@prices_cli.command('feed')
+@click.option('--interval', type=float, help='Seconds between quote refreshes '
+                                              '(default QUOTE_REFRESH_INTERVAL).')
+@click.option('--once', is_flag=True, help='Publish once and exit.')
+def feed_command(interval, once):
+    """Run the feeder process that writes the price table."""
+    from app.services.market_jobs import refresh_quotes
+
+    if price_feed.table is None:
+        raise click.ClickException('PRICE_TABLE_ENABLED is not set')
+    interval = interval or current_app.config.get('QUOTE_REFRESH_INTERVAL', 15)
+    click.echo(f"Feeding {price_feed.table.path}")
+    while True:
+        try:
+            refresh_quotes()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Quote refresh failed')
+        finally:
+            db.session.remove()
+        if once:
+            return
+        time.sleep(interval)
+
+
+@prices_cli.command('show')
+@click.argument('symbols', nargs=-1)
+def show_command(symbols):
+    """Print the published quotes (of SYMBOLS, or all)."""
+    if price_feed.table is None:
+        raise click.ClickException('PRICE_TABLE_ENABLED is not set')
+    quotes = sorted(price_feed.table.snapshot().values(), key=lambda quote: quote.symbol)
+    for quote in quotes:
+        if symbols and quote.symbol not in symbols:
+            continue
+        age = time.time() - quote.updated_at
+        click.echo(f"{quote.symbol:12s} ltp {quote.ltp:10.2f}  bid {quote.bid:10.2f}  "
+                   f"ask {quote.ask:10.2f}  vol {quote.volume:>12d}  seq {quote.seqno:>8d}  "
+                   f"{age:6.1f}s ago")
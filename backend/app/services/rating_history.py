@@ -0,0 +1,291 @@
+"""
+Rating History
+Serves the rating graph of a user's profile. Each user's series is loaded
+once into compact delta-encoded arrays (seconds between contests and rating
+changes as int32), long series are downsampled for charts while keeping
+every bucket's lowest and highest rating, and the encoded (and compressed)
+response bodies are cached per user, so repeat views of popular profiles
+cost no queries and no serialization.
+
+Entries are dropped after commits that insert `Rating` rows for their user;
+other worker processes pick the change up within ``RATING_HISTORY_CACHE_TTL``.
+Series are read from the primary (the chart endpoint is not routed to the
+read replica), so the load that follows an invalidation cannot cache rows a
+replica has not received yet.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from itertools import accumulate
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.rating import Rating
+from app.models.user import User
+from app.utils.compression import compress
+from app.utils.serialization import dumps
+
+EPOCH = datetime(1970, 1, 1)
+
+# Chart sizes that are encoded and cached; requested sizes are rounded down to
+# one of them, so a user's entry holds a bounded number of bodies
+CHART_SIZES = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def chart_size(points):
+    """Round a requested number of points down to a cached chart size (at least the smallest)."""
+    return max([size for size in CHART_SIZES if size <= points] or [CHART_SIZES[0]])
+
+
+class RatingSeries:
+    """One user's rating history as delta-encoded arrays.
+
+    ``start_time``/``start_rating`` anchor the series; ``time_deltas[i]`` and
+    ``rating_deltas[i]`` are the seconds and rating points between contest
+    ``i`` and the previous one (or the anchor). Ranks and contest names are
+    kept for the chart's tooltips.
+    """
+
+    __slots__ = ('initial_rating', 'start_time', 'start_rating', 'time_deltas',
+                 'rating_deltas', 'ranks', 'contests')
+
+    def __init__(self, rows):
+        """Build the series from ``(created_at, old_rating, new_rating, rank, contest_name)`` rows."""
+        self.time_deltas = array('i')
+        self.rating_deltas = array('i')
+        self.ranks = array('i')
+        self.contests = []
+        self.initial_rating = self.start_time = self.start_rating = None
+        previous_time = previous_rating = None
+        for created_at, old_rating, new_rating, rank, contest_name in rows:
+            timestamp = int((created_at - EPOCH).total_seconds()) if created_at else previous_time or 0
+            if previous_time is None:
+                self.initial_rating = old_rating
+                self.start_time = previous_time = timestamp
+                self.start_rating = previous_rating = old_rating
+            self.time_deltas.append(timestamp - previous_time)
+            self.rating_deltas.append(new_rating - previous_rating)
+            self.ranks.append(rank or 0)
+            self.contests.append(contest_name)
+            previous_time, previous_rating = timestamp, new_rating
+
+    def __len__(self):
+        return len(self.rating_deltas)
+
+    def decode(self):
+        """Return the timestamps and ratings after each contest."""
+        if not self.rating_deltas:
+            return [], []
+        timestamps = list(accumulate(self.time_deltas, initial=self.start_time))[1:]
+        ratings = list(accumulate(self.rating_deltas, initial=self.start_rating))[1:]
+        return timestamps, ratings
+
+
+def downsample(ratings, max_points):
+    """Return the indexes of the points to draw, at most `max_points`.
+
+    The series is cut into equal buckets and each bucket contributes its
+    lowest and highest rating (in time order), so peaks and dips survive.
+    The first and last points are always kept, so `max_points` must be at
+    least 2.
+    """
+    count = len(ratings)
+    if count <= max_points:
+        return range(count)
+    buckets = (max_points - 2) // 2
+    if buckets < 1:
+        return [0, count - 1]
+    inner = count - 2
+    indexes = [0]
+    for bucket in range(buckets):
+        start = 1 + bucket * inner // buckets
+        end = 1 + (bucket + 1) * inner // buckets
+        if start >= end:
+            continue
+        window = range(start, end)
+        low = min(window, key=ratings.__getitem__)
+        high = max(window, key=ratings.__getitem__)
+        indexes.extend(sorted({low, high}))
+    indexes.append(count - 1)
+    return indexes
+
+
+class RatingHistoryCache:
+    """LRU cache of rating series and their encoded responses.
+
+    Settings:
+
+    - ``RATING_HISTORY_CACHE_SIZE``: users cached per process (0 disables)
+    - ``RATING_HISTORY_CACHE_TTL``: seconds before a series is reloaded
+    - ``RATING_HISTORY_MAX_POINTS``: default points per chart
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 5000
+        self.ttl = 300.0
+        self.max_points = 500
+        self.min_compress_size = 1024
+        self.compression_level = 6
+        self.brotli_quality = 4
+        self._entries = OrderedDict()  # user id -> [expires, series, {(points, coding): body}]
+        self._generation = 0  # Bumped by every invalidation
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get('RATING_HISTORY_CACHE_SIZE', 5000)
+        self.ttl = app.config.get('RATING_HISTORY_CACHE_TTL', 300.0)
+        self.max_points = app.config.get('RATING_HISTORY_MAX_POINTS', 500)
+        self.min_compress_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.compression_level = app.config.get('COMPRESSION_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+        self.clear()
+        app.extensions['rating_history'] = self
+
+    def series(self, user_id):
+        """Return the `RatingSeries` of a user, or None if the user does not exist."""
+        return self._entry(user_id)[1]
+
+    def _entry(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry
+            self.stats['misses'] += 1
+            generation = self._generation
+
+        rows = db.session.execute(
+            select(Rating.created_at, Rating.old_rating, Rating.new_rating,
+                   Rating.rank, Rating.contest_name)
+            .where(Rating.user_id == user_id)
+            .order_by(Rating.created_at, Rating.id)
+        ).all()
+        if not rows and db.session.get(User, user_id) is None:
+            series = None
+        else:
+            series = RatingSeries(rows)
+        entry = [now + self.ttl, series, {}]
+        if self.max_size:
+            with self._lock:
+                # An invalidation during the load may have raced the rows read
+                if self._generation != generation:
+                    return entry
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def payload(self, user_id, series, max_points):
+        """Build the chart payload of a series."""
+        timestamps, ratings = series.decode()
+        indexes = downsample(ratings, max_points)
+        return {
+            'user_id': user_id,
+            'contests': len(series),
+            'initial_rating': series.initial_rating,
+            'current_rating': ratings[-1] if ratings else None,
+            'max_rating': max(ratings) if ratings else None,
+            'min_rating': min(ratings) if ratings else None,
+            'downsampled': len(indexes) < len(ratings),
+            'timestamps': [timestamps[i] for i in indexes],
+            'ratings': [ratings[i] for i in indexes],
+            'ranks': [series.ranks[i] for i in indexes],
+            'contest_names': [series.contests[i] for i in indexes],
+        }
+
+    def response_body(self, user_id, max_points=None, coding=None):
+        """Return the encoded chart response of a user.
+
+        Args:
+            max_points: Points to draw at most, rounded by `chart_size`
+                (default ``RATING_HISTORY_MAX_POINTS``)
+            coding: Content coding accepted by the client, e.g. ``'gzip'``
+
+        Returns:
+            tuple: ``(body, content coding or None)``, or None if the user does not exist
+        """
+        max_points = chart_size(max_points) if max_points else self.max_points
+        entry = self._entry(user_id)
+        series = entry[1]
+        if series is None:
+            return None
+        key = (max_points, coding)
+        with self._lock:
+            cached = entry[2].get(key)
+        if cached is not None:
+            return cached
+
+        body = dumps(self.payload(user_id, series, max_points))
+        encoding = None
+        if coding is not None and len(body) >= self.min_compress_size:
+            body = compress(body, coding, self.compression_level, self.brotli_quality)
+            encoding = coding
+        with self._lock:
+            entry[2][key] = (body, encoding)
+        return body, encoding
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+rating_history = RatingHistoryCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_rated_users(session, flush_context):
+    rated = [obj.user_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+             if isinstance(obj, Rating)]
+    if rated:
+        session.info.setdefault('rating_history_ids', set()).update(rated)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_ratings(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    # ORM statements target an annotated copy of the table
+    if table is None or not table.is_derived_from(Rating.__table__):
+        return
+    parameters = orm_execute_state.parameters if orm_execute_state.is_insert else None
+    if isinstance(parameters, dict):
+        parameters = [parameters]
+    user_ids = {row.get('user_id') for row in parameters} if parameters else {None}
+    if None in user_ids:
+        # Statements that may touch any user's ratings
+        orm_execute_state.session.info['rating_history_clear'] = True
+    else:
+        orm_execute_state.session.info.setdefault('rating_history_ids', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_rated_users(session):
+    if session.info.pop('rating_history_clear', False):
+        rating_history.clear()
+    rated = session.info.pop('rating_history_ids', None)
+    if rated:
+        rating_history.invalidate(*rated)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rated_users(session):
+    session.info.pop('rating_history_clear', None)
+    session.info.pop('rating_history_ids', None)
@@ -1,3 +1,16 @@
+import numpy as np
+from datetime import datetime
+from sqlalchemy import bindparam, insert, select, update
+from app import db
+from app.models.contest import ContestEntry, ContestStatus
+from app.models.rating import Rating
+from app.models.user import User
+
+# Ratings are solved on an integer grid covering every realistic value
+RATING_GRID = np.arange(-1000, 6000, dtype=np.float64)
+# Grid rows evaluated per block, keeps the (grid x ratings) matrix small
+GRID_BLOCK = 500
+
 class RatingService:
     """Service class for handling rating-related operations."""
     
@@ -23,3 +36,149 @@ class RatingService:
         """Delete a rating."""
         # Implementation to be added
         pass
+    
+    @staticmethod
+    def calculate_rating_changes(ratings, ranks):
+        """Compute Codeforces-style rating changes for one contest.
+
+        A participant's expected rank (seed) follows from Elo win
+        probabilities against everyone else; the rating whose seed equals the
+        geometric mean of expected and actual rank is their performance, and
+        they move halfway towards it. Deltas are then shifted so they sum to
+        roughly zero, as on Codeforces.
+
+        The seed only depends on the rating it is evaluated at, so it is
+        computed once on an integer grid over the distinct ratings (weighted by
+        how many participants hold them) and inverted with a sorted search,
+        instead of a binary search per participant.
+
+        Args:
+            ratings: Ratings of the participants before the contest
+            ranks: Final ranks of the participants (1 is best, ties allowed)
+
+        Returns:
+            numpy.ndarray: Integer rating change per participant
+        """
+        ratings = np.asarray(ratings, dtype=np.float64)
+        ranks = np.asarray(ranks, dtype=np.float64)
+        n = len(ratings)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        values, counts = np.unique(ratings, return_counts=True)
+
+        def seed_at(points):
+            # 1 + expected number of participants beating a player rated `points`
+            seeds = np.empty(len(points))
+            for start in range(0, len(points), GRID_BLOCK):
+                block = points[start:start + GRID_BLOCK, None]
+                win_probability = 1.0 / (1.0 + np.power(10.0, (block - values[None, :]) / 400.0))
+                seeds[start:start + GRID_BLOCK] = 1.0 + win_probability @ counts
+            return seeds
+
+        # Expected rank of each participant, excluding the 0.5 against themselves
+        own_seed = seed_at(values)[np.searchsorted(values, ratings)] - 0.5
+        target_seed = np.sqrt(own_seed * ranks)
+
+        # Seed decreases with rating; invert it on the grid
+        grid_seeds = seed_at(RATING_GRID)
+        index = np.searchsorted(-grid_seeds, -target_seed, side='right')
+        performance = RATING_GRID[np.clip(index - 1, 0, len(RATING_GRID) - 1)]
+        deltas = (performance - ratings) / 2.0
+
+        # Keep the total change close to zero
+        deltas += -deltas.sum() / n - 1
+
+        # Top participants should not gain rating in total
+        top_count = min(n, 4 * int(round(np.sqrt(n))))
+        top = np.argsort(-ratings, kind='stable')[:top_count]
+        deltas += min(max(-deltas[top].sum() / top_count, -10.0), 0.0)
+
+        return np.trunc(deltas).astype(np.int64)
+    
+    def apply_contest_results(self, contest, results):
+        """Persist final contest results and rating changes in one batch.
+
+        Args:
+            contest: Contest being finalized
+            results: ContestResult rows from the contest engine
+
+        Returns:
+            dict: Mapping of user id to rating change
+        """
+        if not results:
+            contest.status = ContestStatus.FINALIZED
+            contest.finalized_at = datetime.utcnow()
+            db.session.commit()
+            return {}
+
+        user_ids = [result.user_id for result in results]
+        users = {
+            row.id: row for row in db.session.execute(
+                select(User.id, User.name, User.email, User.rating, User.max_rating)
+                .where(User.id.in_(user_ids))
+            )
+        }
+        results = [result for result in results if result.user_id in users]
+        old_ratings = [users[result.user_id].rating for result in results]
+        deltas = self.calculate_rating_changes(old_ratings, [result.rank for result in results])
+
+        now = datetime.utcnow()
+        total = len(results)
+        rating_rows = []
+        user_rows = []
+        entry_rows = []
+        changes = {}
+        for result, old_rating, delta in zip(results, old_ratings, deltas.tolist()):
+            new_rating = old_rating + delta
+            changes[result.user_id] = delta
+            rating_rows.append({
+                'user_id': result.user_id,
+                'old_rating': old_rating,
+                'new_rating': new_rating,
+                'rating_change': delta,
+                'profit_percentage': result.profit_percentage,
+                'trades_count': result.trades_count,
+                'win_rate': result.win_rate,
+                'contest_name': contest.name,
+                'contest_duration': contest.duration_minutes,
+                'rank': result.rank,
+                'total_participants': total,
+                'created_at': now,
+            })
+            user_rows.append({
+                'b_id': result.user_id,
+                'rating': new_rating,
+                'max_rating': max(users[result.user_id].max_rating or old_rating, new_rating),
+            })
+            entry_rows.append({
+                'b_user_id': result.user_id,
+                'final_equity': result.final_equity,
+                'profit_percentage': result.profit_percentage,
+                'trades_count': result.trades_count,
+                'win_rate': result.win_rate,
+                'rank': result.rank,
+            })
+
+        users_table = User.__table__
+        entries_table = ContestEntry.__table__
+        db.session.execute(insert(Rating), rating_rows)
+        db.session.execute(
+            update(users_table)
+            .where(users_table.c.id == bindparam('b_id'))
+            .values(rating=bindparam('rating'), max_rating=bindparam('max_rating'),
+                    contests_participated=users_table.c.contests_participated + 1,
+                    updated_at=now),
+            user_rows
+        )
+        db.session.execute(
+            update(entries_table)
+            .where(entries_table.c.contest_id == contest.id)
+            .where(entries_table.c.user_id == bindparam('b_user_id')),
+            entry_rows
+        )
+        contest.status = ContestStatus.FINALIZED
+        contest.finalized_at = now
+        db.session.commit()
+
+        return changes
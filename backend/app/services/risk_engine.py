@@ -0,0 +1,448 @@
+"""
+Risk Engine
+Pre-trade risk checks against in-memory exposure aggregates. For every user
+the engine keeps cash, cash reserved by open buy orders and quantity reserved
+by open orders; positions live in a compact `PositionStore`. An order is
+checked under a lock in microseconds without querying balances or holdings.
+
+State is loaded from ``users``, ``portfolios`` and pending trades on first
+use in each worker process and then follows the append-only ledger: after a
+commit that wrote ledger entries only the entries after the last applied
+ledger id are read and applied. Concurrent transactions commit their entries
+out of id order, so at least every ``RISK_SYNC_INTERVAL`` seconds the sync
+also re-reads every entry above the position it had reached
+``RISK_SYNC_GRACE`` seconds earlier, and applies those it has not applied
+yet. The ids of entries in that window which are already applied (or already
+included in a loaded balance) are kept, so no entry is counted twice.
+
+Reservations of open orders live in the process that placed the order.
+Other workers do not see them, so orders placed through several workers at
+once can together commit more cash than a user has; a cancel or fill handled
+by another worker is picked up here at the next periodic sync, which drops
+reservations of orders that are no longer pending.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models.ledger import LedgerEntry, on_ledger_commit
+from app.models.portfolio import Portfolio
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.models.user import User
+from app.services.position_store import PositionStore, stage_position_change
+from app.services.price_feed import price_feed
+
+logger = logging.getLogger(__name__)
+
+# Attempts at reading an account while its ledger entries keep committing
+LOAD_ATTEMPTS = 5
+
+
+class RiskRejected(Exception):
+    """Raised when an order fails a pre-trade risk check."""
+
+
+class Reservation:
+    """Cash or quantity held back for an order until it fills or is cancelled."""
+
+    __slots__ = ('user_id', 'symbol', 'side', 'quantity', 'amount')
+
+    def __init__(self, user_id, symbol, side, quantity, amount):
+        self.user_id = user_id
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.amount = amount
+
+
+class _Account:
+    """Exposure aggregates of one user."""
+
+    __slots__ = ('cash', 'reserved_cash', 'pending_buys', 'pending_sells', 'open_orders')
+
+    def __init__(self, cash):
+        self.cash = cash
+        self.reserved_cash = 0.0
+        self.pending_buys = defaultdict(int)   # symbol -> quantity of open buy orders
+        self.pending_sells = defaultdict(int)  # symbol -> quantity of open sell orders
+        self.open_orders = 0
+
+
+class RiskEngine:
+    """In-memory pre-trade risk checks.
+
+    Settings:
+
+    - ``RISK_MAX_POSITION_QUANTITY``: largest position per symbol, counting open buys
+    - ``RISK_MAX_ORDER_VALUE``: largest value of a single order
+    - ``RISK_MAX_OPEN_ORDERS``: open (pending) orders per user
+    - ``RISK_SYNC_INTERVAL``: seconds before re-reading the ledger tail
+    - ``RISK_SYNC_GRACE``: seconds of ledger entries re-read for late commits
+    """
+
+    def __init__(self, app=None):
+        self.max_position_quantity = 100000
+        self.max_order_value = 1000000.0
+        self.max_open_orders = 50
+        self.sync_interval = 1.0
+        self.sync_grace = 60.0
+        self.accounts = {}
+        self.positions = PositionStore()
+        self.orders = {}  # pending trade id -> Reservation
+        self.ledger_position = 0  # Highest ledger entry id applied
+        self._positions = deque()  # (monotonic time, ledger position) since the grace window
+        self._applied = set()  # Ids above the window floor already applied or loaded
+        self._last_sync = 0.0
+        self._stale = False
+        self._pid = None
+        self._lock = threading.RLock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_position_quantity = app.config.get('RISK_MAX_POSITION_QUANTITY', 100000)
+        self.max_order_value = app.config.get('RISK_MAX_ORDER_VALUE', 1000000.0)
+        self.max_open_orders = app.config.get('RISK_MAX_OPEN_ORDERS', 50)
+        self.sync_interval = app.config.get('RISK_SYNC_INTERVAL', 1.0)
+        self.sync_grace = app.config.get('RISK_SYNC_GRACE', 60.0)
+        self._pid = None
+        app.extensions['risk_engine'] = self
+
+    def mark_stale(self):
+        """Read the ledger tail before the next check."""
+        self._stale = True
+
+    def load(self):
+        """(Re)build all aggregates from the database."""
+        with self._lock:
+            now = time.monotonic()
+            # Entries older than the grace window are taken as committed
+            floor = db.session.execute(
+                select(func.coalesce(func.max(LedgerEntry.id), 0))
+                .where(LedgerEntry.created_at <= datetime.utcnow() - timedelta(seconds=self.sync_grace))
+            ).scalar()
+            before = self._window_ids(floor)
+            accounts = {}
+            positions = []
+            for user_id, cash, symbol, quantity, avg_price in db.session.execute(self._state_query()):
+                if user_id not in accounts:
+                    accounts[user_id] = _Account(cash or 0.0)
+                if symbol is not None:
+                    positions.append((user_id, symbol, quantity, avg_price))
+            after = self._window_ids(floor)
+
+            # A user whose entries committed during the read may or may not have
+            # them in the balance read; such users are read again on their own
+            unsettled = {user_id for user_id in set(before) | set(after)
+                         if before.get(user_id) != after.get(user_id)}
+            self.positions.load(row for row in positions if row[0] not in unsettled)
+            for user_id in unsettled:
+                accounts.pop(user_id, None)
+            for user_id in accounts:
+                self.positions.add_user(user_id)
+
+            self.accounts = accounts
+            self.orders = {}
+            self._applied = {entry_id for user_id, ids in before.items()
+                             if user_id in accounts for entry_id in ids}
+            self.ledger_position = max([floor] + [max(ids) for ids in before.values()])
+            self._positions = deque([(now - self.sync_grace, floor), (now, self.ledger_position)])
+            self._load_orders(select(Trade.id, Trade.user_id, Trade.symbol, Trade.trade_type,
+                                     Trade.quantity, Trade.price_per_share))
+            for user_id in unsettled:
+                self._load_account(user_id)
+
+            self._last_sync = now
+            self._stale = False
+            self._pid = os.getpid()
+            logger.info(f"Risk engine loaded {len(self.accounts)} accounts, {len(self.orders)} open orders")
+
+    def sync(self, catch_up=False):
+        """Apply ledger entries committed since the last sync.
+
+        Args:
+            catch_up: Also re-read the grace window for entries that
+                committed after ones with higher ids
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self.load()
+                return
+            now = time.monotonic()
+            floor = self._floor(now)
+            start = floor if catch_up else self.ledger_position
+            rows = db.session.execute(
+                select(LedgerEntry.id, LedgerEntry.user_id, LedgerEntry.cash_delta,
+                       LedgerEntry.symbol, LedgerEntry.quantity_delta, LedgerEntry.price)
+                .where(LedgerEntry.id > start)
+                .order_by(LedgerEntry.id)
+            ).all()
+            applied = self._applied
+            for entry_id, user_id, cash_delta, symbol, quantity_delta, price in rows:
+                if entry_id in applied:
+                    continue
+                account = self.accounts.get(user_id)
+                # Accounts loaded later read balances that already include these entries
+                if account is not None:
+                    account.cash += cash_delta
+                    if symbol is not None and quantity_delta:
+                        self.positions.apply(user_id, symbol, quantity_delta, price or 0.0)
+                    applied.add(entry_id)
+                self.ledger_position = max(self.ledger_position, entry_id)
+
+            if self._positions[-1][1] != self.ledger_position:
+                self._positions.append((now, self.ledger_position))
+            if catch_up:
+                # Ids at or below the floor are never read again
+                self._applied = {entry_id for entry_id in applied if entry_id > floor}
+            self._last_sync = now
+            self._stale = False
+
+    def _floor(self, now):
+        """Ledger position reached ``sync_grace`` seconds ago; later entries may still commit."""
+        cutoff = now - self.sync_grace
+        positions = self._positions
+        while len(positions) > 1 and positions[1][0] <= cutoff:
+            positions.popleft()
+        return positions[0][1]
+
+    @staticmethod
+    def _window_ids(floor, user_id=None):
+        """Return the ids of committed entries above `floor`, grouped by user."""
+        query = select(LedgerEntry.user_id, LedgerEntry.id).where(LedgerEntry.id > floor)
+        if user_id is not None:
+            query = query.where(LedgerEntry.user_id == user_id)
+        ids = defaultdict(set)
+        for owner, entry_id in db.session.execute(query):
+            ids[owner].add(entry_id)
+        return dict(ids)
+
+    def _refresh(self):
+        if self._pid != os.getpid():
+            self.load()
+        elif time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync(catch_up=True)
+            self._release_closed_orders()
+        elif self._stale:
+            self.sync()
+
+    def _release_closed_orders(self):
+        """Drop reservations of orders cancelled or filled through other workers."""
+        if not self.orders:
+            return
+        pending = set(db.session.execute(
+            select(Trade.id).where(Trade.id.in_(list(self.orders)), Trade.status == TradeStatus.PENDING)
+        ).scalars())
+        for order_id in [order_id for order_id in self.orders if order_id not in pending]:
+            self.release(self.orders.pop(order_id))
+
+    def _load_orders(self, query):
+        """Hold reservations of the pending trades selected by `query`."""
+        for trade_id, user_id, symbol, trade_type, quantity, price in db.session.execute(
+            query.where(Trade.status == TradeStatus.PENDING)
+        ):
+            account = self.accounts.get(user_id)
+            if account is not None and trade_id not in self.orders:
+                account.open_orders += 1
+                self.orders[trade_id] = self._hold(account, user_id, symbol, trade_type, quantity, price)
+
+    def _load_account(self, user_id):
+        """Read one account together with the ledger entries its balance includes."""
+        floor = self._floor(time.monotonic())
+        for _ in range(LOAD_ATTEMPTS):
+            before = self._window_ids(floor, user_id).get(user_id, set())
+            rows = db.session.execute(self._state_query().where(User.id == user_id)).all()
+            if self._window_ids(floor, user_id).get(user_id, set()) == before:
+                break
+        else:
+            raise RiskRejected('Account is being updated, please retry')
+        if not rows:
+            return None
+
+        account = self.accounts[user_id] = _Account(rows[0][1] or 0.0)
+        self.positions.add_user(user_id)
+        for _, _, symbol, quantity, avg_price in rows:
+            if symbol is not None:
+                self.positions.set(user_id, symbol, quantity or 0, avg_price)
+        # Entries above the floor may also sit in the window of a later sync
+        self._applied.update(before)
+        self._load_orders(select(Trade.id, Trade.user_id, Trade.symbol, Trade.trade_type,
+                                 Trade.quantity, Trade.price_per_share)
+                          .where(Trade.user_id == user_id))
+        return account
+
+    def _account(self, user_id):
+        account = self.accounts.get(user_id)
+        if account is None:
+            # Registered after the engine loaded
+            account = self._load_account(user_id)
+            if account is None:
+                raise RiskRejected('Unknown user')
+        return account
+
+    @staticmethod
+    def _state_query():
+        """Balances and positions of users as ``(user_id, cash, symbol, quantity, avg_price)``.
+
+        One row per position (symbol None for users without positions), read
+        in one statement so that balances and positions agree.
+        """
+        # Duplicate rows of a position are merged at their weighted average price
+        quantity = func.sum(Portfolio.quantity)
+        positions = (
+            select(Portfolio.user_id, Portfolio.symbol, quantity.label('quantity'),
+                   func.coalesce(func.sum(Portfolio.quantity * Portfolio.avg_price)
+                                 / func.nullif(quantity, 0), func.max(Portfolio.avg_price))
+                   .label('avg_price'))
+            .group_by(Portfolio.user_id, Portfolio.symbol)
+            .subquery()
+        )
+        return (
+            select(User.id, User.current_balance,
+                   positions.c.symbol, positions.c.quantity, positions.c.avg_price)
+            .outerjoin(positions, positions.c.user_id == User.id)
+            .order_by(User.id)
+        )
+
+    def _hold(self, account, user_id, symbol, side, quantity, price):
+        amount = quantity * price if side is TradeType.BUY else 0.0
+        if side is TradeType.BUY:
+            account.reserved_cash += amount
+            account.pending_buys[symbol] += quantity
+        else:
+            account.pending_sells[symbol] += quantity
+        return Reservation(user_id, symbol, side, quantity, amount)
+
+    def reserve(self, user_id, symbol, side, quantity, price):
+        """Check an order against all limits and hold its cash or quantity.
+
+        Args:
+            side: TradeType.BUY or TradeType.SELL
+
+        Returns:
+            Reservation: To `settle` after the fill commits or `release` otherwise
+
+        Raises:
+            RiskRejected: With the reason the order was rejected
+        """
+        if quantity <= 0 or price <= 0:
+            raise RiskRejected('Quantity and price must be positive')
+        value = quantity * price
+        if value > self.max_order_value:
+            raise RiskRejected(f'Order value {value:.2f} exceeds the limit of {self.max_order_value:.2f}')
+
+        with self._lock:
+            self._refresh()
+            account = self._account(user_id)
+            if account.open_orders >= self.max_open_orders:
+                raise RiskRejected(f'Too many open orders (limit {self.max_open_orders})')
+
+            if side is TradeType.BUY:
+                available = account.cash - account.reserved_cash
+                if value > available:
+                    raise RiskRejected(f'Insufficient balance: {available:.2f} available')
+                exposure = self.positions.quantity(user_id, symbol) + account.pending_buys[symbol] + quantity
+                if exposure > self.max_position_quantity:
+                    raise RiskRejected(f'Position in {symbol} would exceed '
+                                       f'{self.max_position_quantity} shares')
+            else:
+                available = self.positions.quantity(user_id, symbol) - account.pending_sells[symbol]
+                if quantity > available:
+                    raise RiskRejected(f'Insufficient position: {available} {symbol} available')
+
+            account.open_orders += 1
+            return self._hold(account, user_id, symbol, side, quantity, price)
+
+    def release(self, reservation):
+        """Give back a reservation whose order was cancelled, rejected or failed."""
+        with self._lock:
+            account = self.accounts.get(reservation.user_id)
+            if account is None:
+                return
+            if reservation.side is TradeType.BUY:
+                account.reserved_cash -= reservation.amount
+                account.pending_buys[reservation.symbol] -= reservation.quantity
+            else:
+                account.pending_sells[reservation.symbol] -= reservation.quantity
+            account.open_orders -= 1
+
+    def settle(self, reservation):
+        """Apply a committed fill and drop its reservation in one step."""
+        with self._lock:
+            self.sync()
+            self.release(reservation)
+
+    def track_order(self, order_id, reservation):
+        """Keep the reservation of an order left open (pending)."""
+        with self._lock:
+            self.orders[order_id] = reservation
+
+    def fill_order(self, order_id):
+        """Settle the reservation of an open order whose fill committed; return False if unknown."""
+        with self._lock:
+            reservation = self.orders.pop(order_id, None)
+            if reservation is None:
+                return False
+            self.settle(reservation)
+            return True
+
+    def cancel_order(self, order_id):
+        """Release the reservation of an open order; return False if unknown."""
+        with self._lock:
+            reservation = self.orders.pop(order_id, None)
+            if reservation is None:
+                return False
+            self.release(reservation)
+            return True
+
+    def stage_fill(self, user_id, symbol, quantity_delta, price, trade=None):
+        """Stage a fill's position change for the current transaction.
+
+        The position is applied to the store from the ledger once committed
+        (see `settle`); the ``portfolios`` row is written at commit.
+        """
+        with self._lock:
+            exists = self.positions.get(user_id, symbol) is not None
+        stage_position_change(user_id, symbol, quantity_delta, price, trade=trade, exists=exists)
+
+    def exposure(self, user_id):
+        """Return a user's current aggregates and the valuation of their positions."""
+        with self._lock:
+            self._refresh()
+            account = self._account(user_id)
+            positions = {}
+            market_value = 0.0
+            for symbol, (quantity, avg_price) in self.positions.positions(user_id).items():
+                if not quantity:
+                    continue
+                quote = price_feed.quote(symbol)
+                price = quote.ltp if quote is not None and quote.ltp > 0 else avg_price
+                positions[symbol] = quantity
+                market_value += quantity * price
+            return {
+                'cash': account.cash,
+                'reserved_cash': account.reserved_cash,
+                'available_cash': account.cash - account.reserved_cash,
+                'positions': positions,
+                'market_value': market_value,
+                'pending_buys': {symbol: qty for symbol, qty in account.pending_buys.items() if qty},
+                'pending_sells': {symbol: qty for symbol, qty in account.pending_sells.items() if qty},
+                'open_orders': account.open_orders,
+                'limits': {
+                    'max_position_quantity': self.max_position_quantity,
+                    'max_order_value': self.max_order_value,
+                    'max_open_orders': self.max_open_orders
+                }
+            }
+
+
+risk_engine = RiskEngine()
+
+# Fills committed by this process are applied before the next check
+on_ledger_commit(risk_engine.mark_stale)
@@ -0,0 +1,309 @@
+"""
+Job Scheduler
+In-process scheduler for periodic jobs (quote refresh, mark-to-market, end of
+day roll, contest ratings) that does not depend on Redis being available.
+
+Only one process per host runs jobs: workers compete for an exclusive file
+lock and the holder becomes the leader. Jobs are handed to a pluggable broker,
+a thread pool by default or Celery when it is configured. A job that is still
+running when it comes due again is skipped rather than queued, so slow jobs
+never pile up.
+"""
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A periodic job, run either every `interval` seconds or daily at `daily_at`.
+
+    Args:
+        name: Unique job name
+        func: Callable run inside an application context
+        interval: Seconds between runs
+        daily_at: UTC time of day as ``'HH:MM'`` for once-a-day jobs
+    """
+
+    def __init__(self, name, func, interval=None, daily_at=None):
+        if (interval is None) == (daily_at is None):
+            raise ValueError('Exactly one of interval or daily_at is required')
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.daily_at = daily_at
+        self.next_run = None
+        self.metrics = JobMetrics()
+
+    def schedule_next(self, now):
+        """Compute the next run time after `now` (a UTC datetime)."""
+        if self.interval is not None:
+            self.next_run = now + timedelta(seconds=self.interval)
+            return self.next_run
+
+        hour, minute = (int(part) for part in self.daily_at.split(':'))
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        self.next_run = next_run
+        return next_run
+
+    def is_due(self, now):
+        return self.next_run is not None and now >= self.next_run
+
+
+class JobMetrics:
+    """Run counts and durations of a job."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.running = False
+        self.last_started = None
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'running': self.running,
+            'last_started': self.last_started.isoformat() if self.last_started else None,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else None,
+            'last_error': self.last_error
+        }
+
+
+class FileLeaderLock:
+    """Leader election between worker processes using a non-blocking flock."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None and self._pid == os.getpid()
+
+    def try_acquire(self):
+        """Try to become leader; return True if this process holds the lock."""
+        if self.is_leader:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('ascii'))
+        self._fd = fd
+        self._pid = os.getpid()
+        return True
+
+    def release(self):
+        if self.is_leader:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+        self._pid = None
+
+
+class Broker:
+    """Executes jobs handed over by the scheduler."""
+
+    def submit(self, job, run):
+        """Start `run()` for `job`; the scheduler tracks completion itself."""
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class ThreadPoolBroker(Broker):
+    """Runs jobs on a local thread pool."""
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='scheduler-job')
+
+    def submit(self, job, run):
+        self._executor.submit(run)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class CeleryBroker(Broker):
+    """Sends jobs to Celery workers through CELERY_BROKER_URL.
+
+    Celery is optional; this broker is only constructed when
+    ``SCHEDULER_BROKER = 'celery'``. Celery workers must import the app so
+    that the ``scheduler.run_job`` task and the job registry exist there too.
+    """
+
+    def __init__(self, app, scheduler):
+        try:
+            from celery import Celery
+        except ImportError as e:
+            raise RuntimeError('SCHEDULER_BROKER is "celery" but Celery is not installed') from e
+
+        self.celery = Celery(app.import_name,
+                             broker=app.config['CELERY_BROKER_URL'],
+                             backend=app.config['CELERY_RESULT_BACKEND'])
+
+        @self.celery.task(name='scheduler.run_job')
+        def run_job(name):
+            scheduler.run_now(name)
+
+        self._task = run_job
+        self._results = {}
+
+    def submit(self, job, run):
+        # The job body runs in a Celery worker, so only track the async result here
+        self._results[job.name] = self._task.apply_async(args=[job.name])
+
+    def is_running(self, job):
+        result = self._results.get(job.name)
+        return result is not None and not result.ready()
+
+
+class Scheduler:
+    """Runs registered jobs on the leader process.
+
+    Settings:
+
+    - ``SCHEDULER_ENABLED``: start the scheduler loop
+    - ``SCHEDULER_BROKER``: ``'thread'`` (default) or ``'celery'``
+    - ``SCHEDULER_LOCK_FILE``: file used for leader election
+    - ``SCHEDULER_TICK``: seconds between checks for due jobs
+    - ``SCHEDULER_MAX_WORKERS``: threads of the in-process broker
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.jobs = {}
+        self.broker = None
+        self.leader_lock = None
+        self.tick = 1.0
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.tick = app.config.get('SCHEDULER_TICK', 1.0)
+        lock_file = app.config.get('SCHEDULER_LOCK_FILE') or os.path.join(
+            tempfile.gettempdir(), 'frontpage-scheduler.lock')
+        self.leader_lock = FileLeaderLock(lock_file)
+
+        if app.config.get('SCHEDULER_BROKER', 'thread') == 'celery':
+            self.broker = CeleryBroker(app, self)
+        else:
+            self.broker = ThreadPoolBroker(app.config.get('SCHEDULER_MAX_WORKERS', 4))
+        app.extensions['scheduler'] = self
+
+    def add_job(self, name, func, interval=None, daily_at=None):
+        """Register a job; see `Job` for the scheduling arguments."""
+        job = Job(name, func, interval=interval, daily_at=daily_at)
+        job.schedule_next(datetime.utcnow())
+        self.jobs[name] = job
+        return job
+
+    def ensure_started(self):
+        """Start the scheduler loop once per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        if self.broker is not None:
+            self.broker.shutdown()
+        self.leader_lock.release()
+        self._pid = None
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            if not self.leader_lock.try_acquire():
+                continue
+            self.run_pending(datetime.utcnow())
+
+    def run_pending(self, now):
+        """Dispatch every due job, skipping jobs whose previous run is unfinished."""
+        for job in list(self.jobs.values()):
+            if not job.is_due(now):
+                continue
+            job.schedule_next(now)
+            if self._is_running(job):
+                job.metrics.skipped += 1
+                logger.warning(f"Job '{job.name}' is still running, skipping this run")
+                continue
+            job.metrics.running = True
+            self.broker.submit(job, lambda job=job: self._execute(job))
+
+    def _is_running(self, job):
+        if isinstance(self.broker, CeleryBroker):
+            return self.broker.is_running(job)
+        return job.metrics.running
+
+    def run_now(self, name):
+        """Run a job synchronously in the calling thread."""
+        job = self.jobs[name]
+        job.metrics.running = True
+        self._execute(job)
+
+    def _execute(self, job):
+        metrics = job.metrics
+        metrics.last_started = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                job.func()
+            metrics.last_error = None
+        except Exception as e:
+            metrics.failures += 1
+            metrics.last_error = str(e)
+            logger.exception(f"Job '{job.name}' failed")
+        finally:
+            duration = time.perf_counter() - start
+            metrics.runs += 1
+            metrics.last_duration = duration
+            metrics.max_duration = max(metrics.max_duration, duration)
+            metrics.total_duration += duration
+            metrics.running = False
+            logger.info(f"Job '{job.name}' finished in {duration * 1000:.1f} ms")
+
+    def metrics(self):
+        """Return per-job metrics and whether this process is the leader."""
+        return {
+            'is_leader': self.leader_lock.is_leader if self.leader_lock else False,
+            'jobs': {name: job.metrics.to_dict() for name, job in self.jobs.items()}
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,180 @@
+"""
+User Cache
+Keeps recently authenticated users in an in-process LRU cache with a TTL so
+that Flask-Login sessions and JWTs resolve to a user without a database
+round trip on every request.
+
+Requests receive a `CachedUser`, a read-only snapshot of the user's columns.
+Reads come from the snapshot; setting an attribute loads the real `User`
+into the session and applies the change there, so existing code like
+``current_user.name = ...; db.session.commit()`` keeps working. Entries are
+dropped after commits that change users, and each worker process bounds
+staleness with the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.user import User
+from app.utils.serialization import USER_COLUMNS, serialize_user_row, user_columns
+
+
+class CachedUser:
+    """Snapshot of a user's columns that behaves like a logged-in `User`."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    # Derived values only need snapshot columns
+    get_profit_percentage = User.get_profit_percentage
+    get_rating_title = User.get_rating_title
+
+    def __init__(self, row):
+        object.__setattr__(self, '_row', row)
+        object.__setattr__(self, '_values', dict(zip(USER_COLUMNS, row)))
+        object.__setattr__(self, '_model', None)
+
+    def __getattr__(self, name):
+        values = self._values
+        if name in values:
+            return values[name]
+        # Relationships, password hash etc. come from the real model
+        return getattr(self.get_model(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get_model(), name, value)
+        if name in self._values:
+            self._values[name] = value
+            object.__setattr__(self, '_row', tuple(self._values[column] for column in USER_COLUMNS))
+
+    def get_model(self):
+        """Load the `User` row into the current session."""
+        if self._model is None:
+            object.__setattr__(self, '_model', db.session.get(User, self._values['id']))
+        return self._model
+
+    def get_id(self):
+        return str(self._values['id'])
+
+    def to_dict(self):
+        return serialize_user_row(self._row)
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self._values['id']
+
+    def __hash__(self):
+        return hash(self._values['id'])
+
+    def __repr__(self):
+        return f"<CachedUser {self._values['name']} ({self._values['email']})>"
+
+
+class UserCache:
+    """LRU cache of user snapshots with a time to live.
+
+    Settings:
+
+    - ``USER_CACHE_SIZE``: maximum cached users per process (0 disables)
+    - ``USER_CACHE_TTL``: seconds a snapshot is served before reloading
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 10000
+        self.ttl = 60.0
+        self._entries = OrderedDict()  # user id -> (expires, row)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get('USER_CACHE_SIZE', 10000)
+        self.ttl = app.config.get('USER_CACHE_TTL', 60.0)
+        self.clear()
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id):
+        """Return a `CachedUser` for an active user, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return CachedUser(entry[1])
+            self.stats['misses'] += 1
+
+        # Always from the primary: a snapshot of a lagging replica row would be
+        # served to every later request until it expires
+        row = db.session.execute(select(*user_columns()).where(User.id == user_id),
+                                 bind_arguments={'bind': db.engine}).first()
+        if row is None or not row.is_active:
+            self.invalidate(user_id)
+            return None
+        row = tuple(row)
+        if self.max_size:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, row)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return CachedUser(row)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def load_user(user_id):
+    """Flask-Login user loader."""
+    try:
+        return user_cache.get(int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def lookup_jwt_user(jwt_header, jwt_data):
+    """flask_jwt_extended user lookup; the identity is the user id."""
+    return load_user(jwt_data.get('sub'))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault('user_cache_ids', set()).update(changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_user_changes(orm_execute_state):
+    # Bulk UPDATE/DELETE statements on users may touch any row
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        if getattr(orm_execute_state.statement, 'table', None) is User.__table__:
+            orm_execute_state.session.info['user_cache_clear'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    if session.info.pop('user_cache_clear', False):
+        user_cache.clear()
+    changed = session.info.pop('user_cache_ids', None)
+    if changed:
+        user_cache.invalidate(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('user_cache_clear', None)
+    session.info.pop('user_cache_ids', None)
@@ -0,0 +1,5 @@
+"""
+Utilities Package
+This package contains helpers shared by the routes, models and services,
+such as request profiling and serialization utilities.
+"""
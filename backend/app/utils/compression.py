@@ -0,0 +1,148 @@
+"""
+Response Compression
+Compresses API responses with the best encoding the client accepts: brotli
+when the optional ``brotli`` package is installed, otherwise gzip.
+
+- Buffered responses are compressed when their body reaches
+  ``COMPRESSION_MIN_SIZE`` bytes
+- Streamed responses are compressed chunk by chunk as they are produced, so
+  large list endpoints never hold the whole body in memory; their size is
+  unknown up front, so they are compressed whenever the client accepts it
+- ``Vary: Accept-Encoding`` is set on every compressible response so caches
+  keep the encodings apart
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = ('application/json', 'text/csv', 'text/html', 'text/plain',
+                     'text/css', 'application/javascript')
+
+
+def available_encodings():
+    """Return the supported content codings, best first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q}`` from an Accept-Encoding header."""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header, encodings=None):
+    """Pick the content coding for a response, or None to send it as is."""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in encodings or available_encodings():
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _Encoder:
+    """Incremental compressor with a uniform interface for gzip and brotli."""
+
+    def __init__(self, coding, level, brotli_quality):
+        self.coding = coding
+        if coding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """Compress `data` and flush it, so every chunk reaches the client right away."""
+        if self.coding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.coding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(data, coding, level=6, brotli_quality=4):
+    """Compress a complete body in one call."""
+    if coding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def iter_compressed(chunks, coding, level=6, brotli_quality=4):
+    """Compress an iterable of byte chunks, yielding compressed chunks."""
+    encoder = _Encoder(coding, level, brotli_quality)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                data = encoder.compress(chunk)
+                if data:
+                    yield data
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def configure_compression(app):
+    """Register the response compression hook.
+
+    Settings: ``COMPRESSION_ENABLED``, ``COMPRESSION_MIN_SIZE`` (bytes),
+    ``COMPRESSION_LEVEL`` (gzip, 1-9), ``COMPRESSION_BROTLI_QUALITY`` (0-11)
+    and ``COMPRESSION_MIMETYPES``.
+    """
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    level = app.config.get('COMPRESSION_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+    mimetypes = frozenset(app.config.get('COMPRESSION_MIMETYPES') or DEFAULT_MIMETYPES)
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.mimetype not in mimetypes or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not response.is_streamed and (response.content_length or 0) < min_size:
+            return response
+        coding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if coding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = iter_compressed(response.response, coding, level, brotli_quality)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), coding, level, brotli_quality))
+        response.headers['Content-Encoding'] = coding
+        etag, _ = response.get_etag()
+        if etag:
+            # The compressed body is a different representation
+            response.set_etag(etag, weak=True)
+        return response
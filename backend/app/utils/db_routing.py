@@ -0,0 +1,187 @@
+"""
+Read/Write Routing
+Sends the SELECTs of designated read-heavy endpoints to a read replica while
+everything else (and every write) stays on the primary database.
+
+- ``REPLICA_DATABASE_URI`` adds a ``replica`` bind; without it nothing changes
+- ``READ_REPLICA_ENDPOINTS`` lists the endpoint names whose reads may be
+  served by the replica
+- After a request that wrote to the database, that user's reads go to the
+  primary for ``READ_YOUR_WRITES_WINDOW`` seconds, so users see their own
+  writes despite replication lag. Authenticated users are tracked by id in
+  the worker that served the write (covering JWT and API clients), and every
+  client also gets a short-lived cookie that holds across workers
+
+For local testing two SQLite files can be kept in sync with `replicate_sqlite`,
+a stand-in for real replication built on the sqlite3 backup API.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import current_app, g, has_app_context, request
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+from sqlalchemy.engine import make_url
+
+from app.utils.rate_limiting import authenticated_user_id
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Session that routes plain SELECTs to the replica when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, Select)
+                and has_app_context() and g.get('db_read_replica', False)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure_read_replica(app):
+    """Add the replica bind and request hooks; call before ``db.init_app``."""
+    uri = app.config.get('REPLICA_DATABASE_URI')
+    if not uri:
+        return
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **{REPLICA_BIND: uri})
+    endpoints = frozenset(app.config.get('READ_REPLICA_ENDPOINTS', ()))
+    cookie = app.config.get('READ_YOUR_WRITES_COOKIE', 'db_primary_until')
+    window = app.config.get('READ_YOUR_WRITES_WINDOW', 5)
+    writers = _RecentWriters(window, app.config.get('READ_YOUR_WRITES_MAX_USERS', 10000))
+
+    @app.before_request
+    def _route_reads():
+        if request.endpoint not in endpoints:
+            return
+        try:
+            sticky = float(request.cookies.get(cookie, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        # Resolved before the flag is set, so the user itself loads from the primary
+        g.db_read_replica = not (sticky or writers.wrote_recently(authenticated_user_id()))
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if g.get('db_wrote'):
+            writers.add(authenticated_user_id())
+            response.set_cookie(cookie, f'{time.time() + window:.3f}', max_age=window,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class _RecentWriters:
+    """Ids of users who wrote within the last `window` seconds, oldest first."""
+
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self._deadlines = OrderedDict()  # user id -> monotonic deadline
+        self._lock = threading.Lock()
+
+    def add(self, user_id):
+        if user_id is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._deadlines[str(user_id)] = now + self.window
+            self._deadlines.move_to_end(str(user_id))
+            # Deadlines grow in insertion order, so expired entries lead
+            while self._deadlines and (len(self._deadlines) > self.max_size
+                                       or next(iter(self._deadlines.values())) <= now):
+                self._deadlines.popitem(last=False)
+
+    def wrote_recently(self, user_id):
+        if user_id is None:
+            return False
+        with self._lock:
+            return self._deadlines.get(str(user_id), 0) > time.monotonic()
+
+
+@event.listens_for(Session, 'after_flush')
+def _flag_flush_write(session, flush_context):
+    session.info['db_wrote'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _flag_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_wrote'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('db_wrote', False) and has_app_context():
+        g.db_wrote = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('db_wrote', None)
+
+
+def _sqlite_path(uri):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise ValueError(f'{uri} is not a file-backed SQLite database')
+    return url.database
+
+
+def replicate_sqlite(app=None):
+    """Copy the primary SQLite database onto the replica file.
+
+    Returns:
+        bool: False if the replica was busy and the copy should be retried
+    """
+    from app import db
+    with (app or current_app).app_context():
+        # Engine URLs have relative SQLite paths resolved against the instance folder
+        source_path = _sqlite_path(db.engines[None].url)
+        target_path = _sqlite_path(db.engines[REPLICA_BIND].url)
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=1.0)
+    try:
+        source.backup(target)
+        return True
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Replica copy skipped: {e}")
+        return False
+    finally:
+        target.close()
+        source.close()
+
+
+def register_replication_jobs(scheduler, app):
+    """Run the SQLite replication stand-in from the scheduler when both databases are SQLite files."""
+    if not app.config.get('REPLICA_DATABASE_URI'):
+        return
+    try:
+        _sqlite_path(app.config['SQLALCHEMY_DATABASE_URI'])
+        _sqlite_path(app.config['REPLICA_DATABASE_URI'])
+    except ValueError:
+        return
+    scheduler.add_job('sqlite_replication', replicate_sqlite,
+                      interval=app.config.get('REPLICA_SYNC_INTERVAL', 2))
+
+
+replica_cli = AppGroup('replica', help='SQLite read replica stand-in.')
+
+
+@replica_cli.command('sync')
+@click.option('--interval', type=float, help='Keep copying every INTERVAL seconds.')
+def sync_command(interval):
+    """Copy the primary SQLite database onto the replica."""
+    while True:
+        if replicate_sqlite():
+            click.echo('Replica updated')
+        if not interval:
+            return
+        time.sleep(interval)
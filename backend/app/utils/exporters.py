@@ -0,0 +1,151 @@
+"""
+Streaming Exporters
+Incremental CSV and Parquet writers for full data exports. Rows are consumed
+from a streamed query result and emitted in chunks, so memory use stays
+constant no matter how many rows are exported. Parquet needs pyarrow, which
+is optional; CSV is always available.
+"""
+import csv
+import io
+from datetime import datetime
+
+from app.utils.serialization import STREAM_CHUNK_SIZE
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional, only CSV exports are available without it
+    pyarrow = None
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Column types of exported rows (the keys of the row serializers' output)
+TRADE_EXPORT_FIELDS = (
+    ('id', 'int'), ('user_id', 'int'), ('symbol', 'str'), ('company_name', 'str'),
+    ('trade_type', 'str'), ('quantity', 'int'), ('price_per_share', 'float'),
+    ('total_amount', 'float'), ('market_price', 'float'), ('current_price', 'float'),
+    ('status', 'str'), ('unrealized_pnl', 'float'), ('realized_pnl', 'float'),
+    ('profit_percentage', 'float'), ('trade_value', 'float'), ('is_active', 'bool'),
+    ('created_at', 'str'), ('executed_at', 'str'), ('updated_at', 'str'), ('notes', 'str'),
+)
+
+RATING_EXPORT_FIELDS = (
+    ('id', 'int'), ('user_id', 'int'), ('old_rating', 'int'), ('new_rating', 'int'),
+    ('rating_change', 'int'), ('old_rating_title', 'str'), ('new_rating_title', 'str'),
+    ('old_rating_color', 'str'), ('new_rating_color', 'str'), ('profit_percentage', 'float'),
+    ('performance_grade', 'str'), ('trades_count', 'int'), ('win_rate', 'float'),
+    ('contest_name', 'str'), ('contest_duration', 'int'), ('rank', 'int'),
+    ('total_participants', 'int'), ('is_rating_increase', 'bool'), ('is_provisional', 'bool'),
+    ('created_at', 'str'), ('notes', 'str'),
+)
+
+
+def available_formats():
+    """Return the export formats supported by the installed packages."""
+    return [name for name in EXPORT_FORMATS if name != 'parquet' or pyarrow is not None]
+
+
+def parse_date_range(start, end):
+    """Parse ISO ``start``/``end`` query values into datetimes.
+
+    A date-only ``end`` includes the whole day.
+
+    Raises:
+        ValueError: If a value is not an ISO date or datetime
+    """
+    start_at = datetime.fromisoformat(start) if start else None
+    end_at = None
+    if end:
+        end_at = datetime.fromisoformat(end)
+        if len(end) == 10:
+            end_at = end_at.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start_at, end_at
+
+
+def iter_export(rows, serializer, fields, export_format, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield an export file as byte chunks in the requested format."""
+    if export_format == 'parquet':
+        return iter_parquet(rows, serializer, fields, chunk_size)
+    return iter_csv(rows, serializer, fields, chunk_size)
+
+
+def _chunks(rows, serializer, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(serializer(row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, serializer, fields, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield CSV bytes, one chunk per `chunk_size` rows, starting with the header."""
+    names = [name for name, _ in fields]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names, extrasaction='ignore')
+    writer.writeheader()
+    for chunk in _chunks(rows, serializer, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object collecting bytes until they are drained."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(fields):
+    types = {'int': pyarrow.int64(), 'float': pyarrow.float64(),
+             'bool': pyarrow.bool_(), 'str': pyarrow.string()}
+    return pyarrow.schema([(name, types[kind]) for name, kind in fields])
+
+
+def iter_parquet(rows, serializer, fields, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a Parquet file as bytes, writing one row group per chunk."""
+    if pyarrow is None:
+        raise RuntimeError('Parquet export requires pyarrow')
+    schema = _arrow_schema(fields)
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode='w'), schema)
+    try:
+        for chunk in _chunks(rows, serializer, chunk_size):
+            writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def write_export(path, rows, serializer, fields, export_format, chunk_size=STREAM_CHUNK_SIZE):
+    """Write an export to `path`; return the number of bytes written."""
+    written = 0
+    with open(path, 'wb') as output:
+        for data in iter_export(rows, serializer, fields, export_format, chunk_size):
+            output.write(data)
+            written += len(data)
+    return written
@@ -0,0 +1,101 @@
+"""
+Lazy Extensions
+Proxy for Flask extensions that are rarely used (mail, migrations) so their
+packages are imported and initialized on first use instead of at startup.
+This keeps cold starts short on instances that are spun up on demand.
+"""
+import threading
+from importlib import import_module
+
+import click
+
+
+class LazyExtension:
+    """Stand-in for a Flask extension instance that is created on first use.
+
+    Attribute access on the proxy (e.g. ``mail.send``) imports the extension,
+    creates it and replays every deferred ``init_app`` call before delegating.
+
+    Args:
+        target: Import path of the extension class, as ``'module:Class'``
+        key: Key the extension registers itself under in ``app.extensions``
+        cli_group: Optional ``(name, 'module:attr')`` of a CLI group the
+            extension adds in ``init_app``; a placeholder group is registered
+            so the command stays available before the extension is loaded
+    """
+
+    def __init__(self, target, key, cli_group=None):
+        self._target = target
+        self._key = key
+        self._cli_group = cli_group
+        self._extension = None
+        self._pending = []
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self):
+        """Whether the underlying extension has been created."""
+        return self._extension is not None
+
+    def init_app(self, app, *args, lazy=True, **kwargs):
+        """Register an app, deferring the real ``init_app`` when `lazy` is set."""
+        with self._lock:
+            self._pending.append((app, args, kwargs))
+        if not lazy:
+            self._load()
+            return
+
+        app.extensions[self._key] = _LazyExtensionState(self, app)
+        if self._cli_group is not None:
+            name, target = self._cli_group
+            app.cli.add_command(_LazyCommandGroup(name, target, self._load))
+
+    def _load(self):
+        """Create the extension and run all deferred ``init_app`` calls."""
+        with self._lock:
+            if self._extension is None:
+                self._extension = _import_target(self._target)()
+            while self._pending:
+                app, args, kwargs = self._pending.pop(0)
+                self._extension.init_app(app, *args, **kwargs)
+            return self._extension
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+class _LazyExtensionState:
+    """Placeholder for ``app.extensions[key]`` that loads the extension on access."""
+
+    def __init__(self, proxy, app):
+        self._proxy = proxy
+        self._app = app
+
+    def __getattr__(self, name):
+        self._proxy._load()
+        return getattr(self._app.extensions[self._proxy._key], name)
+
+
+class _LazyCommandGroup(click.Group):
+    """CLI group that imports the real group only when it is invoked."""
+
+    def __init__(self, name, target, loader):
+        super().__init__(name=name, help=f'Commands from {target.split(":")[0]}.')
+        self._target = target
+        self._loader = loader
+
+    def _resolve(self):
+        self._loader()
+        return _import_target(self._target)
+
+    def list_commands(self, ctx):
+        return self._resolve().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self._resolve().get_command(ctx, cmd_name)
+
+
+def _import_target(target):
+    """Import ``'module:attr'`` and return the attribute."""
+    module_name, attr = target.split(':')
+    return getattr(import_module(module_name), attr)
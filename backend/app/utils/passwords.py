@@ -0,0 +1,47 @@
+"""
+Password Hashing
+Password hashes use the method configured in ``PASSWORD_HASH_METHOD`` (any
+werkzeug method string, e.g. ``'pbkdf2:sha256:600000'`` or
+``'scrypt:32768:8:1'``). Stored hashes carry their own parameters, so old
+hashes keep verifying after the setting changes and are upgraded the next
+time their owner logs in.
+"""
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+DEFAULT_SALT_LENGTH = 16
+
+
+def _settings():
+    if not has_app_context():
+        return DEFAULT_HASH_METHOD, DEFAULT_SALT_LENGTH
+    config = current_app.config
+    return (config.get('PASSWORD_HASH_METHOD') or DEFAULT_HASH_METHOD,
+            config.get('PASSWORD_SALT_LENGTH') or DEFAULT_SALT_LENGTH)
+
+
+@lru_cache(maxsize=None)
+def _full_method(method):
+    # werkzeug fills in defaults for short methods ('pbkdf2' -> 'pbkdf2:sha256:600000'),
+    # so compare against the prefix of a real hash rather than the setting itself
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def hash_password(password):
+    """Hash a password with the configured method."""
+    method, salt_length = _settings()
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash made with any method."""
+    return check_password_hash(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Return True if a stored hash was made with other parameters than configured."""
+    method, _ = _settings()
+    return password_hash.split('$', 1)[0] != _full_method(method)
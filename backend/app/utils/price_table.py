@@ -0,0 +1,237 @@
+"""
+Price Table
+Fixed-layout quote table in a shared mmap'd file, indexed by instrument id
+(``stocks.id``). One feeder process publishes quotes; every worker on the
+host maps the same file and reads quotes without locks or system calls.
+
+Each slot is guarded by a sequence counter (a seqlock): the writer makes the
+counter odd, writes the fields and makes it even again. A reader copies the
+slot and retries if the counter was odd or changed meanwhile, so it never
+returns a half-written quote and never blocks the writer.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+# File header: magic, layout version, number of slots, symbol generation
+# (bumped whenever a slot is assigned a new symbol); padded to 64 bytes
+_HEADER = struct.Struct('<8sIIQ40x')
+_GENERATION = struct.Struct('<Q')
+_GENERATION_OFFSET = 16
+_MAGIC = b'FPPRICES'
+_VERSION = 1
+
+# Slot: sequence number, then symbol, LTP, bid, ask, previous close,
+# volume and publish time (Unix seconds)
+_SEQ = struct.Struct('<Q')
+_FIELDS = struct.Struct('<16sddddqd')
+_SLOT_SIZE = _SEQ.size + _FIELDS.size
+
+DEFAULT_SLOTS = 4096
+# Reads give up after this many torn copies (e.g. a feeder died mid-write)
+MAX_READ_RETRIES = 100
+
+Quote = namedtuple('Quote', 'instrument_id symbol ltp bid ask close volume updated_at seqno')
+
+
+def default_table_path():
+    """Return the default location of the shared price table."""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'frontpage-prices.shm')
+
+
+class SharedPriceTable:
+    """Seqlock-protected quote slots in a shared mmap'd file.
+
+    Slot ``i`` holds the quote of the instrument with id ``i``; ids must be
+    in ``1..slots-1``. Readers resolve symbols through a per-process index
+    that is rebuilt only when the writer has assigned new symbols.
+
+    Writes serialize on an exclusive ``flock`` so a second feeder cannot
+    tear slots, but the table is meant to have a single writer. A forked
+    child closes the inherited descriptor and mapping and reopens the file
+    on next use, so every process holds its own lock.
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._size = _HEADER.size + slots * _SLOT_SIZE
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self._symbols = {}  # symbol -> instrument id
+        self._generation = None
+        _open_tables.add(self)
+
+    def _open(self):
+        with self._thread_lock:
+            if self._map is not None:
+                return self._map
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < self._size:
+                        os.ftruncate(fd, self._size)
+                        os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, self.slots, 0), 0)
+                    magic, version, slots, _ = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+                    if magic != _MAGIC or version != _VERSION or slots != self.slots:
+                        raise ValueError(f"Incompatible price table at {self.path}")
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                table_map = mmap.mmap(fd, self._size)
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+            self._map = table_map
+            return table_map
+
+    def _after_fork(self):
+        # Close the inherited descriptor and mapping; the child reopens the
+        # file on next use so it holds its own lock. The parent is unaffected.
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._map = None
+        self._thread_lock = threading.Lock()
+
+    def _offset(self, instrument_id):
+        if not 0 < instrument_id < self.slots:
+            raise ValueError(f"Instrument id {instrument_id} outside the price table (1..{self.slots - 1})")
+        return _HEADER.size + instrument_id * _SLOT_SIZE
+
+    def read(self, instrument_id):
+        """Return the latest `Quote` of an instrument, or None if none was published."""
+        buffer = self._map if self._map is not None else self._open()
+        offset = self._offset(instrument_id)
+        for _ in range(MAX_READ_RETRIES):
+            seqno = _SEQ.unpack_from(buffer, offset)[0]
+            if seqno & 1:
+                continue
+            fields = _FIELDS.unpack_from(buffer, offset + _SEQ.size)
+            if _SEQ.unpack_from(buffer, offset)[0] != seqno:
+                continue
+            if not seqno:
+                return None
+            symbol, ltp, bid, ask, close, volume, updated_at = fields
+            return Quote(instrument_id, symbol.rstrip(b'\0').decode('ascii'),
+                         ltp, bid, ask, close, volume, updated_at, seqno)
+        return None
+
+    def instrument_id(self, symbol):
+        """Return the instrument id the feeder published `symbol` under, or None."""
+        if self._map is None:
+            self._open()
+        instrument_id = self._symbols.get(symbol)
+        if instrument_id is None:
+            generation = _GENERATION.unpack_from(self._map, _GENERATION_OFFSET)[0]
+            if generation != self._generation:
+                self._reindex(generation)
+                instrument_id = self._symbols.get(symbol)
+        return instrument_id
+
+    def _reindex(self, generation):
+        symbols = {}
+        for instrument_id in range(1, self.slots):
+            quote = self.read(instrument_id)
+            if quote is not None:
+                symbols[quote.symbol] = instrument_id
+        self._symbols = symbols
+        self._generation = generation
+
+    def lookup(self, symbol):
+        """Return the latest `Quote` of `symbol`, or None."""
+        instrument_id = self.instrument_id(symbol)
+        if instrument_id is None:
+            return None
+        quote = self.read(instrument_id)
+        if quote is None or quote.symbol != symbol:
+            # The id was reassigned; drop it so the next lookup reindexes
+            self._symbols.pop(symbol, None)
+            self._generation = None
+            return None
+        return quote
+
+    def publish(self, quotes):
+        """Write quotes into their slots.
+
+        Args:
+            quotes: Iterable of ``(instrument_id, symbol, ltp, bid, ask, close, volume)``
+
+        Returns:
+            int: Number of slots written
+        """
+        now = time.time()
+        written = 0
+        with self._locked():
+            buffer = self._map
+            renamed = False
+            for instrument_id, symbol, ltp, bid, ask, close, volume in quotes:
+                offset = self._offset(instrument_id)
+                encoded = symbol.encode('ascii')
+                seqno = _SEQ.unpack_from(buffer, offset)[0]
+                if seqno & 1:
+                    # Left odd by a writer that died mid-update
+                    seqno += 1
+                if not seqno or _FIELDS.unpack_from(buffer, offset + _SEQ.size)[0].rstrip(b'\0') != encoded:
+                    renamed = True
+                _SEQ.pack_into(buffer, offset, seqno + 1)
+                _FIELDS.pack_into(buffer, offset + _SEQ.size, encoded, ltp, bid or 0.0, ask or 0.0,
+                                  close or 0.0, volume or 0, now)
+                _SEQ.pack_into(buffer, offset, seqno + 2)
+                written += 1
+            if renamed:
+                generation = _GENERATION.unpack_from(buffer, _GENERATION_OFFSET)[0]
+                _GENERATION.pack_into(buffer, _GENERATION_OFFSET, generation + 1)
+        return written
+
+    def snapshot(self):
+        """Return all published quotes keyed by instrument id."""
+        quotes = {}
+        for instrument_id in range(1, self.slots):
+            quote = self.read(instrument_id)
+            if quote is not None:
+                quotes[instrument_id] = quote
+        return quotes
+
+    def _locked(self):
+        if self._map is None:
+            self._open()
+        return _TableLock(self._thread_lock, self._fd)
+
+
+class _TableLock:
+    """Context manager holding the thread lock and the file lock."""
+
+    def __init__(self, thread_lock, fd):
+        self._thread_lock = thread_lock
+        self._fd = fd
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+_open_tables = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for table in list(_open_tables):
+        table._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,218 @@
+"""
+SQL Query Profiler
+Opt-in profiling mode that hooks SQLAlchemy engine events to log slow
+statements (with their EXPLAIN output) and to detect N+1 patterns, i.e. the
+same statement shape executed repeatedly while serving one request.
+Findings are attributed to the Flask endpoint that issued the queries.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Collapse literals and IN-lists so that queries differing only in their
+# values share the same "shape"
+_NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Kept in the WSGI environ rather than on `g`: streamed bodies run under a
+# fresh app context (and `g`) once the view has returned
+_STATS_KEY = 'query_profiler.stats'
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in test mode when an endpoint issues more queries than allowed."""
+
+
+def normalize_statement(statement):
+    """Reduce a SQL statement to its shape for repeated-query detection."""
+    shape = _STRING_RE.sub('?', statement)
+    shape = _IN_LIST_RE.sub('IN (?)', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+class RequestQueryStats:
+    """Queries recorded while serving a single request."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+        self.slow_queries = []
+
+    def repeated_shapes(self, threshold):
+        """Return (shape, count) pairs executed at least `threshold` times."""
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= threshold]
+
+
+class QueryProfiler:
+    """Flask extension recording per-request SQL statistics.
+
+    Enabled with the ``SQL_PROFILING`` config flag. Relevant settings:
+
+    - ``SLOW_QUERY_THRESHOLD_MS``: statements slower than this are logged
+      together with their EXPLAIN plan.
+    - ``N_PLUS_ONE_THRESHOLD``: a statement shape executed this many times
+      within one request is reported as a likely N+1.
+    - ``QUERY_BUDGETS``: mapping of endpoint name to the maximum number of
+      queries it may issue; ``DEFAULT_QUERY_BUDGET`` applies otherwise.
+    - ``ENFORCE_QUERY_BUDGETS``: raise ``QueryBudgetExceeded`` when a budget
+      is exceeded (meant for the test suite, so CI fails on regressions).
+
+    Streamed responses are checked when their body is closed rather than in
+    ``after_request``, so the queries issued while streaming are counted.
+    """
+
+    _listening = False
+
+    def __init__(self, app=None):
+        self.app = None
+        self.slow_threshold = 0.1
+        self.n_plus_one_threshold = 5
+        self.budgets = {}
+        self.default_budget = None
+        self.enforce_budgets = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read profiler settings and install engine and request hooks."""
+        self.app = app
+        self.slow_threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 100) / 1000.0
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 5)
+        self.budgets = dict(app.config.get('QUERY_BUDGETS') or {})
+        self.default_budget = app.config.get('DEFAULT_QUERY_BUDGET')
+        self.enforce_budgets = app.config.get('ENFORCE_QUERY_BUDGETS', False)
+
+        # Listen on the Engine class so every engine (including binds) is covered
+        if not QueryProfiler._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            QueryProfiler._listening = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['query_profiler'] = self
+
+    def _start_request(self):
+        request.environ[_STATS_KEY] = RequestQueryStats(request.endpoint)
+
+    def _finish_request(self, response):
+        stats = request.environ.get(_STATS_KEY)
+        if stats is None:
+            return response
+
+        if response.is_streamed:
+            # Streamed bodies (trade history, exports) run their row queries
+            # after this hook, so they are reported once the body is closed
+            response.call_on_close(lambda: self.report(stats))
+            return response
+
+        request.environ.pop(_STATS_KEY, None)
+        if stats.count:
+            response.headers['X-Query-Count'] = str(stats.count)
+        self.report(stats)
+        return response
+
+    def report(self, stats):
+        """Log N+1 patterns and query totals, then check the query budget."""
+        for shape, count in stats.repeated_shapes(self.n_plus_one_threshold):
+            logger.warning(
+                f"Possible N+1 in endpoint '{stats.endpoint}': "
+                f"{count} executions of: {shape}"
+            )
+
+        if stats.count:
+            logger.info(
+                f"Endpoint '{stats.endpoint}' issued {stats.count} queries "
+                f"in {stats.total_time * 1000:.1f} ms "
+                f"({len(stats.slow_queries)} slow)"
+            )
+
+        self.check_budget(stats)
+
+    def budget_for(self, endpoint):
+        """Return the query budget for an endpoint, or None if unlimited."""
+        return self.budgets.get(endpoint, self.default_budget)
+
+    def check_budget(self, stats):
+        """Log, and in enforcing mode raise, when an endpoint is over budget."""
+        budget = self.budget_for(stats.endpoint)
+        if budget is None or stats.count <= budget:
+            return
+
+        message = (f"Endpoint '{stats.endpoint}' issued {stats.count} queries, "
+                   f"budget is {budget}")
+        if self.enforce_budgets:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def record(self, conn, statement, parameters, elapsed):
+        """Attribute an executed statement to the current request."""
+        stats = request.environ.get(_STATS_KEY)
+        if stats is None:
+            return
+
+        stats.count += 1
+        stats.total_time += elapsed
+        stats.shapes[normalize_statement(statement)] += 1
+
+        if elapsed >= self.slow_threshold:
+            plan = explain(conn, statement, parameters)
+            stats.slow_queries.append((statement, elapsed, plan))
+            logger.warning(
+                f"Slow query in endpoint '{stats.endpoint}' "
+                f"({elapsed * 1000:.1f} ms): {statement}\n"
+                f"Plan:\n{plan}"
+            )
+
+
+def explain(conn, statement, parameters):
+    """Return the EXPLAIN output for a SELECT statement as text.
+
+    The plan is fetched on a separate DBAPI cursor so the cursor of the
+    profiled statement (and its pending results) is left untouched.
+    """
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return '(not a SELECT statement)'
+
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f'(EXPLAIN failed: {e})'
+
+    return '\n'.join(' | '.join(str(col) for col in row) for row in rows)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('_query_start_time')
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    if not has_request_context() or _STATS_KEY not in request.environ:
+        return
+    profiler = current_app.extensions.get('query_profiler')
+    if profiler is not None:
+        profiler.record(conn, statement, parameters, elapsed)
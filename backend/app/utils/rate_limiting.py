@@ -0,0 +1,314 @@
+"""
+Rate Limiting
+Shared rate limit storage for Flask-Limiter and the key function used to
+identify clients. The storage keeps sliding-window counters in a fixed-size
+table in an mmap'd file, so all pre-forked workers on one host share the
+same counters without an external service and memory stays bounded.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from urllib.parse import parse_qs, urlparse
+
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_limiter.util import get_remote_address
+from flask_login import current_user
+from limits.storage import Storage
+
+# File header: magic, layout version, number of slots
+_HEADER = struct.Struct('<8sII')
+_MAGIC = b'FPRLIMIT'
+_VERSION = 1
+
+# Slot: key hash (0 = never used), window start, window length,
+# hits in the current window, hits in the previous window
+_SLOT = struct.Struct('<Qddqq')
+
+DEFAULT_SLOTS = 65536
+# Number of slots inspected when looking up or inserting a key
+MAX_PROBE = 32
+
+
+def default_table_path():
+    """Return the default location of the shared counter table."""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'frontpage-ratelimit.shm')
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class SharedWindowTable:
+    """Fixed-size table of sliding-window counters in a shared mmap'd file.
+
+    Lookups use open addressing with linear probing over at most MAX_PROBE
+    slots. Slots whose counters have fully expired are reused; when none is
+    available the stalest slot in the probe range is evicted, so memory never
+    grows with the number of distinct clients.
+
+    Writers serialize on an exclusive ``flock`` of the backing file (plus a
+    thread lock, since flock does not exclude threads of one process). A
+    forked child closes the inherited descriptor and mapping and reopens the
+    file on next use, so every worker holds its own lock.
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._size = _HEADER.size + slots * _SLOT.size
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        _open_tables.add(self)
+
+    def _ensure_open(self):
+        if self._map is not None:
+            return
+        with self._thread_lock:
+            if self._map is not None:
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < self._size:
+                        os.ftruncate(fd, self._size)
+                        os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, self.slots), 0)
+                    magic, version, slots = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+                    if magic != _MAGIC or version != _VERSION or slots != self.slots:
+                        raise ValueError(f"Incompatible rate limit table at {self.path}")
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                table_map = mmap.mmap(fd, self._size)
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+            self._map = table_map
+
+    def _after_fork(self):
+        # The child gets its own descriptor (and so its own flock) on next use;
+        # the inherited copies are closed, which leaves the parent's intact
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._map = None
+        self._thread_lock = threading.Lock()
+
+    def _locked(self):
+        self._ensure_open()
+        return _TableLock(self._thread_lock, self._fd)
+
+    def _offset(self, index):
+        return _HEADER.size + index * _SLOT.size
+
+    def _find(self, key_hash, now, create):
+        """Return the slot index for `key_hash`, or None if absent and not `create`."""
+        start = key_hash % self.slots
+        reusable = None
+        stalest = None
+        stalest_start = math.inf
+        for probe in range(MAX_PROBE):
+            index = (start + probe) % self.slots
+            slot_hash, window_start, window, _, _ = _SLOT.unpack_from(self._map, self._offset(index))
+            if slot_hash == key_hash:
+                return index
+            if slot_hash == 0:
+                # Never-used slot ends the probe chain
+                if reusable is None:
+                    reusable = index
+                break
+            if reusable is None and now >= window_start + 2 * window:
+                reusable = index
+            if window_start < stalest_start:
+                stalest, stalest_start = index, window_start
+
+        if not create:
+            return None
+        index = reusable if reusable is not None else stalest
+        _SLOT.pack_into(self._map, self._offset(index), key_hash, now, 0.0, 0, 0)
+        return index
+
+    def _read(self, index, now, expiry=None):
+        """Read a slot, rolling its window forward to `now`."""
+        key_hash, window_start, window, current, previous = _SLOT.unpack_from(
+            self._map, self._offset(index))
+        window = expiry or window
+        if window <= 0:
+            return key_hash, now, window, 0, 0
+        elapsed = now - window_start
+        if elapsed >= 2 * window:
+            window_start, current, previous = now, 0, 0
+        elif elapsed >= window:
+            window_start, current, previous = window_start + window, 0, current
+        return key_hash, window_start, window, current, previous
+
+    @staticmethod
+    def _weighted(now, window_start, window, current, previous):
+        """Sliding-window estimate: previous window weighted by its overlap."""
+        if window <= 0:
+            return current
+        overlap = max(0.0, 1.0 - (now - window_start) / window)
+        return current + int(previous * overlap)
+
+    def incr(self, key, expiry, amount=1):
+        """Add `amount` hits for `key` and return the sliding-window count."""
+        now = time.time()
+        key_hash = _key_hash(key)
+        with self._locked():
+            index = self._find(key_hash, now, create=True)
+            _, window_start, window, current, previous = self._read(index, now, expiry)
+            current += amount
+            _SLOT.pack_into(self._map, self._offset(index),
+                            key_hash, window_start, window, current, previous)
+        return self._weighted(now, window_start, window, current, previous)
+
+    def get(self, key):
+        """Return the sliding-window count for `key`."""
+        now = time.time()
+        with self._locked():
+            index = self._find(_key_hash(key), now, create=False)
+            if index is None:
+                return 0
+            _, window_start, window, current, previous = self._read(index, now)
+        return self._weighted(now, window_start, window, current, previous)
+
+    def get_expiry(self, key):
+        """Return the time at which the current window of `key` ends."""
+        now = time.time()
+        with self._locked():
+            index = self._find(_key_hash(key), now, create=False)
+            if index is None:
+                return now
+            _, window_start, window, _, _ = self._read(index, now)
+        return window_start + window
+
+    def clear(self, key):
+        """Reset the counters of `key`."""
+        now = time.time()
+        key_hash = _key_hash(key)
+        with self._locked():
+            index = self._find(key_hash, now, create=False)
+            if index is not None:
+                _SLOT.pack_into(self._map, self._offset(index), key_hash, now, 0.0, 0, 0)
+
+    def reset(self):
+        """Clear every counter and return the number of slots that were in use."""
+        with self._locked():
+            used = 0
+            for index in range(self.slots):
+                if _SLOT.unpack_from(self._map, self._offset(index))[0]:
+                    used += 1
+            self._map[_HEADER.size:self._size] = bytes(self._size - _HEADER.size)
+        return used
+
+
+class _TableLock:
+    """Context manager holding the thread lock and the file lock."""
+
+    def __init__(self, thread_lock, fd):
+        self._thread_lock = thread_lock
+        self._fd = fd
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+_open_tables = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for table in list(_open_tables):
+        table._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SharedMemoryStorage(Storage):
+    """Flask-Limiter storage backed by a SharedWindowTable.
+
+    Configure with ``RATELIMIT_STORAGE_URI = 'shm:///path/to/table'``; the
+    path defaults to ``default_table_path()`` and the table size can be set
+    with ``?slots=N``. Counters are sliding-window estimates, so the default
+    fixed-window strategy does not allow bursts at window boundaries.
+    """
+
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        parsed = urlparse(uri or 'shm://')
+        query = parse_qs(parsed.query)
+        path = parsed.path or default_table_path()
+        slots = int(query.get('slots', [DEFAULT_SLOTS])[0])
+        self.table = SharedWindowTable(path, slots)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        return self.table.incr(key, expiry, amount)
+
+    def get(self, key):
+        return self.table.get(key)
+
+    def get_expiry(self, key):
+        return self.table.get_expiry(key)
+
+    def check(self):
+        try:
+            self.table.get('__healthcheck__')
+            return True
+        except OSError:
+            return False
+
+    def reset(self):
+        return self.table.reset()
+
+    def clear(self, key):
+        self.table.clear(key)
+
+
+def rate_limit_key():
+    """Identify the client for rate limiting.
+
+    Authenticated requests are limited per user, so users behind a shared IP
+    do not exhaust each other's limits; anonymous requests per remote address.
+    """
+    user_id = authenticated_user_id()
+    if user_id is not None:
+        return f'user:{user_id}'
+    return get_remote_address()
+
+
+def authenticated_user_id():
+    """Return the id of the logged-in or JWT-authenticated user, if any."""
+    if getattr(current_app, 'login_manager', None) is not None:
+        if current_user.is_authenticated:
+            return current_user.get_id()
+
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        # Invalid or expired tokens are rejected by the endpoint itself
+        return None
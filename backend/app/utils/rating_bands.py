@@ -0,0 +1,61 @@
+"""
+Rating Bands
+Precomputed Codeforces-style rating bands and performance grades.
+Lookups use a bisect over sorted thresholds instead of if/elif chains,
+so they cost the same regardless of which band a value falls in.
+"""
+from bisect import bisect_right
+
+# Lower bound of every band after the first; band i covers
+# [RATING_THRESHOLDS[i - 1], RATING_THRESHOLDS[i])
+RATING_THRESHOLDS = (1200, 1400, 1600, 1900, 2100, 2300, 2400, 2600, 3000)
+
+RATING_TITLES = (
+    "Newbie",
+    "Pupil",
+    "Specialist",
+    "Expert",
+    "Candidate Master",
+    "Master",
+    "International Master",
+    "Grandmaster",
+    "International Grandmaster",
+    "Legendary Grandmaster",
+)
+
+RATING_COLORS = (
+    "#808080",  # Gray
+    "#008000",  # Green
+    "#03A89E",  # Cyan
+    "#0000FF",  # Blue
+    "#AA00AA",  # Purple
+    "#FF8C00",  # Orange
+    "#FF8C00",  # Orange
+    "#FF0000",  # Red
+    "#FF0000",  # Red
+    "#AA0000",  # Dark Red
+)
+
+# Profit percentage thresholds (inclusive lower bounds) and their grades
+GRADE_THRESHOLDS = (-20, -15, -10, -5, 0, 5, 10, 15, 20)
+GRADES = ("F", "C-", "C", "C+", "B-", "B", "B+", "A-", "A", "A+")
+
+
+def rating_band(rating):
+    """Return the index of the band containing `rating`."""
+    return bisect_right(RATING_THRESHOLDS, rating)
+
+
+def rating_title(rating):
+    """Get Codeforces-style rating title for a rating value."""
+    return RATING_TITLES[bisect_right(RATING_THRESHOLDS, rating)]
+
+
+def rating_color(rating):
+    """Get Codeforces-style color code for a rating value."""
+    return RATING_COLORS[bisect_right(RATING_THRESHOLDS, rating)]
+
+
+def performance_grade(profit_percentage):
+    """Get a performance grade for a profit percentage."""
+    return GRADES[bisect_right(GRADE_THRESHOLDS, profit_percentage)]
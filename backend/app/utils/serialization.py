@@ -0,0 +1,322 @@
+"""
+Fast Serialization
+Serialization path for list endpoints returning thousands of rows.
+Rows are serialized straight from query tuples (no ORM objects are hydrated),
+encoded with orjson when it is installed, and streamed to the client in
+chunks instead of being built into one large response body. Sparse
+fieldsets (``?fields=``) select and serialize only the requested fields.
+"""
+import json
+from bisect import bisect_right
+from operator import itemgetter
+
+from flask import Response, stream_with_context
+
+from app.models.rating import Rating
+from app.models.trade import Trade, TradeType
+from app.models.user import User
+from app.utils.rating_bands import (
+    GRADE_THRESHOLDS, GRADES, RATING_COLORS, RATING_THRESHOLDS, RATING_TITLES
+)
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+# Number of rows encoded per streamed chunk
+STREAM_CHUNK_SIZE = 1000
+
+# Column order of the tuples accepted by the row serializers below
+TRADE_COLUMNS = (
+    'id', 'user_id', 'symbol', 'company_name', 'trade_type', 'quantity',
+    'price_per_share', 'total_amount', 'market_price', 'current_price',
+    'status', 'unrealized_pnl', 'realized_pnl', 'is_active', 'created_at',
+    'executed_at', 'updated_at', 'notes',
+)
+
+RATING_COLUMNS = (
+    'id', 'user_id', 'old_rating', 'new_rating', 'rating_change',
+    'profit_percentage', 'trades_count', 'win_rate', 'contest_name',
+    'contest_duration', 'rank', 'total_participants', 'is_provisional',
+    'created_at', 'notes',
+)
+
+USER_COLUMNS = (
+    'id', 'name', 'phone', 'email', 'initial_balance', 'current_balance',
+    'total_profit_loss', 'rating', 'max_rating', 'contests_participated',
+    'created_at', 'last_login', 'is_active', 'is_verified',
+)
+
+
+# Output fields of `serialize_trade_row` and the columns each is computed from
+TRADE_FIELD_COLUMNS = {
+    'id': ('id',),
+    'user_id': ('user_id',),
+    'symbol': ('symbol',),
+    'company_name': ('company_name',),
+    'trade_type': ('trade_type',),
+    'quantity': ('quantity',),
+    'price_per_share': ('price_per_share',),
+    'total_amount': ('total_amount',),
+    'market_price': ('market_price',),
+    'current_price': ('current_price',),
+    'status': ('status',),
+    'unrealized_pnl': ('unrealized_pnl',),
+    'realized_pnl': ('realized_pnl',),
+    'profit_percentage': ('total_amount', 'unrealized_pnl', 'realized_pnl', 'is_active'),
+    'trade_value': ('trade_type', 'is_active', 'quantity', 'current_price', 'total_amount'),
+    'is_active': ('is_active',),
+    'created_at': ('created_at',),
+    'executed_at': ('executed_at',),
+    'updated_at': ('updated_at',),
+    'notes': ('notes',),
+}
+TRADE_FIELDS = tuple(TRADE_FIELD_COLUMNS)
+
+
+def dumps(obj):
+    """Encode an object as JSON bytes using the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def trade_columns():
+    """Return the Trade columns to select for `serialize_trade_row`."""
+    return [getattr(Trade, name) for name in TRADE_COLUMNS]
+
+
+def rating_columns():
+    """Return the Rating columns to select for `serialize_rating_row`."""
+    return [getattr(Rating, name) for name in RATING_COLUMNS]
+
+
+def user_columns():
+    """Return the User columns to select for `serialize_user_row`."""
+    return [getattr(User, name) for name in USER_COLUMNS]
+
+
+def serialize_trade_row(row):
+    """Serialize a TRADE_COLUMNS tuple; output matches `Trade.to_dict`."""
+    (id_, user_id, symbol, company_name, trade_type, quantity,
+     price_per_share, total_amount, market_price, current_price, status,
+     unrealized_pnl, realized_pnl, is_active, created_at, executed_at,
+     updated_at, notes) = row
+
+    if total_amount:
+        profit = unrealized_pnl if is_active else realized_pnl
+        profit_percentage = (profit / total_amount) * 100
+    else:
+        profit_percentage = 0.0
+
+    if trade_type is TradeType.BUY and is_active:
+        trade_value = quantity * current_price
+    else:
+        trade_value = total_amount
+
+    return {
+        'id': id_,
+        'user_id': user_id,
+        'symbol': symbol,
+        'company_name': company_name,
+        'trade_type': trade_type.value if trade_type else None,
+        'quantity': quantity,
+        'price_per_share': price_per_share,
+        'total_amount': total_amount,
+        'market_price': market_price,
+        'current_price': current_price,
+        'status': status.value if status else None,
+        'unrealized_pnl': unrealized_pnl,
+        'realized_pnl': realized_pnl,
+        'profit_percentage': profit_percentage,
+        'trade_value': trade_value,
+        'is_active': is_active,
+        'created_at': created_at.isoformat() if created_at else None,
+        'executed_at': executed_at.isoformat() if executed_at else None,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'notes': notes
+    }
+
+
+def parse_fields(value, allowed):
+    """Parse a comma-separated ``fields=`` parameter.
+
+    Returns:
+        tuple: Requested field names in request order, or None for all fields
+
+    Raises:
+        ValueError: If a field is not in `allowed`
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. "
+                         f"Available: {', '.join(allowed)}")
+    return fields or None
+
+
+def _enum_value(index):
+    def get(row):
+        value = row[index]
+        return value.value if value else None
+    return get
+
+
+def _isoformat(index):
+    def get(row):
+        value = row[index]
+        return value.isoformat() if value else None
+    return get
+
+
+def _trade_field_getter(field, index):
+    """Return a function computing `field` from a row of selected columns."""
+    if field == 'profit_percentage':
+        total_amount, unrealized_pnl, realized_pnl, is_active = (
+            index[name] for name in TRADE_FIELD_COLUMNS[field])
+
+        def get(row):
+            if not row[total_amount]:
+                return 0.0
+            profit = row[unrealized_pnl] if row[is_active] else row[realized_pnl]
+            return (profit / row[total_amount]) * 100
+        return get
+    if field == 'trade_value':
+        trade_type, is_active, quantity, current_price, total_amount = (
+            index[name] for name in TRADE_FIELD_COLUMNS[field])
+
+        def get(row):
+            if row[trade_type] is TradeType.BUY and row[is_active]:
+                return row[quantity] * row[current_price]
+            return row[total_amount]
+        return get
+    if field in ('trade_type', 'status'):
+        return _enum_value(index[field])
+    if field in ('created_at', 'executed_at', 'updated_at'):
+        return _isoformat(index[field])
+    return itemgetter(index[field])
+
+
+def trade_fieldset(fields=None):
+    """Return the columns to select and the row serializer for a sparse fieldset.
+
+    Only the columns the requested fields depend on are selected, and derived
+    fields are only computed when requested. ``None`` selects every field
+    (`trade_columns` and `serialize_trade_row`).
+    """
+    if fields is None:
+        return trade_columns(), serialize_trade_row
+    names = tuple(dict.fromkeys(name for field in fields for name in TRADE_FIELD_COLUMNS[field]))
+    index = {name: position for position, name in enumerate(names)}
+    getters = [(field, _trade_field_getter(field, index)) for field in fields]
+
+    def serialize(row):
+        return {field: get(row) for field, get in getters}
+
+    return [getattr(Trade, name) for name in names], serialize
+
+
+def serialize_rating_row(row):
+    """Serialize a RATING_COLUMNS tuple; output matches `Rating.to_dict`."""
+    (id_, user_id, old_rating, new_rating, rating_change, profit_percentage,
+     trades_count, win_rate, contest_name, contest_duration, rank,
+     total_participants, is_provisional, created_at, notes) = row
+
+    old_band = bisect_right(RATING_THRESHOLDS, old_rating)
+    new_band = bisect_right(RATING_THRESHOLDS, new_rating)
+
+    return {
+        'id': id_,
+        'user_id': user_id,
+        'old_rating': old_rating,
+        'new_rating': new_rating,
+        'rating_change': rating_change,
+        'old_rating_title': RATING_TITLES[old_band],
+        'new_rating_title': RATING_TITLES[new_band],
+        'old_rating_color': RATING_COLORS[old_band],
+        'new_rating_color': RATING_COLORS[new_band],
+        'profit_percentage': profit_percentage,
+        'performance_grade': GRADES[bisect_right(GRADE_THRESHOLDS, profit_percentage)],
+        'trades_count': trades_count,
+        'win_rate': win_rate,
+        'contest_name': contest_name,
+        'contest_duration': contest_duration,
+        'rank': rank,
+        'total_participants': total_participants,
+        'is_rating_increase': rating_change > 0,
+        'is_provisional': is_provisional,
+        'created_at': created_at.isoformat() if created_at else None,
+        'notes': notes
+    }
+
+
+def serialize_user_row(row):
+    """Serialize a USER_COLUMNS tuple; output matches `User.to_dict`."""
+    (id_, name, phone, email, initial_balance, current_balance,
+     total_profit_loss, rating, max_rating, contests_participated,
+     created_at, last_login, is_active, is_verified) = row
+
+    if initial_balance:
+        profit_percentage = ((current_balance - initial_balance) / initial_balance) * 100
+    else:
+        profit_percentage = 0.0
+
+    return {
+        'id': id_,
+        'name': name,
+        'phone': phone,
+        'email': email,
+        'current_balance': current_balance,
+        'total_profit_loss': total_profit_loss,
+        'profit_percentage': profit_percentage,
+        'rating': rating,
+        'max_rating': max_rating,
+        'rating_title': RATING_TITLES[bisect_right(RATING_THRESHOLDS, rating)],
+        'contests_participated': contests_participated,
+        'created_at': created_at.isoformat() if created_at else None,
+        'last_login': last_login.isoformat() if last_login else None,
+        'is_active': is_active,
+        'is_verified': is_verified
+    }
+
+
+def iter_json_object(payload, key, rows, serializer, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a JSON object as byte chunks, streaming `rows` under `key`.
+
+    Args:
+        payload: Dictionary of fields emitted before the streamed list
+        key: Name of the list field holding the serialized rows
+        rows: Iterable of row tuples, typically a streamed query result
+        serializer: Function converting one row tuple to a dictionary
+        chunk_size: Number of rows encoded per yielded chunk
+    """
+    head = dumps(payload)[:-1]
+    yield head + (b',' if len(head) > 1 else b'') + dumps(key) + b':['
+
+    separator = b''
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(serializer(row)))
+        if len(chunk) >= chunk_size:
+            yield separator + b','.join(chunk)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + b','.join(chunk)
+
+    yield b']}'
+
+
+def json_response(payload, status=200):
+    """Build a JSON response encoded with the fast encoder."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def stream_json_response(payload, key, rows, serializer, status=200):
+    """Build a streamed JSON response for a large list of rows."""
+    body = iter_json_object(payload, key, rows, serializer)
+    return Response(stream_with_context(body), status=status,
+                    mimetype='application/json')
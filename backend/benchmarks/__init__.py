@@ -0,0 +1,5 @@
+"""
+Benchmarks Package
+Offline benchmark scripts for the trading simulation backend.
+Run them from the backend directory, e.g. ``python -m benchmarks.bench_serialization``.
+"""
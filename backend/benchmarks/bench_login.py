@@ -0,0 +1,118 @@
+"""
+Login Benchmark
+Measures the login hot path against a file-backed SQLite database:
+
+- logins per second for each password hash method (``--methods``), with the
+  hashes created under an older method so the first login of every user
+  also pays for the rehash
+- authenticated requests per second and queries per request with the user
+  cache enabled and disabled
+- how many last_login writes the write-behind queue needed
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app, db
+from app.models.user import User
+from app.services.login_activity import login_activity
+from app.services.user_cache import user_cache
+from config import TestingConfig
+
+OLD_METHOD = 'pbkdf2:sha256:1000'
+
+
+def make_app(path, **settings):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        ENFORCE_QUERY_BUDGETS = False
+        RATELIMIT_ENABLED = False
+        LAST_LOGIN_FLUSH_INTERVAL = 3600  # Flushed explicitly below
+    for key, value in settings.items():
+        setattr(BenchConfig, key, value)
+    return create_app(BenchConfig)
+
+
+def seed_users(app, count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        app.config['PASSWORD_HASH_METHOD'] = OLD_METHOD
+        db.session.add_all(
+            User(name=f'Trader {i}', phone=f'9{i:09d}', email=f'trader{i}@example.com',
+                 password='password123')
+            for i in range(count)
+        )
+        db.session.commit()
+
+
+def bench_logins(path, method, users, rounds):
+    """Return (first-round logins/s incl. rehash, steady logins/s, queries per login)."""
+    app = make_app(path, PASSWORD_HASH_METHOD=method)
+    seed_users(app, users)
+    app.config['PASSWORD_HASH_METHOD'] = method
+    client = app.test_client()
+
+    rates = []
+    queries = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(users):
+            response = client.post('/api/auth/login', json={
+                'email': f'trader{i}@example.com', 'password': 'password123'})
+            assert response.status_code == 200, response.get_json()
+            queries += int(response.headers.get('X-Query-Count', 0))
+        rates.append(users / (time.perf_counter() - start))
+
+    with app.app_context():
+        written = login_activity.flush()
+    return rates[0], max(rates[1:] or rates), queries / (users * rounds), written
+
+
+def bench_requests(path, cache_size, users, requests):
+    """Return (authenticated requests/s, queries per request)."""
+    app = make_app(path, USER_CACHE_SIZE=cache_size)
+    seed_users(app, users)
+    clients = []
+    for i in range(users):
+        client = app.test_client()
+        client.post('/api/auth/login', json={
+            'email': f'trader{i}@example.com', 'password': 'password123'})
+        clients.append(client)
+    user_cache.stats.update(hits=0, misses=0)
+
+    queries = 0
+    start = time.perf_counter()
+    for n in range(requests):
+        response = clients[n % users].get('/api/auth/profile')
+        assert response.status_code == 200
+        queries += int(response.headers.get('X-Query-Count', 0))
+    return requests / (time.perf_counter() - start), queries / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=3, help='Logins per user')
+    parser.add_argument('--requests', type=int, default=5000, help='Authenticated requests')
+    parser.add_argument('--methods', nargs='+',
+                        default=['pbkdf2:sha256:600000', 'pbkdf2:sha256:260000', 'scrypt:32768:8:1'])
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+
+    for method in args.methods:
+        first, steady, queries, written = bench_logins(path, method, args.users, args.rounds)
+        print(f"{method:22s}: {first:7.1f} logins/s with rehash, {steady:7.1f} logins/s steady, "
+              f"{queries:.1f} queries/login, {written} last_login rows in 1 flush "
+              f"for {args.users * args.rounds} logins")
+
+    for label, cache_size in (('cache off', 0), ('cache on', 10000)):
+        rate, queries = bench_requests(path, cache_size, args.users, args.requests)
+        print(f"{label:9s}: {rate:8.1f} authenticated requests/s, {queries:.2f} queries/request "
+              f"(hits {user_cache.stats['hits']}, misses {user_cache.stats['misses']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Model Micro-benchmarks
+Times the models' hot methods on transient objects (no database I/O):
+`Portfolio.update_position`, `Trade.update_current_price` and the
+`to_dict` serializers of Trade, User and Rating. Results are printed as
+nanoseconds per call and can be written as JSON (``--output``) to compare
+releases.
+"""
+import argparse
+import json
+import platform
+import timeit
+from datetime import datetime
+
+from app import create_app, db
+from app.models.portfolio import Portfolio
+from app.models.rating import Rating
+from app.models.trade import Trade, TradeType
+from app.models.user import User
+from config import TestingConfig
+
+
+def make_objects():
+    user = User(name='Bench', phone='9000000000', email='bench@example.com', password='bench')
+    user.id = 1
+    user.initial_balance = user.current_balance = 100000.0
+    user.total_profit_loss = 0.0
+    user.rating = user.max_rating = 1543
+    user.contests_participated = 12
+    user.created_at = datetime(2024, 1, 1)
+    user.is_active = True
+    user.is_verified = False
+
+    trade = Trade(user_id=1, symbol='RELIANCE', trade_type=TradeType.BUY, quantity=25,
+                  price_per_share=2456.75, company_name='Reliance Industries')
+    trade.id = 1
+    trade.execute_trade()
+    trade.is_active = True
+    trade.unrealized_pnl = trade.realized_pnl = 0.0
+    trade.created_at = datetime(2024, 1, 1, 9, 15)
+
+    rating = Rating(user_id=1, old_rating=1500, new_rating=1543, profit_percentage=4.2,
+                    trades_count=18, win_rate=61.0, contest_name='Weekly #12', rank=7,
+                    total_participants=240)
+    rating.id = 1
+    rating.created_at = datetime(2024, 1, 1)
+    rating.is_provisional = False
+
+    position = Portfolio(user_id=1, symbol='RELIANCE', quantity=0, avg_price=0.0)
+    return user, trade, rating, position
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=20000, help='Calls per sample')
+    parser.add_argument('--repeat', type=int, default=5, help='Samples; the best is reported')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    results = {}
+    with app.app_context():
+        user, trade, rating, position = make_objects()
+        prices = [2400.0 + i for i in range(100)]
+
+        def update_position():
+            position.update_position(1, 2456.75)
+            # Drop the ledger entry staged for the commit that never comes
+            db.session.info['ledger_pending'].clear()
+
+        def update_current_price():
+            trade.update_current_price(prices[trade.quantity % 100])
+
+        cases = {
+            'Portfolio.update_position': update_position,
+            'Trade.update_current_price': update_current_price,
+            'Trade.to_dict': trade.to_dict,
+            'User.to_dict': user.to_dict,
+            'Rating.to_dict': rating.to_dict,
+        }
+        for name, func in cases.items():
+            best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+            results[name] = {'ns_per_call': best / args.number * 1e9,
+                             'calls_per_s': args.number / best}
+            print(f"{name:28s} {results[name]['ns_per_call']:9.0f} ns/call "
+                  f"({results[name]['calls_per_s']:,.0f}/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(),
+                       'python': platform.python_version(),
+                       'number': args.number, 'repeat': args.repeat,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
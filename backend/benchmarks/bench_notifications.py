@@ -0,0 +1,72 @@
+"""
+Notification Pipeline Benchmark
+Fires trade and rating events from several "request" threads against a local
+SMTP sink. Reports how long request threads spend enqueueing (they must never
+wait on SMTP), delivery throughput, digests sent and SMTP connections used.
+"""
+import argparse
+import threading
+import time
+from types import SimpleNamespace
+
+from app import create_app
+from app.models.trade import TradeType
+from app.services.notification_service import notifications
+from app.utils.smtp_sink import LocalSMTPServer
+from config import TestingConfig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--events', type=int, default=2000, help='Events per thread')
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    with LocalSMTPServer() as smtp:
+        class BenchConfig(TestingConfig):
+            NOTIFICATIONS_ENABLED = True
+            NOTIFICATION_QUEUE_SIZE = args.threads * args.events
+            NOTIFICATION_BATCH_WINDOW = 0.05
+            NOTIFICATION_BATCH_SIZE = 500
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = smtp.port
+            MAIL_SUPPRESS_SEND = False
+
+        create_app(BenchConfig)
+        users = [SimpleNamespace(id=i, name=f'Trader {i}', email=f'trader{i}@example.com')
+                 for i in range(args.users)]
+        trade = SimpleNamespace(trade_type=TradeType.BUY, quantity=10, symbol='TCS',
+                                price_per_share=3680.5, total_amount=36805.0)
+        enqueue_times = []
+
+        def request_thread(offset):
+            worst = 0.0
+            for i in range(args.events):
+                start = time.perf_counter()
+                notifications.notify_trade(users[(offset + i) % args.users], trade)
+                worst = max(worst, time.perf_counter() - start)
+            enqueue_times.append(worst)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=request_thread, args=(i,)) for i in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        enqueued = time.perf_counter() - start
+        notifications.flush()
+        delivered = time.perf_counter() - start
+        notifications.shutdown()
+
+        stats = notifications.stats
+        print(f"events: {stats['queued']} queued, {stats['dropped']} dropped, {stats['failed']} failed")
+        print(f"request threads: all events enqueued in {enqueued * 1000:.1f} ms, "
+              f"worst single enqueue {max(enqueue_times) * 1e6:.0f} us")
+        print(f"delivery: {stats['sent']} digests in {stats['batches']} batches over "
+              f"{smtp.connections} SMTP connections, {delivered:.2f} s total")
+        assert len(smtp.messages) == stats['sent']
+
+
+if __name__ == '__main__':
+    main()
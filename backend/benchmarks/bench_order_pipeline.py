@@ -0,0 +1,125 @@
+"""
+Order Pipeline Benchmark
+Measures matching throughput of the `OrderPipeline` with 1, 2, 4 and 8
+partition server processes (``--workers``), against matching in the calling
+thread (pipeline disabled). Every run starts servers with empty books. A stream of market and limit orders over ``--symbols``
+symbols, with prices on a random walk so resting orders keep crossing, is
+sent in batches with up to ``--in-flight`` batches outstanding, the way
+many request threads would feed the pipeline. Throughput can only scale up
+to the number of CPUs, which is recorded with the results.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+
+from app import create_app, db
+from app.services.order_pipeline import FILLED, Order, OrderPipeline
+from config import TestingConfig
+
+
+class PipelineConfig(TestingConfig):
+    SQL_PROFILING = False
+    ORDER_PIPELINE_TIMEOUT = 30.0
+    ORDER_PIPELINE_DIR = tempfile.mkdtemp(prefix='bench-orders-')  # Never a live server's
+
+
+def make_orders(count, symbols, users, seed=5):
+    """Return ``(order, market_price)`` items; half are limit orders, about a quarter rest."""
+    rng = random.Random(seed)
+    names = [f'SYM{i:04d}' for i in range(symbols)]
+    prices = {name: rng.uniform(100, 3000) for name in names}
+    items = []
+    for order_id in range(1, count + 1):
+        symbol = rng.choice(names)
+        price = prices[symbol] = prices[symbol] * rng.uniform(0.995, 1.005)
+        side = rng.choice(('BUY', 'SELL'))
+        limit_price = None
+        if rng.random() < 0.5:
+            # Limit orders up to 1% either side of the market
+            limit_price = round(price * rng.uniform(0.99, 1.01), 2)
+        items.append((Order(order_id, rng.randint(1, users), symbol, side,
+                            rng.randint(1, 100), limit_price), price))
+    return items
+
+
+def run(pipeline, items, batch_size, in_flight):
+    """Feed all items through the pipeline; return (seconds, fills, resting)."""
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    pending = deque()
+    fills = resting = 0
+    start = time.perf_counter()
+    for batch in batches:
+        if len(pending) >= in_flight:
+            results = pending.popleft().result(timeout=pipeline.timeout)
+            fills += sum(len(result.fills) for result in results)
+            resting += sum(result.status != FILLED for result in results)
+        pending.append(pipeline.submit_many(batch))
+    while pending:
+        results = pending.popleft().result(timeout=pipeline.timeout)
+        fills += sum(len(result.fills) for result in results)
+        resting += sum(result.status != FILLED for result in results)
+    return time.perf_counter() - start, fills, resting
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch', type=int, default=500, help='Orders per submit_many call')
+    parser.add_argument('--in-flight', type=int, default=8, help='Batches outstanding at once')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    items = make_orders(args.orders, args.symbols, args.users)
+    results = []
+    print(f"{args.orders:,} orders over {args.symbols} symbols, {os.cpu_count()} CPUs")
+    for workers in [0] + args.workers:
+        config = type('Config', (PipelineConfig,), {
+            'ORDER_PIPELINE_ENABLED': workers > 0,
+            'ORDER_PIPELINE_WORKERS': workers,
+        })
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            pipeline = OrderPipeline(app)
+            timings = []
+            for _ in range(args.repeat):
+                pipeline.stats()  # Starts the servers outside the timing
+                seconds, fills, resting = run(pipeline, items, args.batch, args.in_flight)
+                timings.append(seconds)
+                pipeline.shutdown()
+        results.append({'workers': workers, 'fills': fills, 'resting': resting,
+                        'orders_per_second': args.orders / statistics.median(timings)})
+
+    # Scaling is relative to one worker; inline matching shows the cost of the hand-off
+    baseline = next((r['orders_per_second'] for r in results if r['workers'] == 1),
+                    results[0]['orders_per_second'])
+    print(f"  {'workers':>8s} {'orders/s':>12s} {'speedup':>8s} {'fills':>9s} {'resting':>9s}")
+    for result in results:
+        result['speedup'] = result['orders_per_second'] / baseline
+        label = str(result['workers']) if result['workers'] else 'inline'
+        print(f"  {label:>8s} {result['orders_per_second']:12,.0f} {result['speedup']:7.2f}x "
+              f"{result['fills']:9,d} {result['resting']:9,d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(),
+                       'python': platform.python_version(),
+                       'cpus': os.cpu_count(),
+                       'settings': {'orders': args.orders, 'symbols': args.symbols,
+                                    'batch': args.batch, 'in_flight': args.in_flight},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
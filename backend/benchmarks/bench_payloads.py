@@ -0,0 +1,154 @@
+"""
+Payload Benchmark
+Measures bytes on the wire and server latency of the trade history and
+leaderboard endpoints for every combination of content coding (identity,
+gzip and brotli when installed) and fieldset (all fields, a sparse
+``fields=`` selection, and ranks only for the leaderboard), plus the transfer time those bytes take on a link
+of ``--bandwidth`` Mbit/s. Requests go through the Flask test client against
+an in-memory SQLite database, so latency is server time only.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from flask import url_for
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models.analytics import PerformanceMetrics
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.models.user import User
+from app.utils.compression import available_encodings
+from config import TestingConfig
+
+SYMBOLS = ['RELIANCE', 'TCS', 'INFY', 'HDFCBANK', 'ICICIBANK', 'SBIN', 'ITC', 'LT']
+
+# Fields a history table or a leaderboard widget typically shows
+HISTORY_FIELDS = 'id,symbol,trade_type,quantity,price_per_share,status,profit_percentage,created_at'
+LEADERBOARD_FIELDS = 'rank,user_id,name,rating,sharpe_ratio,total_return'
+
+PASSWORD = 'benchmark-password'
+RANK_FIELDS = 'rank'
+
+
+class PayloadConfig(TestingConfig):
+    SQL_PROFILING = False
+    ENFORCE_QUERY_BUDGETS = False
+    RATELIMIT_ENABLED = False
+
+
+def seed(users, trades):
+    """Insert `users` users with metrics, and `trades` trades for user 1 (``trader0``)."""
+    rng = random.Random(3)
+    password_hash = generate_password_hash(PASSWORD)
+    db.session.execute(insert(User), [
+        {'name': f'Trader {i}', 'phone': f'9{i:09d}', 'email': f'trader{i}@example.com',
+         'password_hash': password_hash, 'initial_balance': 100000.0, 'current_balance': 100000.0,
+         'total_profit_loss': 0.0, 'rating': rng.randint(800, 2400), 'max_rating': 2400,
+         'contests_participated': 0, 'is_active': True, 'is_verified': False,
+         'created_at': datetime.utcnow()}
+        for i in range(users)
+    ])
+    db.session.execute(insert(PerformanceMetrics), [
+        {'user_id': user_id, 'as_of': date.today(), 'days': 250,
+         'total_return': rng.uniform(-0.5, 1.5), 'avg_daily_return': rng.uniform(-0.01, 0.01),
+         'volatility': rng.uniform(0.1, 0.6), 'sharpe_ratio': rng.uniform(-2, 3),
+         'max_drawdown': rng.uniform(0, 0.6), 'best_day': rng.uniform(0, 0.1),
+         'worst_day': rng.uniform(-0.1, 0), 'current_win_streak': rng.randint(0, 5),
+         'longest_win_streak': rng.randint(0, 20), 'updated_at': datetime.utcnow()}
+        for user_id in range(1, users + 1)
+    ])
+    start = datetime.utcnow() - timedelta(days=60)
+    rows = []
+    for i in range(trades):
+        price = rng.uniform(100, 4000)
+        quantity = rng.randint(1, 50)
+        when = start + timedelta(minutes=i)
+        rows.append({
+            'user_id': 1, 'symbol': rng.choice(SYMBOLS), 'company_name': 'Company Ltd',
+            'trade_type': rng.choice([TradeType.BUY, TradeType.SELL]), 'quantity': quantity,
+            'price_per_share': price, 'total_amount': price * quantity, 'market_price': price,
+            'current_price': price * rng.uniform(0.9, 1.1), 'status': TradeStatus.EXECUTED,
+            'unrealized_pnl': rng.uniform(-500, 500), 'realized_pnl': 0.0, 'is_active': True,
+            'created_at': when, 'executed_at': when, 'updated_at': when,
+        })
+    db.session.execute(insert(Trade), rows)
+    db.session.commit()
+
+
+def measure(client, path, query, encoding, repeat):
+    """Return (wire bytes, median latency in ms) of one request shape."""
+    headers = {'Accept-Encoding': encoding} if encoding != 'identity' else {}
+    latencies = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, query_string=query, headers=headers)
+        size = len(response.get_data())  # Drains streamed bodies inside the timing
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+        assert response.headers.get('Content-Encoding', 'identity') == encoding
+    return size, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trades', type=int, default=1000, help='History page size')
+    parser.add_argument('--users', type=int, default=500, help='Leaderboard page size')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--bandwidth', type=float, default=10.0, help='Link speed in Mbit/s')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = create_app(PayloadConfig)
+    with app.app_context():
+        db.create_all()
+        seed(args.users, args.trades)
+        with app.test_request_context():
+            login_path = url_for('auth.login')
+            endpoints = {
+                'history': (url_for('trading.get_trade_history'),
+                            {'limit': args.trades}, {'sparse': HISTORY_FIELDS}),
+                'leaderboard': (url_for('user.leaderboard'), {'limit': min(args.users, 500)},
+                                {'sparse': LEADERBOARD_FIELDS, 'rank': RANK_FIELDS}),
+            }
+
+        client = app.test_client()
+        # Trade history is the logged-in user's
+        response = client.post(login_path,
+                               json={'email': 'trader0@example.com', 'password': PASSWORD})
+        assert response.status_code == 200, response.status_code
+        results = []
+        for name, (path, query, fieldsets) in endpoints.items():
+            baseline = None
+            print(f"\n{name} ({path})")
+            print(f"  {'fieldset':8s} {'encoding':8s} {'bytes':>10s} {'ratio':>7s} "
+                  f"{'server ms':>10s} {'transfer ms':>12s}")
+            shapes = [('full', query)] + [(fieldset, dict(query, fields=fields))
+                                          for fieldset, fields in fieldsets.items()]
+            for fieldset, params in shapes:
+                for encoding in ('identity',) + available_encodings():
+                    size, latency = measure(client, path, params, encoding, args.repeat)
+                    baseline = baseline or size
+                    transfer = size * 8 / (args.bandwidth * 1e6) * 1000
+                    results.append({'endpoint': name, 'fieldset': fieldset, 'encoding': encoding,
+                                    'bytes': size, 'server_ms': latency, 'transfer_ms': transfer})
+                    print(f"  {fieldset:8s} {encoding:8s} {size:10,d} {baseline / size:6.1f}x "
+                          f"{latency:10.2f} {transfer:12.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(),
+                       'python': platform.python_version(),
+                       'settings': {'trades': args.trades, 'users': args.users,
+                                    'bandwidth_mbps': args.bandwidth},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
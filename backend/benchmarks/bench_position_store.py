@@ -0,0 +1,123 @@
+"""
+Position Store Benchmark
+Compares the memory held per position by `PositionStore` against the same
+positions as `Portfolio` ORM instances (as loaded into a session), and times
+the store's hot operations. Memory is measured with tracemalloc, so the
+numbers include every object an instance keeps alive.
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import random
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy.orm import attributes
+
+from app import create_app
+from app.models.portfolio import Portfolio
+from app.services.position_store import PositionStore
+from config import TestingConfig
+
+SYMBOLS = ['RELIANCE', 'TCS', 'INFY', 'HDFCBANK', 'ICICIBANK', 'SBIN', 'ITC', 'LT',
+           'KOTAKBANK', 'AXISBANK', 'BHARTIARTL', 'HINDUNILVR', 'MARUTI', 'WIPRO', 'TITAN']
+
+
+def make_rows(users, per_user, seed=7):
+    rng = random.Random(seed)
+    return [
+        (user_id, symbol, rng.randint(1, 500), round(rng.uniform(100, 4000), 2))
+        for user_id in range(1, users + 1)
+        for symbol in rng.sample(SYMBOLS, per_user)
+    ]
+
+
+def measure(build):
+    """Return (object, bytes allocated by `build`) with the object kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def build_orm(rows):
+    now = datetime.utcnow()
+    positions = []
+    for position_id, (user_id, symbol, quantity, avg_price) in enumerate(rows, 1):
+        position = Portfolio(user_id=user_id, symbol=symbol, quantity=quantity, avg_price=avg_price)
+        # Loaded rows also carry their key and timestamps
+        attributes.set_committed_value(position, 'id', position_id)
+        attributes.set_committed_value(position, 'created_at', now)
+        attributes.set_committed_value(position, 'updated_at', now)
+        positions.append(position)
+    return positions
+
+
+def build_store(rows):
+    store = PositionStore()
+    store.load(rows)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--positions', type=int, default=5, help='Positions per user')
+    parser.add_argument('--number', type=int, default=100000, help='Calls per timing sample')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    rows = make_rows(args.users, min(args.positions, len(SYMBOLS)))
+    with app.app_context():
+        orm, orm_bytes = measure(lambda: build_orm(rows))
+        del orm
+        store, store_bytes = measure(lambda: build_store(rows))
+
+    count = len(rows)
+    results = {
+        'positions': count,
+        'orm_bytes_per_position': orm_bytes / count,
+        'store_bytes_per_position': store_bytes / count,
+        'store_report': store.memory_report(),
+    }
+    print(f"{count:,} positions of {args.users:,} users")
+    print(f"  Portfolio ORM   {orm_bytes / count:8.0f} B/position  {orm_bytes / 2 ** 20:8.1f} MiB")
+    print(f"  PositionStore   {store_bytes / count:8.0f} B/position  {store_bytes / 2 ** 20:8.1f} MiB "
+          f"({orm_bytes / store_bytes:.0f}x smaller)")
+    print(f"  at 100k users   {orm_bytes / args.users * 1e5 / 2 ** 20:8.0f} MiB vs "
+          f"{store_bytes / args.users * 1e5 / 2 ** 20:.0f} MiB")
+
+    rng = random.Random(1)
+    probes = [(rng.randint(1, args.users), rng.choice(SYMBOLS)) for _ in range(1024)]
+    cursor = itertools.count()
+
+    def quantity():
+        user_id, symbol = probes[next(cursor) & 1023]
+        store.quantity(user_id, symbol)
+
+    def apply():
+        user_id, symbol = probes[next(cursor) & 1023]
+        store.apply(user_id, symbol, 1, 2456.75)
+
+    for name, func in {'quantity': quantity, 'apply': apply}.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=3))
+        results[f'{name}_ns'] = best / args.number * 1e9
+        print(f"  {name:14s} {results[f'{name}_ns']:8.0f} ns/call")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(),
+                       'python': platform.python_version(),
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
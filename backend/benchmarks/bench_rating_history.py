@@ -0,0 +1,148 @@
+"""
+Rating History Benchmark
+Times the rating graph endpoint for a user with a long contest history:
+cold (series loaded and the body encoded on the request), cached (the
+stored body served as is) and the bare `RatingHistoryCache` lookup without
+the HTTP layer, for each content coding. Also reports the memory of the
+delta-encoded series against the rows it replaces, and the payload size
+before and after downsampling.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import url_for
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.models.rating import Rating
+from app.models.user import User
+from app.services.rating_history import RatingSeries, rating_history
+from app.utils.compression import available_encodings
+from config import TestingConfig
+
+
+class RatingHistoryConfig(TestingConfig):
+    SQL_PROFILING = False
+    ENFORCE_QUERY_BUDGETS = False
+    RATELIMIT_ENABLED = False
+
+
+def seed(contests):
+    """Insert one user with `contests` rating changes."""
+    rng = random.Random(11)
+    db.session.execute(insert(User), [{
+        'name': 'Trader', 'phone': '9000000001', 'email': 'trader@example.com',
+        'password_hash': 'x', 'initial_balance': 100000.0, 'current_balance': 100000.0,
+        'total_profit_loss': 0.0, 'rating': 1200, 'max_rating': 1200,
+        'contests_participated': contests, 'is_active': True, 'is_verified': False,
+        'created_at': datetime.utcnow()}])
+    start = datetime.utcnow() - timedelta(days=7 * contests)
+    rating = 1200
+    rows = []
+    for i in range(contests):
+        change = rng.randint(-80, 90)
+        rows.append({
+            'user_id': 1, 'old_rating': rating, 'new_rating': rating + change,
+            'rating_change': change, 'profit_percentage': rng.uniform(-10, 10),
+            'contest_name': f'Weekly Contest {i + 1}', 'rank': rng.randint(1, 5000),
+            'total_participants': 5000, 'created_at': start + timedelta(days=7 * i),
+        })
+        rating += change
+    db.session.execute(insert(Rating), rows)
+    db.session.commit()
+
+
+def timed(func, repeat):
+    """Return the median milliseconds of `func` over `repeat` calls."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def allocated(build):
+    """Return the bytes allocated by `build` that are still alive afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--contests', type=int, default=1000)
+    parser.add_argument('--points', type=int, default=500, help='Points per chart')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = create_app(RatingHistoryConfig)
+    results = {'contests': args.contests, 'points': args.points}
+    with app.app_context():
+        db.create_all()
+        seed(args.contests)
+        with app.test_request_context():
+            path = url_for('user.rating_history_chart', user_id=1)
+
+        rows = db.session.execute(
+            select(Rating.created_at, Rating.old_rating, Rating.new_rating,
+                   Rating.rank, Rating.contest_name).where(Rating.user_id == 1)
+        ).all()
+        results['row_bytes'] = allocated(lambda: [tuple(row) for row in rows])
+        results['series_bytes'] = allocated(lambda: RatingSeries(rows))
+        print(f"{args.contests:,} contests: rows {results['row_bytes']:,} B, "
+              f"series {results['series_bytes']:,} B")
+
+        full = len(rating_history.response_body(1, args.contests)[0])
+        sampled = len(rating_history.response_body(1, args.points)[0])
+        results['full_bytes'], results['downsampled_bytes'] = full, sampled
+        print(f"  payload {full:,} B, {args.points} points {sampled:,} B")
+
+        client = app.test_client()
+        results['timings'] = []
+        print(f"  {'encoding':8s} {'cold ms':>9s} {'cached ms':>10s} {'lookup us':>10s} {'bytes':>8s}")
+        for encoding in ('identity',) + available_encodings():
+            coding = None if encoding == 'identity' else encoding
+            headers = {'Accept-Encoding': encoding} if coding else {}
+            query = {'points': args.points}
+
+            def cold():
+                rating_history.clear()
+                client.get(path, query_string=query, headers=headers)
+
+            response = client.get(path, query_string=query, headers=headers)
+            assert response.headers.get('Content-Encoding', 'identity') == encoding
+            cold_ms = timed(cold, args.repeat)
+            client.get(path, query_string=query, headers=headers)
+            cached_ms = timed(lambda: client.get(path, query_string=query, headers=headers),
+                              args.repeat)
+            lookup_us = timed(lambda: rating_history.response_body(1, args.points, coding),
+                              args.repeat * 100) * 1000
+            size = len(response.get_data())
+            results['timings'].append({'encoding': encoding, 'cold_ms': cold_ms,
+                                       'cached_ms': cached_ms, 'lookup_us': lookup_us,
+                                       'bytes': size})
+            print(f"  {encoding:8s} {cold_ms:9.2f} {cached_ms:10.3f} {lookup_us:10.2f} {size:8,d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(),
+                       'python': platform.python_version(),
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
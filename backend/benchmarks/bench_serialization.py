@@ -0,0 +1,125 @@
+"""
+Serialization Benchmark
+Compares the ORM `to_dict` + stdlib JSON path against the fast path
+(query tuples + row serializers + streamed fast encoder) on 10k-row payloads
+of trades and ratings stored in an in-memory SQLite database.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.models.rating import Rating
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.models.user import User
+from app.utils.serialization import (
+    iter_json_object, rating_columns, serialize_rating_row,
+    serialize_trade_row, trade_columns
+)
+from config import TestingConfig
+
+
+def seed(rows):
+    """Insert one user plus `rows` trades and ratings."""
+    user = User(name='Bench', phone='9000000000', email='bench@example.com', password='bench')
+    db.session.add(user)
+    db.session.commit()
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, 9, 15)
+    trades = []
+    ratings = []
+    rating = 1200
+    for i in range(rows):
+        price = rng.uniform(100, 4000)
+        quantity = rng.randint(1, 100)
+        trades.append({
+            'user_id': user.id,
+            'symbol': rng.choice(['RELIANCE', 'TCS', 'INFY', 'HDFCBANK']),
+            'trade_type': rng.choice([TradeType.BUY, TradeType.SELL]),
+            'quantity': quantity,
+            'price_per_share': price,
+            'total_amount': price * quantity,
+            'market_price': price,
+            'current_price': price * rng.uniform(0.9, 1.1),
+            'status': TradeStatus.EXECUTED,
+            'unrealized_pnl': rng.uniform(-500, 500),
+            'realized_pnl': 0.0,
+            'is_active': True,
+            'created_at': start + timedelta(minutes=i),
+            'executed_at': start + timedelta(minutes=i),
+            'updated_at': start + timedelta(minutes=i),
+        })
+        change = rng.randint(-80, 80)
+        ratings.append({
+            'user_id': user.id,
+            'old_rating': rating,
+            'new_rating': rating + change,
+            'rating_change': change,
+            'profit_percentage': rng.uniform(-25, 25),
+            'contest_name': f'Contest {i}',
+            'created_at': start + timedelta(days=i),
+        })
+        rating += change
+
+    db.session.execute(insert(Trade), trades)
+    db.session.execute(insert(Rating), ratings)
+    db.session.commit()
+
+
+def orm_path(model):
+    """Baseline: hydrate ORM objects, call to_dict and encode with json."""
+    db.session.expunge_all()
+    objects = db.session.execute(select(model)).scalars().all()
+    return json.dumps({'items': [obj.to_dict() for obj in objects]}).encode('utf-8')
+
+
+def fast_path(columns, serializer):
+    """Fast path: stream query tuples through the row serializer."""
+    rows = db.session.execute(select(*columns).execution_options(yield_per=1000))
+    return b''.join(iter_json_object({}, 'items', rows, serializer))
+
+
+def timed(func, repeat):
+    """Return the best wall time of `repeat` runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+
+        cases = [
+            ('trades', Trade, trade_columns(), serialize_trade_row),
+            ('ratings', Rating, rating_columns(), serialize_rating_row),
+        ]
+        for name, model, columns, serializer in cases:
+            orm_time, orm_body = timed(lambda: orm_path(model), args.repeat)
+            fast_time, fast_body = timed(lambda: fast_path(columns, serializer), args.repeat)
+            assert json.loads(orm_body) == json.loads(fast_body)
+            print(f"{name:8s} {args.rows} rows: "
+                  f"orm+to_dict {orm_time * 1000:8.1f} ms | "
+                  f"tuples+fast {fast_time * 1000:8.1f} ms | "
+                  f"speedup {orm_time / fast_time:5.2f}x | "
+                  f"{len(fast_body) / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup Benchmark
+Measures `create_app` wall time (including imports) and the number of
+modules imported, each in a fresh interpreter, with extensions loaded
+eagerly and lazily. Thresholds make the script exit non-zero so CI can
+catch cold-start regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+modules_before = len(sys.modules)
+start = time.perf_counter()
+from app import create_app
+from config import TestingConfig
+
+class ProbeConfig(TestingConfig):
+    LAZY_EXTENSIONS = {lazy}
+    SQL_PROFILING = False
+
+create_app(ProbeConfig)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'imports': len(sys.modules) - modules_before}}))
+"""
+
+
+def probe(lazy):
+    """Run one cold start in a fresh interpreter and return its measurements."""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(lazy=lazy)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(lazy, runs):
+    """Return the median wall time and import count over `runs` cold starts."""
+    samples = [probe(lazy) for _ in range(runs)]
+    return {
+        'median_ms': statistics.median(s['seconds'] for s in samples) * 1000,
+        'imports': max(s['imports'] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, help='Fail if lazy startup is slower')
+    parser.add_argument('--max-imports', type=int, help='Fail if lazy startup imports more modules')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {
+        'eager': measure(False, args.runs),
+        'lazy': measure(True, args.runs),
+    }
+    for mode, result in results.items():
+        print(f"{mode:5s}: create_app {result['median_ms']:7.1f} ms, "
+              f"{result['imports']} modules imported")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.max_ms is not None and results['lazy']['median_ms'] > args.max_ms:
+        failures.append(f"startup took {results['lazy']['median_ms']:.1f} ms (max {args.max_ms})")
+    if args.max_imports is not None and results['lazy']['imports'] > args.max_imports:
+        failures.append(f"startup imported {results['lazy']['imports']} modules (max {args.max_imports})")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
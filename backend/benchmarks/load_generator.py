@@ -0,0 +1,293 @@
+"""
+API Load Generator
+End-to-end benchmark of the API running fully offline. `create_app` is booted
+with `TestingConfig` against an in-memory or file-backed SQLite database
+seeded with users, stocks and trade history. Concurrent virtual users then log
+in and drive a weighted mix of profile reads, LTP polls, order placement and
+history paging through the Flask test client.
+
+Throughput and p50/p95/p99 latency per endpoint are printed and written as
+JSON (``--output``); ``--compare`` prints the change against an earlier
+result file so releases can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from flask import url_for
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models.stock import Stock
+from app.models.trade import Trade, TradeStatus, TradeType
+from app.models.user import User
+from config import TestingConfig
+
+SYMBOLS = ['RELIANCE', 'TCS', 'INFY', 'HDFCBANK', 'ICICIBANK', 'SBIN', 'ITC', 'LT',
+           'KOTAKBANK', 'AXISBANK', 'BHARTIARTL', 'HINDUNILVR', 'MARUTI', 'WIPRO', 'TITAN']
+
+# Relative weight of each operation in the mixed workload
+DEFAULT_MIX = {'profile': 25, 'ltp': 40, 'order': 15, 'history': 20}
+
+PASSWORD = 'password123'
+
+
+def make_app(database):
+    """Create the app on an in-memory or a fresh file-backed SQLite database."""
+    if database == 'file':
+        path = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        uri = f'sqlite:///{path}'
+    else:
+        uri = 'sqlite:///:memory:'
+
+    class LoadTestConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQL_PROFILING = False
+        ENFORCE_QUERY_BUDGETS = False
+        RATELIMIT_ENABLED = False
+        RISK_MAX_OPEN_ORDERS = 10000
+
+    return create_app(LoadTestConfig)
+
+
+def seed(app, users, history):
+    """Insert users, listed stocks and `history` executed trades per user."""
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            User(name=f'Trader {i}', phone=f'9{i:09d}', email=f'trader{i}@example.com',
+                 password=PASSWORD)
+            for i in range(users)
+        )
+        db.session.add_all(
+            Stock(symbol=symbol, name=symbol.title(), current_price=rng.uniform(100, 4000),
+                  previous_close=0.0)
+            for symbol in SYMBOLS
+        )
+        db.session.commit()
+
+        start = datetime.utcnow() - timedelta(days=30)
+        rows = []
+        for user_id in range(1, users + 1):
+            for i in range(history):
+                price = rng.uniform(100, 4000)
+                quantity = rng.randint(1, 20)
+                when = start + timedelta(minutes=i)
+                rows.append({
+                    'user_id': user_id, 'symbol': rng.choice(SYMBOLS),
+                    'trade_type': rng.choice([TradeType.BUY, TradeType.SELL]),
+                    'quantity': quantity, 'price_per_share': price,
+                    'total_amount': price * quantity, 'market_price': price,
+                    'current_price': price, 'status': TradeStatus.EXECUTED,
+                    'unrealized_pnl': 0.0, 'realized_pnl': 0.0, 'is_active': True,
+                    'created_at': when, 'executed_at': when, 'updated_at': when,
+                })
+        if rows:
+            db.session.execute(insert(Trade), rows)
+            db.session.commit()
+
+
+def resolve_paths(app):
+    """Look up endpoint URLs by endpoint name so route prefixes can change."""
+    with app.test_request_context():
+        return {
+            'login': url_for('auth.login'),
+            'profile': url_for('user.get_profile'),
+            'ltp': url_for('trading.get_stock_ltp'),
+            'order': url_for('orders.place_order'),
+            'history': url_for('trading.get_trade_history'),
+        }
+
+
+class Recorder:
+    """Collects latencies and status codes per operation."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, operation, seconds, status, ok):
+        with self._lock:
+            self.latencies[operation].append(seconds)
+            self.statuses[operation][status] += 1
+            if not ok:
+                self.errors[operation] += 1
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def virtual_user(app, paths, user_index, operations, mix, recorder, serialize, seed_value):
+    """Log in, then run `operations` weighted random requests."""
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    history_offset = 0
+
+    def call(operation, method, path, ok_statuses=(200,), **kwargs):
+        with serialize:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            response.get_data()  # Drain streamed bodies inside the timing
+            elapsed = time.perf_counter() - start
+        recorder.add(operation, elapsed, response.status_code, response.status_code in ok_statuses)
+        return response
+
+    call('login', 'post', paths['login'],
+         json={'email': f'trader{user_index}@example.com', 'password': PASSWORD})
+
+    for _ in range(operations):
+        operation = rng.choices(names, weights)[0]
+        if operation == 'profile':
+            call('profile', 'get', paths['profile'])
+        elif operation == 'ltp':
+            call('ltp', 'get', paths['ltp'], query_string={'symbol': rng.choice(SYMBOLS)})
+        elif operation == 'order':
+            # Rejections by the risk engine (422) are a valid outcome of the workload
+            call('order', 'post', paths['order'], ok_statuses=(201, 422), json={
+                'symbol': rng.choice(SYMBOLS), 'side': rng.choice(['BUY', 'SELL']),
+                'quantity': rng.randint(1, 5)})
+        elif operation == 'history':
+            call('history', 'get', paths['history'],
+                 query_string={'limit': 50, 'offset': history_offset})
+            history_offset = (history_offset + 50) % 500
+
+
+def run(database, users, operations, threads, mix, history, seed_value):
+    """Run one workload and return its report."""
+    app = make_app(database)
+    seed(app, users, history)
+    paths = resolve_paths(app)
+    recorder = Recorder()
+    # The in-memory database is a single shared connection, so requests must not overlap
+    serialize = threading.Lock() if database == 'memory' else nullcontext()
+
+    queue = list(range(users))
+    queue_lock = threading.Lock()
+
+    def worker(thread_index):
+        while True:
+            with queue_lock:
+                if not queue:
+                    return
+                user_index = queue.pop()
+            virtual_user(app, paths, user_index, operations, mix, recorder, serialize,
+                         seed_value * 1000 + user_index)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for operation, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        endpoints[operation] = {
+            'path': paths[operation],
+            'requests': len(latencies),
+            'errors': recorder.errors[operation],
+            'statuses': {str(code): count for code, count in recorder.statuses[operation].items()},
+            'throughput_rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'database': database,
+        'duration_s': elapsed,
+        'requests': total,
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'throughput_rps': total / elapsed,
+        'endpoints': endpoints,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"\n[{report['database']}] {report['requests']} requests in {report['duration_s']:.2f} s "
+          f"({report['throughput_rps']:.1f} req/s), {report['errors']} errors")
+    print(f"  {'endpoint':8s} {'reqs':>6s} {'err':>4s} {'req/s':>8s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, endpoint in report['endpoints'].items():
+        line = (f"  {name:8s} {endpoint['requests']:6d} {endpoint['errors']:4d} "
+                f"{endpoint['throughput_rps']:8.1f} {endpoint['p50_ms']:8.2f} "
+                f"{endpoint['p95_ms']:8.2f} {endpoint['p99_ms']:8.2f}")
+        previous = (baseline or {}).get('endpoints', {}).get(name)
+        if previous:
+            change = (endpoint['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+            line += f"   p95 {change:+.1f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', choices=['memory', 'file', 'both'], default='both')
+    parser.add_argument('--users', type=int, default=20, help='Virtual users')
+    parser.add_argument('--operations', type=int, default=100, help='Requests per virtual user')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--history', type=int, default=500, help='Seeded trades per user')
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX,
+                        help='Operation weights as JSON, e.g. \'{"ltp": 50, "order": 50}\'')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--compare', help='Earlier result file to compare p95 latencies against')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {run['database']: run for run in json.load(f)['runs']}
+
+    databases = ['memory', 'file'] if args.database == 'both' else [args.database]
+    runs = []
+    for database in databases:
+        report = run(database, args.users, args.operations, args.threads, args.mix,
+                     args.history, args.seed)
+        print_report(report, baseline.get(database))
+        runs.append(report)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created_at': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'settings': {'users': args.users, 'operations': args.operations,
+                         'threads': args.threads, 'history': args.history,
+                         'mix': args.mix, 'seed': args.seed},
+            'runs': runs,
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Contest Simulation
+Runs concurrent contests with thousands of participants on the sharded
+contest engine: participants join, fills stream in, prices move, and every
+contest is finalized and rated. Reports fill throughput, standings latency
+and finalization/rating time.
+"""
+import argparse
+import random
+import time
+
+from app.services.contest_engine import ShardedContestEngine
+from app.services.rating_service import RatingService
+
+SYMBOLS = ['RELIANCE', 'TCS', 'INFY', 'HDFCBANK', 'ICICIBANK', 'SBIN', 'ITC', 'LT']
+
+
+def generate_fills(rng, participants, fills_per_user, prices):
+    """Random round-trip trades: each user buys and later sells part of it."""
+    fills = []
+    for user_id in participants:
+        for _ in range(fills_per_user // 2):
+            symbol = rng.choice(SYMBOLS)
+            quantity = rng.randint(1, 10)
+            buy = prices[symbol] * rng.uniform(0.98, 1.02)
+            sell = prices[symbol] * rng.uniform(0.97, 1.04)
+            fills.append((user_id, symbol, quantity, buy))
+            fills.append((user_id, symbol, -rng.randint(1, quantity), sell))
+    return fills
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--contests', type=int, default=10)
+    parser.add_argument('--participants', type=int, default=5000)
+    parser.add_argument('--fills-per-user', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=5000, help='Fills per message to a shard')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    prices = {symbol: rng.uniform(200, 4000) for symbol in SYMBOLS}
+    engine = ShardedContestEngine(workers=args.workers)
+
+    contests = list(range(1, args.contests + 1))
+    participants = {}
+    start = time.perf_counter()
+    for contest_id in contests:
+        engine.create_contest(contest_id, 100000.0)
+        base = contest_id * args.participants
+        participants[contest_id] = list(range(base, base + args.participants))
+        engine.join_many(contest_id, participants[contest_id])
+    print(f"setup: {args.contests} contests x {args.participants} participants "
+          f"in {time.perf_counter() - start:.2f} s")
+
+    fills = {c: generate_fills(rng, participants[c], args.fills_per_user, prices) for c in contests}
+    total_fills = sum(len(f) for f in fills.values())
+
+    # Interleave batches of all contests so shards work concurrently
+    start = time.perf_counter()
+    pending = []
+    for offset in range(0, max(len(f) for f in fills.values()), args.batch):
+        for contest_id in contests:
+            batch = fills[contest_id][offset:offset + args.batch]
+            if batch:
+                pending.append(engine.apply_fills_async(contest_id, batch))
+    rejected = sum(future.result() for future in pending)
+    elapsed = time.perf_counter() - start
+    print(f"fills: {total_fills:,} in {elapsed:.2f} s "
+          f"({total_fills / elapsed:,.0f} fills/s, {rejected:,} rejected)")
+
+    start = time.perf_counter()
+    for contest_id in contests:
+        engine.update_marks(contest_id, {s: p * rng.uniform(0.95, 1.05) for s, p in prices.items()})
+    print(f"mark update: {(time.perf_counter() - start) / args.contests * 1000:.1f} ms per contest")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        engine.standings(rng.choice(contests), limit=50)
+    print(f"standings: {(time.perf_counter() - start) * 10:.2f} ms per top-50 read")
+
+    service = RatingService()
+    finalize_time = 0.0
+    rating_time = 0.0
+    for contest_id in contests:
+        start = time.perf_counter()
+        results = engine.finalize(contest_id)
+        finalize_time += time.perf_counter() - start
+        ratings = [rng.randint(800, 2600) for _ in results]
+        start = time.perf_counter()
+        deltas = service.calculate_rating_changes(ratings, [r.rank for r in results])
+        rating_time += time.perf_counter() - start
+        assert len(deltas) == args.participants
+    print(f"finalize: {finalize_time / args.contests * 1000:.1f} ms per contest, "
+          f"rating calculation: {rating_time / args.contests * 1000:.1f} ms per contest")
+
+    engine.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,8 +7,37 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///trading_sim.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
+    
+    # Read Replica Routing
+    # Reads of the listed endpoints go to the replica; writes always use the primary
+    REPLICA_DATABASE_URI = os.environ.get('REPLICA_DATABASE_URL')
+    READ_REPLICA_ENDPOINTS = [
+        'user.get_profile', 'user.equity_curve', 'user.leaderboard',
+        'trading.get_trade_history', 'contests.list_contests', 'exports.export',
+    ]
+    READ_YOUR_WRITES_WINDOW = int(os.environ.get('READ_YOUR_WRITES_WINDOW') or 5)  # Seconds on the primary after a write
+    READ_YOUR_WRITES_COOKIE = 'db_primary_until'
+    READ_YOUR_WRITES_MAX_USERS = 10000  # Recent writers tracked per worker process
+    REPLICA_SYNC_INTERVAL = int(os.environ.get('REPLICA_SYNC_INTERVAL') or 2)  # SQLite stand-in only
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
+    # Password Hashing
+    # Any werkzeug method, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1';
+    # existing hashes are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH') or 16)
+    
+    # Authenticated User Cache and last_login write-behind
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 10000)  # 0 disables the cache
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL') or 60)
+    LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL') or 5.0)
+    LAST_LOGIN_MAX_PENDING = int(os.environ.get('LAST_LOGIN_MAX_PENDING') or 1000)
+    
+    # Rating History Cache (profile rating graphs)
+    RATING_HISTORY_CACHE_SIZE = int(os.environ.get('RATING_HISTORY_CACHE_SIZE') or 5000)  # 0 disables the cache
+    RATING_HISTORY_CACHE_TTL = float(os.environ.get('RATING_HISTORY_CACHE_TTL') or 300)
+    RATING_HISTORY_MAX_POINTS = int(os.environ.get('RATING_HISTORY_MAX_POINTS') or 500)  # Default points per chart
+    
     # AngelOne API Configuration
     # IMPORTANT: Users must obtain their own API credentials from AngelOne
     # These are placeholder values and will not work without proper authentication
@@ -22,12 +51,93 @@ class Config:
     CELERY_BROKER_URL = REDIS_URL
     CELERY_RESULT_BACKEND = REDIS_URL
     
+    # Job Scheduler Configuration
+    # Periodic jobs run in-process on one leader worker; Celery is optional
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'false').lower() in ['true', 'on', '1']
+    SCHEDULER_BROKER = os.environ.get('SCHEDULER_BROKER') or 'thread'  # 'thread' or 'celery'
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE')  # Defaults to a file in the temp dir
+    SCHEDULER_TICK = float(os.environ.get('SCHEDULER_TICK') or 1.0)
+    SCHEDULER_MAX_WORKERS = int(os.environ.get('SCHEDULER_MAX_WORKERS') or 4)
+    
+    # Market Data Jobs
+    QUOTE_PROVIDER = os.environ.get('QUOTE_PROVIDER')  # 'module:function' returning {symbol: ltp or {ltp, bid, ask, volume}}
+    QUOTE_REFRESH_INTERVAL = int(os.environ.get('QUOTE_REFRESH_INTERVAL') or 15)
+    MARK_TO_MARKET_INTERVAL = int(os.environ.get('MARK_TO_MARKET_INTERVAL') or 60)
+    END_OF_DAY_TIME = os.environ.get('END_OF_DAY_TIME') or '10:15'  # UTC, after NSE close
+    CONTEST_JOB_INTERVAL = int(os.environ.get('CONTEST_JOB_INTERVAL') or 30)
+    LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get('LEDGER_SNAPSHOT_INTERVAL') or 3600)
+    
+    # Shared Price Table
+    # Quotes are published by one feeder (the scheduler leader or `flask prices feed`)
+    # into an mmap'd file that every worker on the host reads without locks
+    PRICE_TABLE_ENABLED = os.environ.get('PRICE_TABLE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    PRICE_TABLE_PATH = os.environ.get('PRICE_TABLE_PATH')  # Defaults to a file in /dev/shm
+    PRICE_TABLE_SLOTS = int(os.environ.get('PRICE_TABLE_SLOTS') or 4096)  # Must exceed the largest stock id
+    
+    # Performance Analytics (nightly equity curve and metrics)
+    ANALYTICS_TIME = os.environ.get('ANALYTICS_TIME') or '10:30'  # UTC, after END_OF_DAY_TIME
+    ANALYTICS_LOOKBACK_DAYS = int(os.environ.get('ANALYTICS_LOOKBACK_DAYS') or 365)
+    ANALYTICS_MIN_DAYS = int(os.environ.get('ANALYTICS_MIN_DAYS') or 5)  # For volatility and Sharpe
+    RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE') or 0.0)  # Annual, e.g. 0.065
+    
+    # Pre-trade Risk Limits
+    RISK_MAX_POSITION_QUANTITY = int(os.environ.get('RISK_MAX_POSITION_QUANTITY') or 100000)  # Shares per symbol
+    RISK_MAX_ORDER_VALUE = float(os.environ.get('RISK_MAX_ORDER_VALUE') or 1000000.0)
+    RISK_MAX_OPEN_ORDERS = int(os.environ.get('RISK_MAX_OPEN_ORDERS') or 50)
+    RISK_SYNC_INTERVAL = float(os.environ.get('RISK_SYNC_INTERVAL') or 1.0)  # Seconds between ledger reads
+    RISK_SYNC_GRACE = float(os.environ.get('RISK_SYNC_GRACE') or 60.0)  # Seconds of entries re-read for late commits
+    
+    # Order Pipeline
+    # Orders are matched by one server process per partition of the symbols, shared by
+    # all workers of the host; disabled, they are matched in the request thread. Off
+    # until benchmarks/bench_order_pipeline.py shows it outrunning inline matching
+    ORDER_PIPELINE_ENABLED = os.environ.get('ORDER_PIPELINE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    ORDER_PIPELINE_WORKERS = int(os.environ.get('ORDER_PIPELINE_WORKERS') or 0)  # 0: one per CPU
+    ORDER_PIPELINE_TIMEOUT = float(os.environ.get('ORDER_PIPELINE_TIMEOUT') or 2.0)  # Seconds per order
+    ORDER_PIPELINE_DIR = os.environ.get('ORDER_PIPELINE_DIR')  # Server sockets and locks; defaults to the temp dir
+    
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@frontpage-trading-sim.local'
+    
+    # Notification Configuration
+    # Emails are sent from a bounded in-process queue by background workers
+    NOTIFICATIONS_ENABLED = os.environ.get('NOTIFICATIONS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE') or 1000)
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS') or 2)
+    NOTIFICATION_BATCH_WINDOW = float(os.environ.get('NOTIFICATION_BATCH_WINDOW') or 2.0)
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE') or 100)
+    NOTIFICATION_SEND_ATTEMPTS = int(os.environ.get('NOTIFICATION_SEND_ATTEMPTS') or 3)  # Tries per email before it is dropped
+    NOTIFICATION_RETRY_DELAY = float(os.environ.get('NOTIFICATION_RETRY_DELAY') or 1.0)  # Seconds before reconnecting
+    
+    # Rate Limiting Configuration
+    # 'shm://' shares counters between all workers on this host via an mmap'd file
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    
+    # Response Compression
+    # gzip, or brotli when the optional package is installed; streamed responses
+    # are compressed chunk by chunk regardless of size
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)  # Bytes
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL') or 6)  # gzip, 1-9
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') or 4)  # 0-11
+    
+    # Startup Configuration
+    # Import and initialize rarely used extensions (mail, migrate) on first use
+    LAZY_EXTENSIONS = os.environ.get('LAZY_EXTENSIONS', 'false').lower() in ['true', 'on', '1']
+    
+    # SQL Profiling Configuration (opt-in)
+    # Logs slow statements with their EXPLAIN plan and repeated (N+1) queries
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', 'false').lower() in ['true', 'on', '1']
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 100)
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 5)
+    QUERY_BUDGETS = {}  # Endpoint name -> max queries per request
+    DEFAULT_QUERY_BUDGET = None
+    ENFORCE_QUERY_BUDGETS = False
     
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -36,12 +146,22 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
+    LAZY_EXTENSIONS = os.environ.get('LAZY_EXTENSIONS', 'true').lower() in ['true', 'on', '1']
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'shm://'
     
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    MAIL_USE_TLS = False  # The local SMTP sink does not speak STARTTLS
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # Fast hashing for tests only
+    PRICE_TABLE_ENABLED = False  # Tests must not share quotes through /dev/shm
+    
+    # Fail tests when an endpoint exceeds its query budget
+    SQL_PROFILING = True
+    DEFAULT_QUERY_BUDGET = 20
+    ENFORCE_QUERY_BUDGETS = True
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,37 @@
+"""Shared fixtures; run from ``backend/`` with ``python -m pytest``."""
+import pytest
+
+from app import create_app, db
+from app.models.user import User
+from app.services.login_activity import login_activity
+from config import TestingConfig
+
+PASSWORD = 'password123'
+
+
+class PytestConfig(TestingConfig):
+    RATELIMIT_ENABLED = False
+
+
+@pytest.fixture
+def app():
+    app = create_app(PytestConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(name='Trader', phone='9000000001', email='trader@example.com',
+                            password=PASSWORD))
+        db.session.commit()
+    yield app
+    login_activity.flush()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def logged_in(client):
+    """The pytest-flask test client, logged in as the seeded user."""
+    response = client.post('/api/auth/login',
+                           json={'email': 'trader@example.com', 'password': PASSWORD})
+    assert response.status_code == 200
+    return client
@@ -0,0 +1,41 @@
+"""Query budgets are enforced in the test configuration."""
+import pytest
+from flask import Response, stream_with_context
+
+from app import db
+from app.models.user import User
+from app.utils.query_profiler import QueryBudgetExceeded
+
+
+def test_test_config_enforces_budgets(app):
+    profiler = app.extensions['query_profiler']
+    assert profiler.enforce_budgets
+    assert profiler.default_budget is not None
+
+
+def test_budget_overrun_raises(app, logged_in):
+    app.extensions['query_profiler'].budgets['user.get_profile'] = 0
+    with pytest.raises(QueryBudgetExceeded, match="user.get_profile"):
+        logged_in.get('/api/user/profile')
+
+
+def test_within_budget_reports_query_count(app, logged_in):
+    response = logged_in.get('/api/user/profile')
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) >= 1
+
+
+def test_streamed_overrun_raises_on_close(app, client):
+    @app.route('/_test/stream')
+    def stream():
+        def body():
+            # Queries issued while streaming, after `after_request` has run
+            for _ in range(3):
+                yield str(db.session.query(User).count()).encode()
+        return Response(stream_with_context(body()))
+
+    app.extensions['query_profiler'].budgets['stream'] = 2
+    response = client.get('/_test/stream')
+    assert response.get_data() == b'111'
+    with pytest.raises(QueryBudgetExceeded, match="issued 3 queries"):
+        response.close()
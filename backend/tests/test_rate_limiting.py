@@ -0,0 +1,75 @@
+"""The shared-memory rate limit storage holds limits across worker processes."""
+import multiprocessing
+import os
+
+import pytest
+from limits import RateLimitItemPerMinute
+from limits.strategies import FixedWindowRateLimiter
+
+from app.utils.rate_limiting import SharedMemoryStorage
+
+WORKERS = 4
+LIMIT = 200
+ATTEMPTS = 500
+
+
+def _hit(storage, start_event, results):
+    """Forked worker: hit a shared key and report how many hits were allowed."""
+    limiter = FixedWindowRateLimiter(storage)
+    item = RateLimitItemPerMinute(LIMIT)
+    start_event.wait()
+    allowed = sum(1 for _ in range(ATTEMPTS) if limiter.hit(item, 'user:1'))
+    results.put(allowed)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SharedMemoryStorage(f"shm://{tmp_path / 'ratelimit.shm'}?slots=1024")
+    storage.reset()
+    return storage
+
+
+def test_limit_holds_across_forked_workers(storage):
+    # Workers inherit the parent's open table, as pre-forked app workers do
+    context = multiprocessing.get_context('fork')
+    start_event = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_hit, args=(storage, start_event, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    start_event.set()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert sum(outcomes) == LIMIT
+    # Every hit, allowed or not, landed in the one shared counter
+    assert storage.get(f'LIMITER/user:1/{LIMIT}/1/minute') == WORKERS * ATTEMPTS
+
+
+def test_fork_closes_inherited_handles(storage):
+    parent_fd = storage.table._fd
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: inherited handles are closed; the table reopens on next use
+        ok = storage.table._map is None and storage.table._fd is None
+        try:
+            os.fstat(parent_fd)
+            ok = False
+        except OSError:
+            pass
+        storage.incr('child', 60)
+        ok = ok and storage.table._fd is not None
+        os.write(write_end, b'1' if ok else b'0')
+        os._exit(0)
+    os.close(write_end)
+    assert os.read(read_end, 1) == b'1'
+    os.waitpid(pid, 0)
+    os.close(read_end)
+
+    # The parent's descriptor and counters are untouched
+    assert storage.table._fd == parent_fd
+    assert storage.get('child') == 1